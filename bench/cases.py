@@ -0,0 +1,136 @@
+from bench.generate import generate_test_results
+from cargo.common import RunCommand, get_python_executable, get_root_path
+from cargo.logger import setup_loggers, shutdown_loggers
+from individual.cache import load_test_results
+from individual.common import parse_test_results
+from logging import Handler, LogRecord, getLogger
+from os import path
+from time import monotonic, perf_counter
+from typing import Dict, List, Optional
+
+import re
+import run
+
+# Sizes the benchmarks are grouped by, in number of tests or lines.
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+# Size of the `<output>` of every test in the "-output" results files. GC
+# stress tests print the most, but also come in the smallest suites.
+OUTPUT_SIZES = {'1k': 64 * 1024, '100k': 2 * 1024, '1m': 256}
+
+def __get_benchmarks() -> Dict[str, Dict]:
+    benchmarks = {}
+    for (size, tests) in SIZES.items():
+        benchmarks[f'parse-{size}'] = {'kind': 'parse', 'size': size, 'tests': tests, 'output_size': 0}
+        benchmarks[f'parse-{size}-output'] = {'kind': 'parse', 'size': size, 'tests': tests, 'output_size': OUTPUT_SIZES[size]}
+        benchmarks[f'summary-{size}'] = {'kind': 'summary', 'size': size, 'tests': tests, 'output_size': 0, 'cached': False}
+        benchmarks[f'summary-{size}-cached'] = {'kind': 'summary', 'size': size, 'tests': tests, 'output_size': 0, 'cached': True}
+        for backend in ('thread', 'asyncio'):
+            benchmarks[f'pump-{size}-{backend}'] = {'kind': 'pump', 'size': size, 'lines': tests, 'backend': backend, 'echo': True}
+            benchmarks[f'pump-{size}-{backend}-quiet'] = {'kind': 'pump', 'size': size, 'lines': tests, 'backend': backend, 'echo': False}
+    # A test printing steadily, to measure how long its lines take to reach the log.
+    for backend in ('thread', 'asyncio'):
+        benchmarks[f'pump-paced-{backend}'] = {'kind': 'pump', 'size': '100k', 'lines': 100000, 'rate': 50000, 'backend': backend, 'echo': True}
+    return benchmarks
+
+# The benchmarks, keyed by name. `kind` selects what is measured:
+# - parse: `parse_test_results` on a synthetic results file of `tests` tests;
+# - summary: run.py's summary of that file, with a cold or warm results cache;
+# - pump: `RunCommand` reading `lines` lines (at `rate` lines per second, if set) from bench/printer.py.
+BENCHMARKS = __get_benchmarks()
+
+def get_data_directory() -> str:
+    '''Gets the directory the synthetic results files are kept in.'''
+    return path.join(get_root_path(), 'cache', 'bench')
+
+def get_results_file(benchmark: Dict, data_dir: Optional[str] = None) -> str:
+    '''Gets the synthetic results file of a parse or summary benchmark, generating it on first use.'''
+    xml_file = path.join(
+        data_dir or get_data_directory(), f"GC-{benchmark['tests']}-{benchmark['output_size']}.testResults.xml")
+    if not path.exists(xml_file):
+        print(f"Generating {benchmark['tests']} tests in {xml_file}...")
+        generate_test_results(xml_file, benchmark['tests'], benchmark['output_size'])
+    return xml_file
+
+class LineLatencyHandler(Handler):
+    '''
+    Measures how long the lines of bench/printer.py took to be logged: the
+    first line of every record carries the time it was printed at.
+    '''
+
+    __printed_at = re.compile(r'^(?:\[[^\]]*\] )?\s*(\d+\.\d{6}) ')
+
+    def __init__(self):
+        super().__init__()
+        self.latencies = []
+
+    def emit(self, record: LogRecord) -> None:
+        match = self.__printed_at.match(record.msg[:64]) if isinstance(record.msg, str) else None
+        if match:
+            self.latencies.append(monotonic() - float(match.group(1)))
+
+def __percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def __measure_parse(benchmark: Dict, data_dir: Optional[str]) -> Dict:
+    xml_file = get_results_file(benchmark, data_dir)
+    start = perf_counter()
+    summary = parse_test_results(xml_file)
+    wall = perf_counter() - start
+    return {'wall': wall, 'items': summary['total_cases'], 'bytes': path.getsize(xml_file)}
+
+def __measure_summary(benchmark: Dict, data_dir: Optional[str]) -> Dict:
+    xml_file = get_results_file(benchmark, data_dir)
+    if benchmark['cached']:
+        load_test_results(xml_file)
+    # Private to run.py; the summary is measured as `--summary` runs it.
+    summary = getattr(run, '__summary')
+    start = perf_counter()
+    summary(get_root_path(), verbose=False, result_files={'GC': [xml_file]})
+    wall = perf_counter() - start
+    return {'wall': wall, 'items': benchmark['tests'], 'bytes': path.getsize(xml_file)}
+
+def __measure_pump(benchmark: Dict) -> Dict:
+    line_size = 100
+    cmdline = [get_python_executable(), path.join(path.dirname(path.abspath(__file__)), 'printer.py'),
+               '--lines', str(benchmark['lines']), '--line-size', str(line_size)]
+    if benchmark.get('rate'):
+        cmdline += ['--rate', str(benchmark['rate'])]
+    # Piped and watched as run_single_test runs a test.
+    command = RunCommand(
+        cmdline, verbose=True, echo=benchmark['echo'], name='printer', inactivity_timeout=60, backend=benchmark['backend'])
+    handler = LineLatencyHandler()
+    getLogger().addHandler(handler)
+    start = perf_counter()
+    try:
+        command.run()
+        # The queued records are part of the cost.
+        shutdown_loggers()
+    finally:
+        getLogger().removeHandler(handler)
+    wall = perf_counter() - start
+    result = {'wall': wall, 'items': benchmark['lines'], 'bytes': benchmark['lines'] * line_size}
+    if handler.latencies:
+        result['latency_p50'] = __percentile(handler.latencies, 0.5)
+        result['latency_p99'] = __percentile(handler.latencies, 0.99)
+    return result
+
+def measure(name: str, data_dir: Optional[str] = None) -> Dict:
+    '''Runs a benchmark once in the current process.
+    The loggers are set up as run.py sets them up, so the benchmark pays for
+    the same logging. Run every measurement in a fresh copy of the scripts
+    (see benchmark.py): the summary fills the results cache and the history
+    database, and writes to test_results/.
+    param name: Key of `BENCHMARKS`.
+    param data_dir: Directory of the synthetic results files (default `get_data_directory()`).
+    return: The wall time (`wall`, seconds), the number of tests or lines handled (`items`),
+    their size (`bytes`) and, for echoed output, the `latency_p50` and `latency_p99` (seconds)
+    of a line from being printed to being logged.
+    '''
+    benchmark = BENCHMARKS[name]
+    setup_loggers(verbose=False)
+    if benchmark['kind'] == 'parse':
+        return __measure_parse(benchmark, data_dir)
+    if benchmark['kind'] == 'summary':
+        return __measure_summary(benchmark, data_dir)
+    return __measure_pump(benchmark)
@@ -0,0 +1,76 @@
+from os import makedirs, path
+from random import Random
+from xml.sax.saxutils import escape, quoteattr
+
+import os
+
+# Failures the synthetic tests report. The numbers, addresses and paths vary
+# per test, as they do in real runs, so clustering has the same work to do.
+__FAILURES = [
+    ('Assert failure(PID {pid} [0x{pid:08x}], Thread: {tid} [0x{tid:04x}]): !"Detected use of a corrupted OBJECTREF"',
+     ['WKS::gc_heap::mark_object_simple(unsigned char**)', 'WKS::gc_heap::mark_phase(int)', 'WKS::gc_heap::gc1()']),
+    ('Expected: 100, Actual: {n}',
+     ['GCSimulator.Program.Main(System.String[])', 'GCSimulator.Program.RunIteration(Int32)']),
+    ('System.OutOfMemoryException: Exception of type \'System.OutOfMemoryException\' was thrown at 0x{address:016x}.',
+     ['System.GC.AllocateNewArray(IntPtr, Int32, GC_ALLOC_FLAGS)', 'GCStress.Allocator.Allocate(Int32)']),
+    ('Process terminated. Timed out after {n} ms waiting for the finalizer, see /tmp/gc-{guid}/dump.txt',
+     ['System.GC.WaitForPendingFinalizers()', 'Finalizer.Test.Run()']),
+]
+
+def __payload(random: Random, size: int) -> str:
+    '''A block of test output of about `size` characters, reused by every test of a file.'''
+    lines = []
+    total = 0
+    while total < size:
+        line = f'[{random.random():.6f}] GC#{random.randint(1, 99999)} gen{random.randint(0, 2)} ' \
+               f'heap=0x{random.getrandbits(48):012x} promoted={random.randint(0, 1 << 20)} bytes'
+        lines.append(line)
+        total += len(line) + 1
+    return escape('\n'.join(lines)[:size])
+
+def generate_test_results(
+        xml_file: str,
+        tests: int,
+        output_size: int = 0,
+        failure_rate: float = 0.01,
+        suite: str = 'GC',
+        seed: int = 0) -> None:
+    '''Writes a synthetic xUnit results file, as the test wrappers produce, a test at a time.
+    param xml_file: Path of the results file.
+    param tests: Number of tests.
+    param output_size: Size of the captured `<output>` of every test, in characters (0: none).
+    param failure_rate: Fraction of the tests that fail.
+    param suite: Name of the suite, used as the assembly name.
+    param seed: Seed of the random durations, failures and output.
+    '''
+    random = Random(seed)
+    failed = [random.random() < failure_rate for _ in range(tests)]
+    durations = [random.expovariate(2.0) for _ in range(tests)]
+    payload = __payload(random, output_size) if output_size else ''
+    failures = sum(failed)
+    attributes = ' '.join(f'{key}={quoteattr(value)}' for (key, value) in (
+        ('name', suite),
+        ('total', str(tests)),
+        ('passed', str(tests - failures)),
+        ('failed', str(failures)),
+        ('skipped', '0'),
+        ('time', f'{sum(durations):.3f}')))
+    makedirs(path.dirname(path.abspath(xml_file)), exist_ok=True)
+    with open(f'{xml_file}.tmp', 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        f.write(f'<?xml version="1.0" encoding="utf-8"?>\n<assemblies>\n<assembly {attributes}>\n<collection {attributes}>\n')
+        for index in range(tests):
+            name = quoteattr(f'{suite}\\Test{index // 1000:04d}\\Test{index:07d}\\Test{index:07d}.cmd')
+            f.write(f'<test name={name} type="{suite}" method={name} time="{durations[index]:.3f}" '
+                    f'result="{"Fail" if failed[index] else "Pass"}">')
+            if failed[index]:
+                (message, frames) = __FAILURES[index % len(__FAILURES)]
+                message = message.format(
+                    pid=random.randint(1000, 99999), tid=random.randint(1, 4095), n=random.randint(0, 1 << 16),
+                    address=random.getrandbits(48), guid=f'{random.getrandbits(128):032x}')
+                stack_trace = '\n'.join(f'   at {frame}' for frame in frames)
+                f.write(f'<failure><message>{escape(message)}</message><stack-trace>{escape(stack_trace)}</stack-trace></failure>')
+            if payload:
+                f.write(f'<output>Test{index:07d} started\n{payload}</output>')
+            f.write('</test>\n')
+        f.write('</collection>\n</assembly>\n</assemblies>\n')
+    os.replace(f'{xml_file}.tmp', xml_file)
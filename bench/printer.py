@@ -0,0 +1,38 @@
+'''
+Stand-in for a test process: prints lines at a configurable rate. Every line
+starts with the `time.monotonic()` at which it was printed, so the reader can
+measure how long the line took to reach it.
+'''
+from argparse import ArgumentParser
+from time import monotonic, sleep
+
+import sys
+
+# Lines are printed in bursts of this many seconds when the rate is limited.
+TICK = 0.01
+
+def main() -> None:
+    parser = ArgumentParser(description='Prints synthetic test output.')
+    parser.add_argument('--lines', type=int, default=100000, help='number of lines to print')
+    parser.add_argument('--line-size', type=int, default=100, help='size of a line, in bytes, newline included')
+    parser.add_argument('--rate', type=float, default=0, help='lines per second (default: as fast as possible)')
+    args = parser.parse_args()
+
+    out = sys.stdout.buffer
+    padding = b'x' * max(args.line_size - 19, 0) + b'\n'
+    burst = max(int(args.rate * TICK), 1) if args.rate > 0 else 1024
+    start = monotonic()
+    printed = 0
+    while printed < args.lines:
+        count = min(burst, args.lines - printed)
+        out.write(b''.join(b'%17.6f ' % monotonic() + padding for _ in range(count)))
+        printed += count
+        if args.rate > 0:
+            out.flush()
+            delay = start + printed / args.rate - monotonic()
+            if delay > 0:
+                sleep(delay)
+    out.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+from bench.cases import BENCHMARKS, SIZES, get_data_directory, get_results_file, measure
+from cargo.common import RunCommand, get_python_executable, get_root_path
+from cargo.logger import setup_loggers
+from cargo.timings import rusage_peak_rss_kb
+from argparse import ArgumentParser, SUPPRESS
+from fnmatch import fnmatch
+from os import path
+from shutil import copy2, copytree, ignore_patterns, rmtree
+from statistics import median
+from sys import argv, exit
+from time import time
+from typing import Any, Dict, List, Optional
+
+import json
+import platform
+import os
+import tempfile
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak RSS is then not measured.
+    resource = None
+
+# Version of the results and baseline files.
+RESULTS_VERSION = 1
+# Metrics compared with the baseline, lower being better, and the change
+# below which a difference is noise whatever the tolerance.
+REGRESSION_METRICS = {'wall_s': 0.05, 'peak_rss_mib': 8.0, 'latency_p99_ms': 5.0}
+# Scripts copied into the sandbox every measurement runs in.
+SANDBOX_CONTENT = ['cargo', 'individual', 'bench', 'run.py', 'benchmark.py']
+
+def __process_args(args: List[str]) -> Any:
+    '''Processes command line arguments and returns parsed arguments.
+    param args: List of command line arguments.
+    return: Parsed arguments as an object.
+    '''
+    parser = ArgumentParser(
+        description='Benchmarks of the GC Individual Tests wrapper hot paths',
+        allow_abbrev=False
+    )
+
+    parser.add_argument(
+        '-b', '--benchmark',
+        required=False,
+        action='append',
+        default=None,
+        help='Benchmark to run, or a shell-style pattern; repeat to run several (default: all of them)',
+    )
+
+    parser.add_argument(
+        '--sizes',
+        required=False,
+        default=','.join(SIZES),
+        type=str,
+        help=f'Comma-separated sizes to run, of {", ".join(SIZES)} (default: all of them)',
+    )
+
+    parser.add_argument(
+        '--repeat',
+        required=False,
+        default=3,
+        type=int,
+        help='Number of measurements of every benchmark, each in a fresh process (default 3)',
+    )
+
+    parser.add_argument(
+        '--data-dir',
+        required=False,
+        default=None,
+        type=str,
+        help='Directory of the generated results files, kept between runs (default cache/bench)',
+    )
+
+    parser.add_argument(
+        '--output',
+        required=False,
+        default=None,
+        type=str,
+        help='Writes the results to this JSON file',
+    )
+
+    parser.add_argument(
+        '--save-baseline',
+        required=False,
+        default=None,
+        type=str,
+        help='Writes the results to this JSON file as the baseline later runs are compared with',
+    )
+
+    parser.add_argument(
+        '--baseline',
+        required=False,
+        default=None,
+        type=str,
+        help='Compares the results with this baseline and exits with 1 if any regressed',
+    )
+
+    parser.add_argument(
+        '--tolerance',
+        required=False,
+        default=0.2,
+        type=float,
+        help='Relative increase of the wall time, peak RSS or p99 latency reported as a regression (default 0.2)',
+    )
+
+    parser.add_argument(
+        '--list',
+        required=False,
+        default=False,
+        action='store_true',
+        help='Lists the benchmarks and exits',
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        required=False,
+        default=False,
+        action='store_true',
+        help='Turns on verbosity (default "False")',
+    )
+
+    # Internal: measures one benchmark in this process.
+    parser.add_argument('--worker', default=None, help=SUPPRESS)
+    parser.add_argument('--worker-output', default=None, help=SUPPRESS)
+
+    return parser.parse_args(args)
+
+def __select(patterns: Optional[List[str]], sizes: List[str]) -> List[str]:
+    '''Selects the benchmarks matching any of the patterns and one of the sizes.'''
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        raise ValueError(f'Unknown sizes {unknown}; use some of {list(SIZES)}.')
+    selected = [name for (name, benchmark) in BENCHMARKS.items()
+                if benchmark['size'] in sizes and (not patterns or any(fnmatch(name, pattern) for pattern in patterns))]
+    if not selected:
+        raise ValueError(f'No benchmark matches {patterns} in sizes {sizes}; see --list.')
+    return selected
+
+def __worker(name: str, output_file: str, data_dir: Optional[str]) -> None:
+    '''Measures a benchmark once and writes the measurement, with the peak RSS of this process, to a JSON file.'''
+    result = measure(name, data_dir)
+    if resource is not None:
+        result['peak_rss_kb'] = rusage_peak_rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def __measure_once(name: str, data_dir: str, verbose: bool) -> Dict:
+    '''
+    Measures a benchmark in a new process running from a fresh copy of the
+    scripts, so neither the caches nor the history database of this tree, nor
+    an earlier measurement, affect it.
+    '''
+    sandbox = tempfile.mkdtemp(prefix='gc-bench-')
+    try:
+        for item in SANDBOX_CONTENT:
+            source = path.join(get_root_path(), item)
+            if path.isdir(source):
+                copytree(source, path.join(sandbox, item), ignore=ignore_patterns('__pycache__'))
+            else:
+                copy2(source, sandbox)
+        if BENCHMARKS[name]['kind'] == 'summary':
+            # The summary reads the commit hash of the repository it reports on.
+            RunCommand(['git', 'init', '-q'], verbose=verbose).run(sandbox)
+            RunCommand(['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost',
+                        'commit', '-q', '--allow-empty', '-m', 'bench'], verbose=verbose).run(sandbox)
+        output_file = path.join(sandbox, 'result.json')
+        RunCommand(
+            [get_python_executable(), path.join(sandbox, 'benchmark.py'),
+             '--worker', name, '--worker-output', output_file, '--data-dir', data_dir],
+            verbose=verbose, echo=verbose).run(sandbox)
+        with open(output_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        rmtree(sandbox, ignore_errors=True)
+
+def __aggregate(measurements: List[Dict]) -> Dict:
+    '''Reduces the measurements of a benchmark to its median wall time and latencies, and its largest peak RSS.'''
+    wall = median(measurement['wall'] for measurement in measurements)
+    result = {
+        'wall_s': wall,
+        'items_per_s': measurements[0]['items'] / wall if wall > 0 else None,
+        'mb_per_s': measurements[0]['bytes'] / (1024 * 1024) / wall if wall > 0 else None,
+        'runs': len(measurements)
+    }
+    peaks = [measurement['peak_rss_kb'] for measurement in measurements if 'peak_rss_kb' in measurement]
+    if peaks:
+        result['peak_rss_mib'] = max(peaks) / 1024
+    for key in ('latency_p50', 'latency_p99'):
+        values = [measurement[key] for measurement in measurements if key in measurement]
+        if values:
+            result[f'{key}_ms'] = median(values) * 1000
+    return result
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> Dict[str, Dict[str, float]]:
+    '''Finds the metrics that regressed since the baseline.
+    param results: Aggregated results keyed by benchmark.
+    param baseline: Aggregated results of the baseline keyed by benchmark.
+    param tolerance: Relative increase reported as a regression.
+    return: The relative increase of every regressed metric, keyed by benchmark then metric.
+    '''
+    regressions = {}
+    for (name, result) in results.items():
+        for (metric, noise) in REGRESSION_METRICS.items():
+            (current, previous) = (result.get(metric), baseline.get(name, {}).get(metric))
+            if current is None or not previous:
+                continue
+            if current > previous * (1 + tolerance) and current - previous > noise:
+                regressions.setdefault(name, {})[metric] = current / previous - 1
+    return regressions
+
+def __format(value: Optional[float], digits: int = 2) -> str:
+    return 'NA' if value is None else f'{value:,.{digits}f}'
+
+def format_results(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None, regressions: Optional[Dict] = None) -> str:
+    '''Formats the results as a Markdown table, with the change of the wall time since the baseline.'''
+    output = '| Benchmark | Wall (s) | Items/s | MB/s | Peak RSS (MiB) | Latency p50/p99 (ms) | vs baseline |\n' \
+             '|-----------|----------|---------|------|----------------|----------------------|-------------|\n'
+    for (name, result) in results.items():
+        latency = 'NA'
+        if 'latency_p50_ms' in result:
+            latency = f"{__format(result['latency_p50_ms'], 1)}/{__format(result['latency_p99_ms'], 1)}"
+        change = 'NA'
+        previous = (baseline or {}).get(name, {}).get('wall_s')
+        if previous:
+            change = f"{result['wall_s'] / previous - 1:+.0%}"
+        if regressions and name in regressions:
+            change += ' REGRESSED: ' + ', '.join(f'{metric} {increase:+.0%}' for (metric, increase) in regressions[name].items())
+        output += f"| {name} | {__format(result['wall_s'], 3)} | {__format(result['items_per_s'], 0)} | " \
+                  f"{__format(result['mb_per_s'], 1)} | {__format(result.get('peak_rss_mib'), 1)} | {latency} | {change} |\n"
+    return output
+
+def __write_results(results_file: str, results: Dict[str, Dict]) -> None:
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'time': time(),
+            'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+            'benchmarks': results
+        }, f, indent=2)
+    print(f'Results saved to {results_file}')
+
+def __read_results(results_file: str) -> Dict[str, Dict]:
+    with open(results_file, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    if content.get('version') != RESULTS_VERSION:
+        raise ValueError(f'{results_file} was written by another version of the benchmarks; save a new baseline.')
+    machine = {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()}
+    if content.get('machine') != machine:
+        print(f"Warning: the baseline was measured on {content.get('machine')}, this is {machine}.")
+    return content['benchmarks']
+
+def __main(argv: List[str]) -> int:
+    '''Runs the benchmarks and compares them with the baseline.
+    param argv: List of command line arguments.
+    return: 1 if a benchmark regressed since the baseline, 0 otherwise.
+    '''
+    args = __process_args(argv)
+    data_dir = path.abspath(args.data_dir or get_data_directory())
+    if args.worker:
+        __worker(args.worker, args.worker_output, data_dir)
+        return 0
+
+    names = __select(args.benchmark, [size.strip() for size in args.sizes.split(',') if size.strip()])
+    if args.list:
+        for name in names:
+            print(name)
+        return 0
+    if args.repeat < 1:
+        raise ValueError('The number of measurements must be at least 1.')
+    setup_loggers(verbose=args.verbose)
+    baseline = __read_results(args.baseline) if args.baseline else None
+
+    # Generated once and kept, so a run only pays for the first generation.
+    for name in names:
+        if BENCHMARKS[name]['kind'] in ('parse', 'summary'):
+            get_results_file(BENCHMARKS[name], data_dir)
+
+    results = {}
+    for name in names:
+        print(f'Running {name} ({args.repeat} times)...')
+        results[name] = __aggregate([__measure_once(name, data_dir, args.verbose) for _ in range(args.repeat)])
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance) if baseline else {}
+    print(format_results(results, baseline, regressions))
+    if args.output:
+        __write_results(args.output, results)
+    if args.save_baseline:
+        __write_results(args.save_baseline, results)
+    if regressions:
+        print(f'{len(regressions)} benchmarks regressed by more than {args.tolerance:.0%} since {args.baseline}.')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    exit(__main(argv[1:]))
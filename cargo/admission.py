@@ -0,0 +1,209 @@
+from .common import RunCommand
+from logging import getLogger
+from subprocess import CalledProcessError
+from threading import Condition
+from typing import Dict, Optional
+
+import os
+import signal
+
+def read_meminfo() -> Optional[Dict[str, int]]:
+    '''Reads /proc/meminfo in KiB, or returns None where it is not available.'''
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            return {line.split(':')[0]: int(line.split()[1]) for line in f if len(line.split()) > 1}
+    except (OSError, ValueError):
+        return None
+
+def read_available_memory_kb() -> Optional[int]:
+    '''Gets the memory available to new processes without swapping, in KiB, or None if unknown.'''
+    meminfo = read_meminfo()
+    if not meminfo:
+        return None
+    if 'MemAvailable' in meminfo:
+        return meminfo['MemAvailable']
+    # Kernels older than 3.14 do not report MemAvailable.
+    return meminfo.get('MemFree', 0) + meminfo.get('Cached', 0)
+
+def read_load_average() -> Optional[float]:
+    '''Gets the 1-minute load average, or None if unknown.'''
+    try:
+        with open('/proc/loadavg', 'r') as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+def __read_cgroup_memory_events() -> Optional[str]:
+    '''Gets the memory.events file of the cgroup (v2) this process runs in, if any.'''
+    try:
+        with open('/proc/self/cgroup', 'r') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    events = os.path.join('/sys/fs/cgroup', line[3:].strip().lstrip('/'), 'memory.events')
+                    return events if os.path.exists(events) else None
+    except OSError:
+        pass
+    return None
+
+def read_oom_kill_count() -> Optional[int]:
+    '''
+    Gets the number of processes the kernel OOM killer killed, or None if
+    unknown: in the cgroup of this process where cgroup v2 reports it, so OOM
+    kills elsewhere on the host do not count, otherwise since boot.
+    '''
+    try:
+        with open(__read_cgroup_memory_events() or '/proc/vmstat', 'r') as f:
+            for line in f:
+                if line.startswith('oom_kill '):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def is_killed(returncode: int) -> bool:
+    '''Checks whether an exit code reports a SIGKILL, either directly or through a shell (128 + 9).'''
+    sigkill = getattr(signal, 'SIGKILL', 9)
+    return returncode in (-sigkill, 128 + sigkill)
+
+class AdmissionController:
+    '''
+    Starts a command only when the machine has room for it: fewer than
+    `max_jobs` commands are running, the available memory minus the
+    reservations of the running commands still covers the new command's
+    reservation plus `headroom_kb`, and the load average is below `max_load`.
+    A command is always admitted when nothing else is running, so a large
+    reservation delays a command but never blocks it forever.
+    The running commands may not have allocated their reservation yet, so the
+    whole reservation is held back; this errs on the side of running fewer
+    commands at once.
+    '''
+
+    def __init__(
+            self,
+            max_jobs: int,
+            headroom_kb: int = 1024 * 1024,
+            max_load: Optional[float] = None,
+            poll_interval: float = 1.0,
+            oom_retries: int = 2):
+        if max_jobs < 1:
+            raise ValueError('The number of jobs must be at least 1.')
+        self.__max_jobs = max_jobs
+        self.__headroom_kb = headroom_kb
+        self.__max_load = max_load
+        self.__poll_interval = poll_interval
+        self.__oom_retries = oom_retries
+        self.__running = 0
+        self.__reserved_kb = 0
+        self.__condition = Condition()
+
+    @property
+    def max_jobs(self) -> int:
+        '''Current concurrency limit; halved every time a command is killed by the OOM killer.'''
+        return self.__max_jobs
+
+    @property
+    def headroom_kb(self) -> int:
+        '''Memory, in KiB, that must stay available after the reservations.'''
+        return self.__headroom_kb
+
+    @property
+    def max_load(self) -> Optional[float]:
+        '''1-minute load average above which no new command starts, or None to ignore the load.'''
+        return self.__max_load
+
+    def __can_admit(self, reservation_kb: int) -> bool:
+        if self.__running == 0:
+            return True
+        if self.__running >= self.__max_jobs:
+            return False
+        available = read_available_memory_kb()
+        if available is not None and available - self.__reserved_kb < reservation_kb + self.__headroom_kb:
+            return False
+        if self.__max_load is not None:
+            load = read_load_average()
+            if load is not None and load >= self.__max_load:
+                return False
+        return True
+
+    def acquire(self, reservation_kb: int = 0) -> None:
+        '''Waits until a command reserving `reservation_kb` KiB may start and reserves it.'''
+        with self.__condition:
+            while not self.__can_admit(reservation_kb):
+                # Memory and load change without notification, so poll them.
+                self.__condition.wait(self.__poll_interval)
+            self.__running += 1
+            self.__reserved_kb += reservation_kb
+
+    def release(self, reservation_kb: int = 0) -> None:
+        '''Releases the reservation of a finished command.'''
+        with self.__condition:
+            self.__running -= 1
+            self.__reserved_kb -= reservation_kb
+            self.__condition.notify_all()
+
+    def reduce_concurrency(self) -> None:
+        '''Halves the concurrency limit (down to 1).'''
+        with self.__condition:
+            self.__max_jobs = max(1, self.__max_jobs // 2)
+        getLogger().warning('Reduced the number of concurrent commands to %s.', self.__max_jobs)
+
+    def run(self, command: RunCommand, working_directory: Optional[str] = None, reservation_kb: int = 0) -> int:
+        '''
+        Runs a command once it is admitted. A command killed by the OOM killer
+        is queued again, up to `oom_retries` times, after halving the
+        concurrency limit; other failures are raised as usual.
+        param command: The command to run.
+        param working_directory: Working directory of the command.
+        param reservation_kb: Memory the command is expected to use, e.g. its historical peak RSS.
+        return: The exit code of the command.
+        '''
+        attempt = 0
+        while True:
+            self.acquire(reservation_kb)
+            oom_kills = read_oom_kill_count()
+            try:
+                return command.run(working_directory)
+            except CalledProcessError as ex:
+                if attempt >= self.__oom_retries or not self.__is_oom_kill(ex.returncode, oom_kills):
+                    raise
+                attempt += 1
+                getLogger().warning(
+                    '%sKilled by the OOM killer, queuing it again (attempt %s of %s).',
+                    f'[{command.name}] ' if command.name else '', attempt, self.__oom_retries)
+                self.reduce_concurrency()
+            finally:
+                self.release(reservation_kb)
+
+    @staticmethod
+    def __is_oom_kill(returncode: int, oom_kills_before: Optional[int]) -> bool:
+        '''
+        Requires the command to have been killed with SIGKILL and, where the
+        kernel reports it, an OOM kill during the run: the counter alone also
+        moves for processes killed by other concurrent commands or elsewhere.
+        '''
+        if not is_killed(returncode):
+            return False
+        oom_kills = read_oom_kill_count()
+        if oom_kills is not None and oom_kills_before is not None:
+            return oom_kills > oom_kills_before
+        return True
+
+class AdmissionStateManager:
+    def __init__(self):
+        self.controller = None
+    def set_controller(self, value: Optional[AdmissionController]): self.controller = value
+    def get_controller(self) -> Optional[AdmissionController]: return self.controller
+
+admission_state_manager = AdmissionStateManager()
+
+def set_admission_controller(controller: Optional[AdmissionController]) -> None:
+    '''Sets the controller test commands are admitted by; None runs them right away.'''
+    admission_state_manager.set_controller(controller)
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    '''Gets the controller test commands are admitted by.'''
+    return admission_state_manager.get_controller()
@@ -0,0 +1,77 @@
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Any, Awaitable, List, Optional, Tuple
+
+import asyncio
+
+class EventLoopThread:
+    '''
+    An asyncio event loop running in a daemon thread, so synchronous code can
+    hand it coroutines (e.g. child processes to drive) from any thread.
+    '''
+
+    def __init__(self):
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = Thread(target=self.__run, name='asyncio-commands', daemon=True)
+        self.__thread.start()
+
+    def __run(self) -> None:
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_forever()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        '''The event loop.'''
+        return self.__loop
+
+    def submit(self, coroutine: Awaitable) -> Future:
+        '''Schedules a coroutine on the loop. Cancelling the returned future cancels the coroutine.'''
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+class EventLoopStateManager:
+    def __init__(self):
+        self.loop_thread = None
+        self.lock = Lock()
+    def get_loop_thread(self) -> EventLoopThread:
+        with self.lock:
+            if self.loop_thread is None:
+                self.loop_thread = EventLoopThread()
+            return self.loop_thread
+
+event_loop_state_manager = EventLoopStateManager()
+
+def get_event_loop_thread() -> EventLoopThread:
+    '''Gets the event loop shared by all asyncio-backed commands, starting it on first use.'''
+    return event_loop_state_manager.get_loop_thread()
+
+def run_coroutine(coroutine: Awaitable) -> Any:
+    '''Runs a coroutine on the shared event loop and waits for its result.'''
+    future = get_event_loop_thread().submit(coroutine)
+    try:
+        return future.result()
+    except BaseException:
+        # E.g. KeyboardInterrupt: do not leave the child running.
+        future.cancel()
+        raise
+
+async def __run_limited(coroutines: List[Awaitable], max_concurrency: Optional[int]) -> List[Any]:
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run(coroutine: Awaitable) -> Any:
+        if semaphore is None:
+            return await coroutine
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+def run_commands(commands: List[Tuple[Any, Optional[str]]], max_concurrency: Optional[int] = None) -> List[Any]:
+    '''
+    Runs many commands concurrently on the shared event loop, without a thread
+    per child process.
+    param commands: (`RunCommand`, working directory) pairs.
+    param max_concurrency: Maximum number of commands running at once (default: all of them).
+    return: The exit code of every command, or the exception it raised, in order.
+    '''
+    return run_coroutine(__run_limited(
+        [command.run_async(working_directory) for (command, working_directory) in commands], max_concurrency))
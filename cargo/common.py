@@ -1,15 +1,23 @@
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from logging import getLogger
 from stat import S_IWRITE
 from shutil import rmtree
-from typing import List, Optional, Tuple
-from subprocess import CalledProcessError
+from typing import Dict, List, Optional, Tuple
+from subprocess import CalledProcessError, TimeoutExpired
 from subprocess import list2cmdline
 from subprocess import PIPE, STDOUT, DEVNULL
 from subprocess import Popen
-from io import StringIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Thread
+from time import monotonic, perf_counter
 
+from .aio import run_coroutine
+from .timings import record_timing, rusage_peak_rss_kb, get_own_peak_rss_kb
+
+import asyncio
 import os
+import signal
 import sys
 
 def get_python_executable() -> str:
@@ -33,14 +41,19 @@ def make_directory(path: str):
         raise TypeError('Undefined path.')
     os.makedirs(path, exist_ok=True)
 
-def remove_directory(path: str) -> None:
-    '''Recursively deletes a directory tree.'''
+def remove_directory(path: str, jobs: int = 1) -> None:
+    '''Recursively deletes a directory tree.
+    param path: The directory to delete.
+    param jobs: Number of threads deleting files concurrently; see `remove_tree`.
+    '''
     if not path:
         raise TypeError('Undefined path.')
     if not isinstance(path, str):
         raise TypeError('Invalid type.')
 
-    if os.path.isdir(path):
+    if os.path.isdir(path) and jobs > 1:
+        remove_tree(path, jobs)
+    elif os.path.isdir(path):
         def handle_rmtree_errors(func, path, exc_info):
             """
             Helper function to handle long path errors on Windows.
@@ -51,6 +64,75 @@ def remove_directory(path: str) -> None:
             func(path)
         rmtree(path, onexc=handle_rmtree_errors)
 
+def scan_tree(path: str, jobs: int = 8) -> Tuple[List[Tuple[str, int]], List[List[str]]]:
+    '''Lists a directory tree with `os.scandir`, one directory level at a time,
+    scanning the directories of a level concurrently.
+    Symbolic links are listed as files and never followed.
+    param path: The root of the tree.
+    param jobs: Number of threads scanning directories concurrently.
+    return: The files with their sizes, and the directories grouped by depth (the root first).
+    '''
+    def scan(directory: str) -> Tuple[List[Tuple[str, int]], List[str]]:
+        files = []
+        directories = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    else:
+                        files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+        except FileNotFoundError:
+            pass
+        return (files, directories)
+
+    files = []
+    levels = [[path]]
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        while levels[-1]:
+            level = []
+            for (level_files, directories) in executor.map(scan, levels[-1]):
+                files.extend(level_files)
+                level.extend(directories)
+            levels.append(level)
+    levels.pop()
+    return (files, levels)
+
+def remove_tree(path: str, jobs: int = 8) -> int:
+    '''
+    Deletes a directory tree with a thread pool: the tree is listed with
+    `scan_tree`, the files are unlinked concurrently in batches, then the
+    directories are removed deepest first. Unlinking is dominated by file
+    system latency, so it scales with threads even under the GIL.
+    param path: The directory to delete.
+    param jobs: Number of threads deleting concurrently.
+    return: The number of bytes deleted.
+    '''
+    if os.name == 'nt' and not path.startswith('\\\\?\\'):
+        # Extended-length paths, since build outputs nest deeply.
+        path = '\\\\?\\' + os.path.abspath(path)
+    (files, levels) = scan_tree(path, jobs)
+
+    def force(func, target: str) -> None:
+        try:
+            func(target)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Read-only files cannot be deleted on Windows.
+            os.chmod(target, S_IWRITE)
+            func(target)
+
+    def unlink(batch: List[Tuple[str, int]]) -> None:
+        for (file, _) in batch:
+            force(os.unlink, file)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        list(executor.map(unlink, (files[i:i + 256] for i in range(0, len(files), 256))))
+        for level in reversed(levels):
+            list(executor.map(lambda directory: force(os.rmdir, directory), level))
+    return sum(size for (_, size) in files)
+
 @contextmanager
 def push_dir(path: Optional[str] = None):
     '''
@@ -72,7 +154,134 @@ def push_dir(path: Optional[str] = None):
 
 def set_environment_variable(name: str, value: str, ):
     os.environ[name] = value
-    
+
+def kill_process_tree(pid: int) -> None:
+    '''
+    Kills a process and all its descendants. On POSIX the descendants are only
+    reached if the process was started as the leader of a new session
+    (`start_new_session=True`); otherwise only the process itself is killed.
+    '''
+    if os.name == 'nt':
+        Popen(['taskkill', '/F', '/T', '/PID', str(pid)], stdout=DEVNULL, stderr=DEVNULL).wait()
+    else:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Not a process group leader, or already gone.
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+def is_process_running(pid: int) -> bool:
+    '''Checks whether a process is running.'''
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows.
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class CommandTimeoutError(TimeoutExpired):
+    '''
+    Raised when a command was killed because it ran longer than its wall-clock
+    timeout, or did not print anything for longer than its inactivity timeout.
+    '''
+
+    def __init__(self, cmd: str, timeout: float, reason: str):
+        super().__init__(cmd, timeout)
+        self.reason = reason
+
+    def __str__(self) -> str:
+        if self.reason == 'inactivity':
+            return f"Command '{self.cmd}' printed no output for {self.timeout} seconds"
+        return f"Command '{self.cmd}' timed out after {self.timeout} seconds"
+
+# Size of the reads from the child output pipe.
+OUTPUT_CHUNK_SIZE = 64 * 1024
+# Default number of trailing output bytes `RunCommand` keeps in memory.
+DEFAULT_OUTPUT_LIMIT = 4 * 1024 * 1024
+# Engines `RunCommand` can drive child processes with: a pump and a watchdog
+# thread per child, or one asyncio event loop shared by all children.
+COMMAND_BACKENDS = ['thread', 'asyncio']
+
+class CommandBackendStateManager:
+    def __init__(self):
+        self.backend = 'thread'
+    def set_backend(self, value: str): self.backend = value
+    def get_backend(self) -> str: return self.backend
+
+command_backend_state_manager = CommandBackendStateManager()
+
+def set_default_command_backend(backend: str) -> None:
+    '''Sets the backend of the commands that do not specify one.'''
+    if backend not in COMMAND_BACKENDS:
+        raise ValueError(f'Unknown command backend {backend}; use one of {COMMAND_BACKENDS}.')
+    command_backend_state_manager.set_backend(backend)
+
+def get_default_command_backend() -> str:
+    '''Gets the backend of the commands that do not specify one.'''
+    return command_backend_state_manager.get_backend()
+
+class OutputCapture:
+    '''
+    Handles the output of a child process in large chunks: raw bytes go
+    straight to the log file, only a bounded tail is kept in memory, and lines
+    are decoded and logged only when echoing, one log record per chunk.
+    '''
+
+    def __init__(self, log, echo: bool, output_limit: Optional[int], prefix: str = ''):
+        self.__log = log
+        self.__echo = echo
+        self.__output_limit = output_limit
+        self.__prefix = prefix
+        self.__tail = deque()
+        self.__tail_size = 0
+        self.__pending = b''
+
+    def feed(self, chunk: bytes) -> None:
+        '''Handles the next chunk of output.'''
+        if self.__log is not None:
+            self.__log.write(chunk)
+        self.__tail.append(chunk)
+        self.__tail_size += len(chunk)
+        if self.__output_limit is not None:
+            # With a limit of 0 nothing is kept, so the tail can run empty.
+            while self.__tail and self.__tail_size - len(self.__tail[0]) >= self.__output_limit:
+                self.__tail_size -= len(self.__tail.popleft())
+        if self.__echo:
+            lines = (self.__pending + chunk).split(b'\n')
+            self.__pending = lines.pop()
+            if lines:
+                # One record per chunk rather than per line: a chatty child can
+                # print millions of lines, and every record has a fixed cost.
+                getLogger().info('\n'.join(
+                    self.__prefix + line.decode('utf-8', errors='backslashreplace').rstrip() for line in lines))
+
+    def close(self) -> str:
+        '''Echoes the last incomplete line and returns the kept tail of the output.'''
+        if self.__echo and self.__pending:
+            getLogger().info(self.__prefix + self.__pending.decode('utf-8', errors='backslashreplace').rstrip())
+            self.__pending = b''
+        output = b''.join(self.__tail)
+        if self.__output_limit is not None:
+            # Not output[-limit:], which would keep everything with a limit of 0.
+            output = output[max(len(output) - self.__output_limit, 0):]
+        return output.decode('utf-8', errors='backslashreplace')
+
 class RunCommand:
     '''
     This is a class wrapper around `subprocess.Popen` with an additional set
@@ -85,16 +294,35 @@ class RunCommand:
             success_exit_codes: Optional[List[int]] = None,
             verbose: bool = False,
             echo: bool = True,
-            retry: int = 0):
+            retry: int = 0,
+            env: Optional[Dict[str, str]] = None,
+            name: Optional[str] = None,
+            log_file: Optional[str] = None,
+            timeout: Optional[float] = None,
+            inactivity_timeout: Optional[float] = None,
+            output_limit: Optional[int] = DEFAULT_OUTPUT_LIMIT,
+            backend: Optional[str] = None):
         if cmdline is None:
             raise TypeError('Unspecified command line to be executed.')
         if not cmdline:
             raise ValueError('Specified command line is empty.')
+        if backend is not None and backend not in COMMAND_BACKENDS:
+            raise ValueError(f'Unknown command backend {backend}; use one of {COMMAND_BACKENDS}.')
 
         self.__cmdline = cmdline
         self.__verbose = verbose
         self.__retry = retry
         self.__echo = echo
+        self.__env = env
+        self.__name = name
+        self.__log_file = log_file
+        self.__timeout = timeout
+        self.__inactivity_timeout = inactivity_timeout
+        self.__timed_out = None
+        self.__output_limit = output_limit
+        self.__stdout = ''
+        self.__peak_rss_kb = None
+        self.__backend = backend
 
         if success_exit_codes is None:
             self.__success_exit_codes = [0]
@@ -124,70 +352,293 @@ class RunCommand:
         '''Enables/Disables verbosity.'''
         return self.__verbose
 
+    @property
+    def env(self) -> Optional[Dict[str, str]]:
+        '''
+        Environment of the child process. If not specified, the child inherits
+        the environment of the current process.
+        '''
+        return self.__env
+
+    @property
+    def name(self) -> Optional[str]:
+        '''Name used to prefix echoed lines, e.g. the test suite name.'''
+        return self.__name
+
+    @property
+    def log_file(self) -> Optional[str]:
+        '''File the output of the child process is also written to.'''
+        return self.__log_file
+
+    @property
+    def timeout(self) -> Optional[float]:
+        '''Wall-clock timeout of the command, in seconds.'''
+        return self.__timeout
+
+    @property
+    def inactivity_timeout(self) -> Optional[float]:
+        '''
+        Maximum time, in seconds, the command may run without printing
+        anything. Only applies when the output is captured.
+        '''
+        return self.__inactivity_timeout
+
+    @property
+    def output_limit(self) -> Optional[int]:
+        '''
+        Number of trailing output bytes kept in memory for `stdout`, or None to
+        keep all of it. The complete output is only available in `log_file`.
+        '''
+        return self.__output_limit
+
     @property
     def stdout(self) -> str:
-        return self.__stdout.getvalue()
+        '''The captured output (its last `output_limit` bytes).'''
+        return self.__stdout
+
+    @property
+    def backend(self) -> str:
+        '''
+        Engine driving the child process, "thread" or "asyncio". If not
+        specified, the default backend at the time the command runs.
+        '''
+        return self.__backend or get_default_command_backend()
+
+    @property
+    def peak_rss_kb(self) -> Optional[int]:
+        '''
+        Peak RSS of the last run, in KiB, including the descendants the child
+        waited for, or None where it cannot be measured, e.g. for a small
+        child that never outgrew the memory it inherited from this process.
+        '''
+        return self.__peak_rss_kb
+
+    def __prepare(self, working_directory: Optional[str]) -> Tuple[bool, str, Optional[str], str]:
+        '''Logs the command and returns whether to pipe its output, the log prefix, the working directory and the quoted command line.'''
+        should_pipe = self.verbose or self.log_file is not None
+        prefix = f'[{self.name}] ' if self.name else ''
+        cwd = None
+        if working_directory:
+            # Hand the working directory to the child instead of calling
+            # `push_dir`, so commands can safely run from several threads.
+            cwd = working_directory if os.path.isabs(working_directory) else os.path.abspath(working_directory)
+            getLogger().info('%s$ cd "%s"', prefix, cwd)
+
+        quoted_cmdline = '$ '
+        quoted_cmdline += list2cmdline(self.cmdline)
+
+        getLogger().info(prefix + quoted_cmdline)
+        self.__timed_out = None
+        self.__peak_rss_kb = None
+        return (should_pipe, prefix, cwd, quoted_cmdline)
+
+    def __record(
+            self, start: float, returncode: int, quoted_cmdline: str,
+            rusage=None, inherited_rss_kb: Optional[int] = None) -> None:
+        fields = {'wall': perf_counter() - start, 'returncode': returncode, 'cmdline': quoted_cmdline[2:]}
+        if rusage is not None:
+            fields['user'] = rusage.ru_utime
+            fields['sys'] = rusage.ru_stime
+            peak_rss_kb = rusage_peak_rss_kb(rusage.ru_maxrss)
+            # The child inherits the peak RSS of this process when it is forked;
+            # a peak that never grew past it is this process's memory, not the child's.
+            if inherited_rss_kb is None or peak_rss_kb > inherited_rss_kb:
+                fields['peak_rss_kb'] = self.__peak_rss_kb = peak_rss_kb
+        record_timing('command', self.name or os.path.basename(self.cmdline[0]), **fields)
 
     def __runinternal(self, working_directory: Optional[str] = None) -> Tuple[int, str]:
-        should_pipe = self.verbose
-        with push_dir(working_directory):
-            quoted_cmdline = '$ '
-            quoted_cmdline += list2cmdline(self.cmdline)
-
-            getLogger().info(quoted_cmdline)
-
-            with Popen(
-                    self.cmdline,
-                    stdout=PIPE if should_pipe else DEVNULL,
-                    stderr=STDOUT,
-                    universal_newlines=False,
-                    encoding=None,
-                    bufsize=0
-            ) as proc:
+        if self.backend == 'asyncio':
+            return run_coroutine(self.__runinternal_async(working_directory))
+
+        (should_pipe, prefix, cwd, quoted_cmdline) = self.__prepare(working_directory)
+        watch = self.timeout is not None or (should_pipe and self.inactivity_timeout is not None)
+        inherited_rss_kb = get_own_peak_rss_kb()
+        with Popen(
+                self.cmdline,
+                stdout=PIPE if should_pipe else DEVNULL,
+                stderr=STDOUT,
+                universal_newlines=False,
+                encoding=None,
+                bufsize=0,
+                cwd=cwd,
+                env=self.env,
+                # A new session lets the watchdog kill the whole process tree.
+                start_new_session=watch and os.name != 'nt'
+        ) as proc:
+            start = perf_counter()
+            last_output = [monotonic()]
+            stop = Event()
+            if watch:
+                watchdog = Thread(target=self.__watchdog, args=(proc, last_output, stop, should_pipe), daemon=True)
+                watchdog.start()
+            try:
                 if proc.stdout is not None:
-                    with proc.stdout:
-                        self.__stdout = StringIO()
-                        for raw_line in iter(proc.stdout.readline, b''):
-                            line = raw_line.decode('utf-8', errors='backslashreplace')
-                            self.__stdout.write(line)
-                            line = line.rstrip()
-                            if self.echo:
-                                getLogger().info(line)
-                proc.wait()
-                return (proc.returncode, quoted_cmdline)
+                    with proc.stdout, open(self.log_file, 'ab') if self.log_file else nullcontext() as log:
+                        self.__pump(proc.stdout, log, last_output, prefix)
+                rusage = self.__wait(proc)
+            except BaseException:
+                # A child in a new session does not get the terminal's Ctrl-C;
+                # do not leave it running without its watchdog.
+                if proc.returncode is None:
+                    kill_process_tree(proc.pid)
+                raise
+            finally:
+                stop.set()
+            self.__record(start, proc.returncode, quoted_cmdline, rusage, inherited_rss_kb)
+            return (proc.returncode, quoted_cmdline)
 
+    async def __runinternal_async(self, working_directory: Optional[str] = None) -> Tuple[int, str]:
+        '''
+        Runs the command on the current event loop: the output is read without
+        blocking and the timeouts are enforced by the loop, so no thread is
+        needed per child. The peak RSS is not measured, since the loop reaps
+        the child.
+        '''
+        (should_pipe, prefix, cwd, quoted_cmdline) = self.__prepare(working_directory)
+        proc = await asyncio.create_subprocess_exec(
+            *self.cmdline,
+            stdout=PIPE if should_pipe else DEVNULL,
+            stderr=STDOUT,
+            cwd=cwd,
+            env=self.env,
+            # Always a new session: cancelling the task kills the process tree,
+            # not only on a timeout.
+            start_new_session=os.name != 'nt')
+        start = perf_counter()
+        try:
+            await asyncio.wait_for(self.__communicate_async(proc, prefix), self.timeout)
+        except asyncio.TimeoutError:
+            self.__timed_out = ('timeout', self.timeout)
+            self.__kill(proc.pid)
+            await proc.wait()
+        except asyncio.CancelledError:
+            kill_process_tree(proc.pid)
+            await proc.wait()
+            raise
+        self.__record(start, proc.returncode, quoted_cmdline)
+        return (proc.returncode, quoted_cmdline)
 
-    def run(self, working_directory: Optional[str] = None) -> int:
-        '''Executes specified shell command.'''
+    async def __communicate_async(self, proc, prefix: str) -> None:
+        if proc.stdout is not None:
+            with open(self.log_file, 'ab') if self.log_file else nullcontext() as log:
+                capture = OutputCapture(log, self.echo, self.output_limit, prefix)
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(proc.stdout.read(OUTPUT_CHUNK_SIZE), self.inactivity_timeout)
+                        except asyncio.TimeoutError:
+                            self.__timed_out = ('inactivity', self.inactivity_timeout)
+                            self.__kill(proc.pid)
+                            break
+                        if not chunk:
+                            break
+                        capture.feed(chunk)
+                finally:
+                    self.__stdout = capture.close()
+        await proc.wait()
 
+    def __kill(self, pid: int) -> None:
+        '''Kills the process tree of a command that timed out.'''
+        getLogger().error(
+            '%sKilling process tree %s: %s',
+            f'[{self.name}] ' if self.name else '', pid,
+            'timed out' if self.__timed_out[0] == 'timeout' else 'no output')
+        kill_process_tree(pid)
+
+    @staticmethod
+    def __wait(proc: Popen):
+        '''
+        Waits for the process and returns its resource usage (CPU times and
+        peak RSS) where `os.wait4` is available, None otherwise.
+        '''
+        if not hasattr(os, 'wait4'):
+            proc.wait()
+            return None
+        (_, status, rusage) = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return rusage
+
+    def __pump(self, stdout, log, last_output: List[float], prefix: str) -> None:
+        '''Copies the child output until the pipe is closed.'''
+        capture = OutputCapture(log, self.echo, self.output_limit, prefix)
+        # The pipe is unbuffered, so `read` returns whatever is available.
+        for chunk in iter(lambda: stdout.read(OUTPUT_CHUNK_SIZE), b''):
+            last_output[0] = monotonic()
+            capture.feed(chunk)
+        self.__stdout = capture.close()
+
+    def __watchdog(self, proc: Popen, last_output: List[float], stop: Event, check_inactivity: bool) -> None:
+        '''Kills the process tree once the wall-clock or inactivity timeout expires.'''
+        start = monotonic()
+        while not stop.wait(1.0):
+            now = monotonic()
+            if self.timeout is not None and now - start > self.timeout:
+                self.__timed_out = ('timeout', self.timeout)
+            elif check_inactivity and self.inactivity_timeout is not None and now - last_output[0] > self.inactivity_timeout:
+                self.__timed_out = ('inactivity', self.inactivity_timeout)
+            else:
+                continue
+            self.__kill(proc.pid)
+            return
+
+    def __runretry(self, working_directory: Optional[str] = None) -> int:
+        '''Runs the command, retrying on failure, and raises if it did not succeed.'''
         retrycount = 0
         (returncode, quoted_cmdline) = self.__runinternal(working_directory)
-        while returncode not in self.success_exit_codes and self.__retry != 0 and retrycount < self.__retry:
+        while returncode not in self.success_exit_codes and self.__timed_out is None \
+                and self.__retry != 0 and retrycount < self.__retry:
             (returncode, _) = self.__runinternal(working_directory)
             retrycount += 1
+        return self.__check(returncode, quoted_cmdline)
+
+    async def __runretry_async(self, working_directory: Optional[str] = None) -> int:
+        '''Same as `__runretry`, on the current event loop.'''
+        retrycount = 0
+        (returncode, quoted_cmdline) = await self.__runinternal_async(working_directory)
+        while returncode not in self.success_exit_codes and self.__timed_out is None \
+                and self.__retry != 0 and retrycount < self.__retry:
+            (returncode, _) = await self.__runinternal_async(working_directory)
+            retrycount += 1
+        return self.__check(returncode, quoted_cmdline)
+
+    def __check(self, returncode: int, quoted_cmdline: str) -> int:
+        if self.__timed_out is not None:
+            (reason, timeout) = self.__timed_out
+            raise CommandTimeoutError(quoted_cmdline, timeout, reason)
 
         if returncode not in self.success_exit_codes:
             getLogger().error(
-                "Process exited with status %s", returncode)
+                "%sProcess exited with status %s",
+                f'[{self.name}] ' if self.name else '', returncode)
             raise CalledProcessError(
                 returncode, quoted_cmdline)
-        
+
         return returncode
-    
+
+    def run(self, working_directory: Optional[str] = None) -> int:
+        '''
+        Executes specified shell command. Raises `CommandTimeoutError` if the
+        command was killed by the watchdog.
+        '''
+        return self.__runretry(working_directory)
+
     def run_and_get_output(self, working_directory: Optional[str] = None) -> str:
         '''
         Executes specified shell command and returns its output.
         '''
-        retrycount = 0
-        (returncode, quoted_cmdline) = self.__runinternal(working_directory)
-        while returncode not in self.success_exit_codes and self.__retry != 0 and retrycount < self.__retry:
-            (returncode, _) = self.__runinternal(working_directory)
-            retrycount += 1
+        self.__runretry(working_directory)
+        return self.stdout
 
-        if returncode not in self.success_exit_codes:
-            getLogger().error(
-                "Process exited with status %s", returncode)
-            raise CalledProcessError(
-                returncode, quoted_cmdline)
+    async def run_async(self, working_directory: Optional[str] = None) -> int:
+        '''
+        Executes specified shell command on the current event loop, whatever
+        the backend. Cancelling the task kills the process tree.
+        '''
+        return await self.__runretry_async(working_directory)
 
-        return self.stdout
\ No newline at end of file
+    async def run_and_get_output_async(self, working_directory: Optional[str] = None) -> str:
+        '''
+        Executes specified shell command on the current event loop and returns its output.
+        '''
+        await self.__runretry_async(working_directory)
+        return self.stdout
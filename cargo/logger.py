@@ -1,23 +1,197 @@
 from datetime import datetime
-from logging import FileHandler, Formatter, StreamHandler
+from logging import FileHandler, Formatter, LogRecord, StreamHandler
 from logging import getLogger
 from logging import INFO, WARNING
+from logging.handlers import QueueHandler, QueueListener
 from os import getpid, makedirs, path
+from queue import SimpleQueue
+from typing import Optional
+from shutil import copyfileobj
+from threading import Thread
 from time import time
 
+import atexit
+import gzip
+import os
+import re
 import sys
 import __main__
 
-from .common import get_root_path
+from .common import get_root_path, is_process_running
+from .timings import set_timings_file
+
+# Size at which the log file of a run is rotated, and the number of
+# compressed rotated files kept per run.
+LOG_MAX_BYTES = 64 * 1024 * 1024
+LOG_BACKUP_COUNT = 10
+# Retention of the log directory, applied when the loggers are set up: log
+# files of earlier runs are compressed once they are LOG_COMPRESS_AGE seconds
+# old, deleted after LOG_RETENTION_DAYS, and the oldest are deleted while the
+# directory holds more than LOG_RETENTION_BYTES.
+LOG_COMPRESS_AGE = 60 * 60
+LOG_RETENTION_DAYS = 30
+LOG_RETENTION_BYTES = 2 * 1024 * 1024 * 1024
+
+# Log files carry the ID of the process writing them.
+__LOG_PID = re.compile(r'-pid(\d+)[.-]')
+
 class LoggerStateManager:
     def __init__(self):
         self.logger_initialized = False
+        self.listener = None
     def set_initialized(self, value: bool): self.logger_initialized = value
     def get_initialized(self) -> bool: return self.logger_initialized
+    def set_listener(self, value): self.listener = value
+    def get_listener(self): return self.listener
 
 logger_state_manager = LoggerStateManager()
+
+def get_log_directory() -> str:
+    '''Gets the directory the log files are written to.'''
+    log_dir = path.join(get_root_path(), 'logs')
+    makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+def get_command_log_file(name: str, timestamp: str) -> str:
+    '''Gets the log file of a command started by this process, e.g. a test suite.
+    param name: What the command does, e.g. "run-GC".
+    param timestamp: Start time of the command or of the group of commands it belongs to.
+    '''
+    return path.join(get_log_directory(), f'{timestamp}-{name}-pid{getpid()}.log')
+
+def compress_file(source: str, destination: str) -> None:
+    '''Compresses a file with gzip and removes the original.'''
+    with open(source, 'rb') as f_in, gzip.open(f'{destination}.tmp', 'wb', compresslevel=6) as f_out:
+        copyfileobj(f_in, f_out, 1024 * 1024)
+    os.replace(f'{destination}.tmp', destination)
+    os.remove(source)
+
+def apply_log_retention(
+        log_dir: str,
+        compress_age: float = LOG_COMPRESS_AGE,
+        retention_days: float = LOG_RETENTION_DAYS,
+        retention_bytes: int = LOG_RETENTION_BYTES) -> None:
+    '''Compresses, then deletes, the log files of earlier runs. Files of
+    running processes, this one included, are left alone however quiet they are.
+    param log_dir: The log directory.
+    param compress_age: Age, in seconds, after which uncompressed files are compressed.
+    param retention_days: Age, in days, after which files are deleted.
+    param retention_bytes: Size the directory is kept under by deleting the oldest files.
+    '''
+    now = time()
+    entries = []
+    with os.scandir(log_dir) as it:
+        for entry in it:
+            if not entry.is_file() or entry.name.endswith('.tmp'):
+                continue
+            pid = __LOG_PID.search(entry.name)
+            if pid and is_process_running(int(pid.group(1))):
+                continue
+            stat = entry.stat()
+            entries.append([entry.path, stat.st_mtime, stat.st_size])
+    for item in entries:
+        (file, mtime, _) = item
+        if file.endswith('.gz') or now - mtime < compress_age:
+            continue
+        try:
+            compress_file(file, f'{file}.gz')
+            os.utime(f'{file}.gz', (mtime, mtime))
+            item[0] = f'{file}.gz'
+            item[2] = path.getsize(item[0])
+        except OSError as ex:
+            getLogger().warning('Unable to compress %s: %s', file, ex)
+    entries.sort(key=lambda item: item[1])
+    total = sum(item[2] for item in entries)
+    for (file, mtime, size) in entries:
+        if now - mtime < retention_days * 24 * 60 * 60 and total <= retention_bytes:
+            break
+        # Never delete what was written in the last hour; it may belong to a running process.
+        if now - mtime < LOG_COMPRESS_AGE:
+            break
+        try:
+            os.remove(file)
+            total -= size
+        except OSError as ex:
+            getLogger().warning('Unable to delete %s: %s', file, ex)
+
+class QueuedStreamHandler(StreamHandler):
+    '''
+    A `StreamHandler` run by a `QueueListener`, flushing once the queue is
+    drained instead of after every record.
+    '''
+
+    def __init__(self, queue: Optional[SimpleQueue] = None, stream=None):
+        super().__init__(stream)
+        self.__queue = queue
+
+    def flush(self) -> None:
+        if self.__queue is None or self.__queue.empty():
+            super().flush()
+
+class CompressingRotatingFileHandler(FileHandler):
+    '''
+    Writes log records to a file and rotates it once it reaches about
+    `max_bytes`: rotated files are gzip-compressed (`<file>.1.gz` being the
+    newest) and only `backup_count` of them are kept. Run by a
+    `QueueListener`, it flushes once the queue is drained instead of after
+    every record.
+    '''
+
+    def __init__(self, file: str, max_bytes: int, backup_count: int, queue: Optional[SimpleQueue] = None):
+        super().__init__(file, encoding='utf-8', delay=True)
+        self.__max_bytes = max_bytes
+        self.__backup_count = backup_count
+        self.__queue = queue
+        # Tracked instead of asking the file, which would flush it every record.
+        self.__size = path.getsize(file) if path.isfile(file) else 0
+
+    def emit(self, record: LogRecord) -> None:
+        try:
+            message = self.format(record) + self.terminator
+            # The limit is in bytes; non-ASCII characters take several.
+            size = len(message.encode(self.encoding or 'utf-8'))
+            if self.__max_bytes and self.__size and self.__size + size > self.__max_bytes:
+                self.__rotate()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(message)
+            self.__size += size
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        if self.__queue is None or self.__queue.empty():
+            super().flush()
+
+    def __rotate(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        for index in range(self.__backup_count - 1, 0, -1):
+            if path.exists(f'{self.baseFilename}.{index}.gz'):
+                os.replace(f'{self.baseFilename}.{index}.gz', f'{self.baseFilename}.{index + 1}.gz')
+        if self.__backup_count > 0:
+            compress_file(self.baseFilename, f'{self.baseFilename}.1.gz')
+        else:
+            os.remove(self.baseFilename)
+        self.__size = 0
+
+def shutdown_loggers() -> None:
+    '''Writes the queued log records and stops the background writer.'''
+    listener = logger_state_manager.get_listener()
+    if listener is not None:
+        logger_state_manager.set_listener(None)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+
 def setup_loggers(verbose: bool):
-    '''Setup the root logger for the performance scripts.'''
+    '''Setup the root logger for the performance scripts.
+    Records are queued by the logging call and written by a background
+    thread, so a slow console or disk does not hold up the caller (e.g. the
+    thread pumping a child's output).
+    '''
     def __formatter() -> Formatter:
         fmt = '[%(asctime)s][%(levelname)s] %(message)s'
         datefmt = "%Y/%m/%d %H:%M:%S"
@@ -29,12 +203,21 @@ def setup_loggers(verbose: bool):
 
         getLogger().setLevel(INFO)
 
-        # Log console handler
-        getLogger().addHandler(__get_console_handler(verbose))
-
-        # Log file handler
         log_file_name = __generate_log_file_name(launch_datetime)
-        getLogger().addHandler(__get_file_handler(log_file_name))
+        # Console and file handlers run on the listener thread.
+        queue = SimpleQueue()
+        listener = QueueListener(
+            queue,
+            __get_console_handler(verbose, queue),
+            __get_file_handler(log_file_name, queue),
+            respect_handler_level=True)
+        getLogger().addHandler(QueueHandler(queue))
+        listener.start()
+        logger_state_manager.set_listener(listener)
+        atexit.register(shutdown_loggers)
+
+        # Machine-readable timings next to the log file
+        set_timings_file(path.splitext(log_file_name)[0] + '.timings.jsonl')
 
         # Log level
         getLogger().setLevel(INFO)
@@ -44,10 +227,11 @@ def setup_loggers(verbose: bool):
         getLogger().info(start_msg)
         getLogger().info('-' * len(start_msg))
 
+        Thread(target=apply_log_retention, args=(path.dirname(log_file_name),), name='log-retention', daemon=True).start()
+
     def __generate_log_file_name(launch_datetime: datetime) -> str:
         '''Generates a unique log file name for the current script.'''
-        log_dir = path.join(get_root_path(), 'logs')
-        makedirs(log_dir, exist_ok=True)
+        log_dir = get_log_directory()
 
         if not hasattr(__main__, '__file__'):
             script_name = 'python_interactive_mode'
@@ -59,15 +243,15 @@ def setup_loggers(verbose: bool):
             timestamp, script_name, getpid())
         return path.join(log_dir, log_file_name)
 
-    def __get_console_handler(verbose: bool):
-        console_handler = StreamHandler()
+    def __get_console_handler(verbose: bool, queue: SimpleQueue) -> StreamHandler:
+        console_handler = QueuedStreamHandler(queue)
         level = INFO if verbose else WARNING
         console_handler.setLevel(level)
         console_handler.setFormatter(__formatter())
         return console_handler
 
-    def __get_file_handler(file: str) -> FileHandler:
-        file_handler = FileHandler(file, encoding='utf-8')
+    def __get_file_handler(file: str, queue: SimpleQueue) -> FileHandler:
+        file_handler = CompressingRotatingFileHandler(file, LOG_MAX_BYTES, LOG_BACKUP_COUNT, queue)
         file_handler.setLevel(INFO)
         file_handler.setFormatter(__formatter())
         return file_handler
@@ -75,4 +259,3 @@ def setup_loggers(verbose: bool):
     if not logger_state_manager.get_initialized():
         __initialize(verbose)
         logger_state_manager.set_initialized(True)
-    
\ No newline at end of file
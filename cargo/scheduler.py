@@ -0,0 +1,151 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging import getLogger
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+class Task:
+    '''
+    A node of the dependency graph run by `TaskScheduler`.
+    '''
+
+    def __init__(self, name: str, action: Callable[[], Any], dependencies: Optional[List[str]] = None):
+        if not name:
+            raise ValueError('Unspecified task name.')
+        if action is None:
+            raise TypeError('Unspecified task action.')
+        self.name = name
+        self.action = action
+        self.dependencies = list(dependencies or [])
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        # Timestamps relative to the start of the schedule, in seconds.
+        self.ready_time = None
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def blocked(self) -> float:
+        '''Time spent waiting for the dependencies to finish.'''
+        return self.ready_time or 0.0
+
+    @property
+    def waiting(self) -> float:
+        '''Time spent ready but waiting for a free worker.'''
+        if self.ready_time is None or self.start_time is None:
+            return 0.0
+        return self.start_time - self.ready_time
+
+    @property
+    def running(self) -> float:
+        '''Time spent running the action.'''
+        if self.start_time is None or self.end_time is None:
+            return 0.0
+        return self.end_time - self.start_time
+
+class TaskScheduler:
+    '''
+    Runs a dependency graph of tasks, starting every task as soon as all its
+    dependencies completed, with at most `max_workers` tasks running at once.
+    A failed task skips its dependents; the other tasks keep running.
+    '''
+
+    def __init__(self, max_workers: int = 1):
+        if max_workers < 1:
+            raise ValueError('The number of workers must be at least 1.')
+        self.__max_workers = max_workers
+        self.__tasks = {}  # type: Dict[str, Task]
+
+    @property
+    def tasks(self) -> Dict[str, Task]:
+        '''The tasks of the graph, in insertion order.'''
+        return self.__tasks
+
+    def add(self, name: str, action: Callable[[], Any], dependencies: Optional[List[str]] = None) -> Task:
+        '''Adds a task to the graph. Dependencies must be added before their dependents.'''
+        if name in self.__tasks:
+            raise ValueError(f'Task {name} already exists.')
+        for dependency in dependencies or []:
+            if dependency not in self.__tasks:
+                raise ValueError(f'Task {name} depends on unknown task {dependency}.')
+        task = Task(name, action, dependencies)
+        self.__tasks[name] = task
+        return task
+
+    def run(self) -> Dict[str, Task]:
+        '''
+        Runs all tasks and returns them. Raises the error of the first failed
+        task once every runnable task has finished.
+        '''
+        start = perf_counter()
+        pending = dict(self.__tasks)
+        running = {}
+        first_error = None
+
+        def execute(task: Task) -> Any:
+            task.start_time = perf_counter() - start
+            try:
+                return task.action()
+            finally:
+                task.end_time = perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            while pending or running:
+                for task in list(pending.values()):
+                    states = [self.__tasks[d].status for d in task.dependencies]
+                    if any(state in ('failed', 'skipped') for state in states):
+                        task.status = 'skipped'
+                        del pending[task.name]
+                        getLogger().warning('Skipping task %s: a dependency did not complete.', task.name)
+                    elif all(state == 'completed' for state in states):
+                        task.status = 'running'
+                        task.ready_time = perf_counter() - start
+                        del pending[task.name]
+                        running[executor.submit(execute, task)] = task
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        task.result = future.result()
+                        task.status = 'completed'
+                    except Exception as ex:
+                        getLogger().error('Task %s failed: %s', task.name, ex)
+                        task.status = 'failed'
+                        task.error = ex
+                        if first_error is None:
+                            first_error = ex
+
+        if first_error is not None:
+            raise first_error
+        return self.__tasks
+
+    def critical_path(self) -> List[Task]:
+        '''
+        Gets the chain of tasks that determined the total duration: starting
+        from the task that finished last, follows the dependency that finished
+        last.
+        '''
+        finished = [t for t in self.__tasks.values() if t.end_time is not None]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda t: t.end_time)]
+        while True:
+            dependencies = [self.__tasks[d] for d in path[-1].dependencies if self.__tasks[d].end_time is not None]
+            if not dependencies:
+                break
+            path.append(max(dependencies, key=lambda t: t.end_time))
+        path.reverse()
+        return path
+
+    def report(self) -> str:
+        '''Formats the time every task spent blocked, waiting and running as a Markdown table.'''
+        output = '| Task | Status | Blocked (s) | Waiting (s) | Running (s) |\n|------|--------|-------------|-------------|-------------|\n'
+        for task in self.__tasks.values():
+            output += f'| {task.name} | {task.status} | {task.blocked:.1f} | {task.waiting:.1f} | {task.running:.1f} |\n'
+        path = self.critical_path()
+        if path:
+            output += '\nCritical path: ' + ' -> '.join(task.name for task in path)
+            output += f' ({path[-1].end_time:.1f}s)\n'
+        return output
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from logging import getLogger
+from threading import Lock
+from time import perf_counter, time
+from typing import Dict, List, Optional
+
+import gzip
+import json
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; CPU times and peak RSS are then not recorded.
+    resource = None
+
+class TimingsStateManager:
+    def __init__(self):
+        self.timings_file = None
+        self.lock = Lock()
+    def set_file(self, value: Optional[str]): self.timings_file = value
+    def get_file(self) -> Optional[str]: return self.timings_file
+
+timings_state_manager = TimingsStateManager()
+
+def set_timings_file(timings_file: Optional[str]) -> None:
+    '''Sets the JSONL file timings are appended to. Nothing is recorded until it is set.'''
+    timings_state_manager.set_file(timings_file)
+
+def get_timings_file() -> Optional[str]:
+    '''Gets the JSONL file timings are appended to.'''
+    return timings_state_manager.get_file()
+
+def rusage_peak_rss_kb(ru_maxrss: int) -> int:
+    '''Converts `ru_maxrss` to KiB (it is reported in bytes on macOS).'''
+    return ru_maxrss // 1024 if sys.platform == 'darwin' else ru_maxrss
+
+def get_own_peak_rss_kb() -> Optional[int]:
+    '''
+    Gets the peak RSS of this process, in KiB, or None where it cannot be
+    measured. A child forked from this process starts with it as its own peak,
+    so a child peak at or below it does not measure the child.
+    '''
+    if resource is None:
+        return None
+    return rusage_peak_rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def record_timing(kind: str, name: str, **fields) -> None:
+    '''Appends a timing record to the timings file.
+    param kind: Kind of the record, e.g. "stage" or "command".
+    param name: Name of the stage or command.
+    param fields: Measurements, e.g. wall, user, sys (seconds) and peak_rss_kb.
+    '''
+    timings_file = get_timings_file()
+    if not timings_file:
+        return
+    record = {'kind': kind, 'name': name, 'time': time()}
+    record.update(fields)
+    line = json.dumps(record) + '\n'
+    with timings_state_manager.lock:
+        with open(timings_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+@contextmanager
+def timed_stage(name: str):
+    '''
+    Records the wall time of a stage, the user/sys CPU time of this process and
+    its children during the stage, and the peak RSS of the children so far.
+    '''
+    start = perf_counter()
+    before = __rusage()
+    status = 'failed'
+    try:
+        yield
+        status = 'completed'
+    finally:
+        fields = {'wall': perf_counter() - start, 'status': status}
+        after = __rusage()
+        if before and after:
+            fields['user'] = after['user'] - before['user']
+            fields['sys'] = after['sys'] - before['sys']
+            if after['peak_rss_kb'] > after['own_peak_rss_kb']:
+                fields['peak_rss_kb'] = after['peak_rss_kb']
+        record_timing('stage', name, **fields)
+        getLogger().info('Stage %s %s in %.1fs', name, status, fields['wall'])
+
+def __rusage() -> Optional[Dict]:
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'user': own.ru_utime + children.ru_utime,
+        'sys': own.ru_stime + children.ru_stime,
+        'peak_rss_kb': rusage_peak_rss_kb(children.ru_maxrss),
+        'own_peak_rss_kb': rusage_peak_rss_kb(own.ru_maxrss)
+    }
+
+def read_timings(timings_file: str) -> List[Dict]:
+    '''Reads the records of a timings file (possibly gzip-compressed by the log retention), skipping malformed lines.'''
+    records = []
+    with (gzip.open if timings_file.endswith('.gz') else open)(timings_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def format_profile(records: List[Dict], top: int = 10) -> str:
+    '''Formats the slowest stages and commands as Markdown tables.'''
+    output = ''
+    for kind, title in (('stage', 'Stages'), ('command', 'Commands')):
+        selected = sorted((r for r in records if r.get('kind') == kind), key=lambda r: r.get('wall', 0), reverse=True)
+        total = sum(r.get('wall', 0) for r in selected)
+        output += f'# {title} ({len(selected)}, {total:.1f}s)\n\n'
+        output += '| Name | Wall (s) | User (s) | Sys (s) | Peak RSS (MiB) |\n|------|----------|----------|---------|----------------|\n'
+        for r in selected[:top]:
+            def value(key: str) -> str:
+                return f'{r[key]:.1f}' if r.get(key) is not None else 'NA'
+            rss = f"{r['peak_rss_kb'] / 1024:.0f}" if r.get('peak_rss_kb') is not None else 'NA'
+            output += f"| {r['name']} | {value('wall')} | {value('user')} | {value('sys')} | {rss} |\n"
+        output += '\n'
+    return output
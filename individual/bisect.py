@@ -0,0 +1,148 @@
+from cargo.common import CommandTimeoutError, RunCommand, get_root_path
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from os import path, makedirs
+from subprocess import CalledProcessError
+from typing import Dict, List, Optional
+
+import hashlib
+
+def __git(repo_root: str, cmdline: List[str]) -> str:
+    return RunCommand(['git'] + cmdline, verbose=True, echo=False, output_limit=None).run_and_get_output(repo_root)
+
+def get_commit_range(repo_root: str, good: str, bad: str) -> List[str]:
+    '''Lists the first-parent commits after `good` up to and including `bad`, oldest first.'''
+    output = __git(repo_root, ['rev-list', '--first-parent', '--reverse', f'{good}..{bad}'])
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+def prepare_worktrees(repo_root: str, count: int, worktree_root: Optional[str] = None) -> List[str]:
+    '''Creates (or reuses) detached git worktrees of the repository.
+    Worktrees are kept between bisections so that their build outputs can be
+    reused incrementally.
+    param repo_root: The root directory of the repository.
+    param count: Number of worktrees.
+    param worktree_root: Directory holding the worktrees (default cache/bisect/<hash of the repository path>,
+    so that bisections of different clones do not share worktrees).
+    return: The worktree directories.
+    '''
+    if worktree_root is None:
+        key = hashlib.sha1(path.abspath(repo_root).encode('utf-8')).hexdigest()[:12]
+        worktree_root = path.join(get_root_path(), 'cache', 'bisect', key)
+    makedirs(worktree_root, exist_ok=True)
+    # Drop registrations of worktrees whose directory was deleted.
+    __git(repo_root, ['worktree', 'prune'])
+    worktrees = []
+    for index in range(count):
+        worktree = path.join(path.abspath(worktree_root), f'wt{index}')
+        if not path.exists(path.join(worktree, '.git')):
+            __git(repo_root, ['worktree', 'add', '--detach', worktree, 'HEAD'])
+        worktrees.append(worktree)
+    return worktrees
+
+def __expand(cmdline: List[str], worktree: str, commit: str, test: str) -> List[str]:
+    return [arg.format(worktree=worktree, commit=commit, test=test) for arg in cmdline]
+
+def test_commit(
+        worktree: str,
+        commit: str,
+        test: str,
+        test_cmdline: List[str],
+        build_cmdlines: Optional[List[List[str]]] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None) -> str:
+    '''Checks out a commit in a worktree, builds it and runs the test.
+    The command lines may use the {worktree}, {commit} and {test} placeholders.
+    param worktree: The worktree to use.
+    param commit: The commit to test.
+    param test: The test being bisected.
+    param test_cmdline: Command running the test; exit code 0 means the test passed.
+    param build_cmdlines: Commands building the commit, run in order.
+    param env: Environment of the build and test commands.
+    param timeout: Wall-clock timeout of the test, in seconds; a timeout counts as a failure.
+    return: "good", "bad" or "skip" (the commit could not be built).
+    '''
+    __git(worktree, ['checkout', '--quiet', '--detach', '--force', commit])
+    name = commit[:10]
+    for cmdline in build_cmdlines or []:
+        try:
+            RunCommand(__expand(cmdline, worktree, commit, test), verbose=True, echo=False, env=env, name=name).run(worktree)
+        except (CalledProcessError, OSError) as ex:
+            getLogger().error('Unable to build %s: %s', commit, ex)
+            return 'skip'
+    try:
+        RunCommand(__expand(test_cmdline, worktree, commit, test), verbose=True, echo=False,
+                   env=env, name=name, timeout=timeout).run(worktree)
+        return 'good'
+    except (CalledProcessError, CommandTimeoutError):
+        return 'bad'
+    except OSError as ex:
+        getLogger().error('Unable to run %s at %s: %s', test, commit, ex)
+        return 'skip'
+
+def bisect(
+        repo_root: str,
+        good: str,
+        bad: str,
+        test: str,
+        test_cmdline: List[str],
+        build_cmdlines: Optional[List[List[str]]] = None,
+        ways: int = 3,
+        worktree_root: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None) -> Dict:
+    '''Finds the first commit between `good` and `bad` where the test fails.
+    Instead of halving the range, every round tests `ways` evenly spaced
+    commits concurrently, each in its own worktree, so the range shrinks by a
+    factor of `ways + 1` per round.
+    param repo_root: The root directory of the repository.
+    param good: A commit where the test passes.
+    param bad: A commit where the test fails.
+    param test: The test being bisected.
+    param test_cmdline: Command running the test (see `test_commit`).
+    param build_cmdlines: Commands building a commit (see `test_commit`).
+    param ways: Number of commits tested concurrently per round.
+    param worktree_root: Directory holding the worktrees.
+    param env: Environment of the build and test commands.
+    param timeout: Wall-clock timeout of every test run, in seconds.
+    return: A dictionary with `first_bad` (None if undetermined), the remaining candidate
+    commits (`candidates`), the per-commit `results` and the number of `rounds`.
+    '''
+    if ways < 1:
+        raise ValueError('The number of ways must be at least 1.')
+    commits = get_commit_range(repo_root, good, bad)
+    if not commits:
+        raise ValueError(f'No commits between {good} and {bad}.')
+    worktrees = prepare_worktrees(repo_root, min(ways, max(len(commits) - 1, 1)), worktree_root)
+    results = {}
+    # Invariant: commits[lo] passes (-1 stands for `good`) and commits[hi] fails.
+    (lo, hi) = (-1, len(commits) - 1)
+    rounds = 0
+    with ThreadPoolExecutor(max_workers=len(worktrees)) as executor:
+        while hi - lo > 1:
+            candidates = [i for i in range(lo + 1, hi) if results.get(commits[i]) != 'skip']
+            if not candidates:
+                break
+            count = min(len(worktrees), len(candidates))
+            probes = sorted({candidates[(len(candidates) * (j + 1)) // (count + 1)] for j in range(count)})
+            rounds += 1
+            print(f'Bisect round {rounds}: {hi - lo - 1} candidates, testing {len(probes)} commits')
+            futures = [
+                executor.submit(test_commit, worktree, commits[i], test, test_cmdline, build_cmdlines, env, timeout)
+                for (worktree, i) in zip(worktrees, probes)
+            ]
+            for (i, future) in zip(probes, futures):
+                results[commits[i]] = future.result()
+                print(f'  {commits[i]}: {results[commits[i]]}')
+            for i in probes:
+                if results[commits[i]] == 'bad':
+                    hi = i
+                    break
+            lo = max([lo] + [i for i in probes if i < hi and results[commits[i]] == 'good'])
+
+    remaining = [commits[i] for i in range(lo + 1, hi + 1)]
+    return {
+        'first_bad': commits[hi] if hi - lo == 1 else None,
+        'candidates': remaining,
+        'results': results,
+        'rounds': rounds
+    }
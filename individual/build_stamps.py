@@ -0,0 +1,73 @@
+from cargo.common import RunCommand, get_root_path
+from hashlib import sha256
+from os import path, makedirs
+from time import time
+from typing import Dict, List
+
+import json
+import os
+
+def __get_stamps_file() -> str:
+    '''Gets the file the build stamps are stored in.'''
+    cache_dir = path.join(get_root_path(), 'cache')
+    makedirs(cache_dir, exist_ok=True)
+    return path.join(cache_dir, 'build-stamps.json')
+
+def __load_stamps() -> Dict:
+    try:
+        with open(__get_stamps_file(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def __git_output(repo_root: str, cmdline: List[str]) -> str:
+    # The whole output feeds the digest, so it must not be truncated.
+    return RunCommand(['git'] + cmdline, verbose=True, echo=False, output_limit=None).run_and_get_output(repo_root)
+
+def get_source_digest(repo_root: str, inputs: List[str]) -> str:
+    '''Computes a digest of the given source subtrees.
+    The digest covers the committed tree objects of the subtrees plus any
+    uncommitted or untracked changes under them, without reading the sources.
+    param repo_root: The root directory of the runtime repository.
+    param inputs: Paths relative to the repository root.
+    return: The digest as a hex string.
+    '''
+    digest = sha256()
+    digest.update(__git_output(repo_root, ['ls-tree', 'HEAD', '--'] + inputs).encode('utf-8'))
+    digest.update(__git_output(repo_root, ['diff', 'HEAD', '--binary', '--'] + inputs).encode('utf-8'))
+    untracked = __git_output(repo_root, ['ls-files', '--others', '--exclude-standard', '--'] + inputs)
+    for file in sorted(untracked.splitlines()):
+        stat = os.stat(path.join(repo_root, file))
+        digest.update(f'{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+def is_build_up_to_date(repo_root: str, step: str, fingerprint: str, outputs: List[str]) -> bool:
+    '''Checks whether a build step can be skipped.
+    param repo_root: The root directory of the runtime repository.
+    param step: Name of the build step.
+    param fingerprint: Current fingerprint of the step inputs.
+    param outputs: Output paths, relative to the repository root, that must still exist.
+    return: True if the recorded fingerprint matches and all outputs exist.
+    '''
+    stamp = __load_stamps().get(path.abspath(repo_root), {}).get(step)
+    if not stamp or stamp['fingerprint'] != fingerprint:
+        return False
+    return all(path.exists(path.join(repo_root, output)) for output in outputs)
+
+def record_build(repo_root: str, step: str, fingerprint: str, commit_hash: str) -> None:
+    '''Records a successful build of a step.
+    param repo_root: The root directory of the runtime repository.
+    param step: Name of the build step.
+    param fingerprint: Fingerprint of the inputs the step was built from.
+    param commit_hash: Commit the step was built from.
+    '''
+    stamps = __load_stamps()
+    stamps.setdefault(path.abspath(repo_root), {})[step] = {
+        'fingerprint': fingerprint,
+        'commit': commit_hash,
+        'time': time()
+    }
+    stamps_file = __get_stamps_file()
+    with open(f'{stamps_file}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(stamps, f, indent=2)
+    os.replace(f'{stamps_file}.tmp', stamps_file)
@@ -0,0 +1,116 @@
+from cargo.common import get_root_path
+from individual.common import parse_test_results
+from individual.constants import TEST_RESULTS_CACHE_SIZE
+from hashlib import sha1, sha256
+from logging import getLogger
+from os import path, makedirs
+from typing import Dict, List, Optional
+
+import json
+import os
+import threading
+
+# Bump whenever the shape of the `parse_test_results` summary changes, so
+# entries written by an older version are not returned.
+CACHE_VERSION = 3
+
+def get_cache_directory() -> str:
+    '''Gets the directory holding the parsed test results cache.'''
+    cache_dir = path.join(get_root_path(), 'cache', 'test-results')
+    makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def __hash_file(xml_file: str) -> str:
+    digest = sha256()
+    with open(xml_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def __get_cache_key(xml_file: str, verify_content: bool) -> Dict:
+    '''Builds the identity of a results file: path, size, mtime and, optionally, a content hash.'''
+    stat = os.stat(xml_file)
+    return {
+        'version': CACHE_VERSION,
+        'path': path.abspath(xml_file),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'sha256': __hash_file(xml_file) if verify_content else None
+    }
+
+def __get_entry_path(key: Dict) -> str:
+    name = sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+    return path.join(get_cache_directory(), f'{name}.json')
+
+def get_cache_entries(read_keys: bool = True) -> List[Dict]:
+    '''Lists the cache entries, most recently used first.
+    param read_keys: If True, the key of every entry is read as well.
+    return: A list of dictionaries with the entry file, its size, last use time and the cached key.
+    '''
+    entries = []
+    with os.scandir(get_cache_directory()) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.endswith('.json'):
+                continue
+            stat = entry.stat()
+            key = None
+            if read_keys:
+                # The key is stored on the first line, ahead of the (large) summary.
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        key = json.loads(f.readline())
+                except (OSError, ValueError):
+                    pass
+            entries.append({'file': entry.path, 'size': stat.st_size, 'last_used': stat.st_mtime, 'key': key})
+    entries.sort(key=lambda e: e['last_used'], reverse=True)
+    return entries
+
+def clear_cache() -> int:
+    '''Removes all cache entries.
+    return: The number of removed entries.
+    '''
+    entries = get_cache_entries(read_keys=False)
+    for entry in entries:
+        os.remove(entry['file'])
+    return len(entries)
+
+def __evict(max_size: int) -> None:
+    '''Removes the least recently used entries until the cache fits in `max_size` bytes.'''
+    entries = get_cache_entries(read_keys=False)
+    total = sum(e['size'] for e in entries)
+    while entries and total > max_size:
+        entry = entries.pop()
+        try:
+            os.remove(entry['file'])
+        except FileNotFoundError:
+            pass
+        total -= entry['size']
+
+def load_test_results(xml_file: str, verify_content: bool = False, max_size: Optional[int] = None) -> Dict:
+    '''Parses a test results file, reusing the cached summary if the file did not change.
+    param xml_file: Path to the test results XML file.
+    param verify_content: If True, the content hash is part of the cache key.
+    param max_size: Size bound of the cache in bytes (default `TEST_RESULTS_CACHE_SIZE`).
+    return: The summary returned by `parse_test_results`.
+    '''
+    key = __get_cache_key(xml_file, verify_content)
+    entry_path = __get_entry_path(key)
+    try:
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            f.readline()
+            summary = json.loads(f.readline())
+        # Touch the entry so eviction sees it as recently used.
+        os.utime(entry_path)
+        getLogger().info('Using cached test results for %s', xml_file)
+        return summary
+    except (OSError, ValueError, KeyError):
+        pass
+
+    summary = parse_test_results(xml_file)
+    tmp_path = f'{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(key) + '\n')
+        f.write(json.dumps(summary) + '\n')
+    os.replace(tmp_path, entry_path)
+    __evict(TEST_RESULTS_CACHE_SIZE if max_size is None else max_size)
+    return summary
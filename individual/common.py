@@ -1,51 +1,222 @@
 import xml.etree.ElementTree as ET
-from individual.constants import TEST_RESULT_EXTENSION
-from cargo.common import get_root_path
-from os import path, makedirs
+from cargo.admission import get_admission_controller
+from cargo.common import RunCommand, get_root_path
+from individual.history import get_peak_rss, record_peak_rss
+from individual.toolchain import get_toolchain
+from subprocess import CalledProcessError
+from os import path, makedirs, environ
+from typing import Dict, List, Optional
 from time import time
 from datetime import datetime
 
-def generate_test_result_file_name() -> str:
-    '''Generates a unique log file name for the current script.'''
+def generate_test_result_file_name(label: Optional[str] = None) -> str:
+    '''Generates a unique log file name for the current script.
+    param label: Appended to the name of the summary of a partial or combined run, e.g. "shard-1-of-2".
+    '''
     test_result_dir = path.join(get_root_path(), 'test_results')
     makedirs(test_result_dir, exist_ok=True)
 
     timestamp = datetime.fromtimestamp(time()).strftime("%Y%m%d%H%M%S")
-    test_result_file_name = f'{timestamp}-test-summary.md'
+    test_result_file_name = f'{timestamp}-test-summary-{label}.md' if label else f'{timestamp}-test-summary.md'
     return path.join(test_result_dir, test_result_file_name)
 
 def combine_test_result_path(test_name: str) -> str:
-    return test_name[:-4] + TEST_RESULT_EXTENSION
+    return test_name[:-4] + get_toolchain().test_result_extension
     # return os.path.join(os.path.dirname(os.path.realpath(test_name)), test_result_file)
 
+def get_test_environment(test: List[str], base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    '''Builds the environment a test suite runs with.
+    The optional third column of an `individual_tests` entry names an environment
+    variable that is set to 1 for that suite only (e.g. RunningGCSimulatorTests);
+    the toggles of all other suites are removed so they cannot leak across runs.
+    param test: An entry of the toolchain's `individual_tests`.
+    param base: The environment to start from (default: a copy of `os.environ`).
+    return: A new environment dictionary for the child process.
+    '''
+    env = dict(environ if base is None else base)
+    for other in get_toolchain().individual_tests:
+        if len(other) > 2:
+            env.pop(other[2], None)
+    if len(test) > 2:
+        env[test[2]] = '1'
+    return env
+
+def get_test_suite(suite: str) -> List[str]:
+    '''Gets the `individual_tests` entry of a suite by name.'''
+    for test in get_toolchain().individual_tests:
+        if test[0] == suite:
+            return test
+    raise ValueError(f'Unknown test suite: {suite}')
+
+def run_test_command(command: RunCommand, working_directory: str) -> int:
+    '''Runs a test command through the admission controller, if one is set.
+    The command's name keys its peak RSS history: the largest recent peak is
+    reserved while it runs, and the peak of this run is recorded.
+    param command: The test command; its `name` identifies the suite or test.
+    param working_directory: Working directory of the command.
+    return: The exit code of the command.
+    '''
+    controller = get_admission_controller()
+    try:
+        if controller is None:
+            return command.run(working_directory)
+        return controller.run(command, working_directory, get_peak_rss(command.name) if command.name else 0)
+    finally:
+        if command.name and command.peak_rss_kb:
+            record_peak_rss(command.name, command.peak_rss_kb)
+
+def run_single_test(
+        repo_root: str,
+        suite: str,
+        test_name: str,
+        coreroot: str,
+        verbose: bool = False,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None) -> int:
+    '''Runs one test of a suite through its own test wrapper.
+    param repo_root: The root directory of the runtime repository.
+    param suite: Name of the suite the test belongs to; selects the environment.
+    param test_name: Test name as reported in the results file, relative to the toolchain's `test_binaries_root`.
+    param coreroot: The Core_Root directory passed to the test wrapper.
+    param verbose: If True, echoes the test output.
+    param timeout: Wall-clock timeout of the test, in seconds.
+    param inactivity_timeout: Maximum time the test may run without printing anything, in seconds.
+    return: The exit code of the test wrapper; a failing test does not raise.
+    Raises CommandTimeoutError if the test was killed by the watchdog.
+    '''
+    cmdline = get_toolchain().get_test_cmdline(repo_root, test_name, coreroot)
+    try:
+        return run_test_command(RunCommand(
+            cmdline,
+            verbose=True,
+            echo=verbose,
+            env=get_test_environment(get_test_suite(suite)),
+            name=test_name,
+            timeout=timeout,
+            inactivity_timeout=inactivity_timeout), repo_root)
+    except CalledProcessError as ex:
+        return ex.returncode
+
+def write_test_results(xml_file: str, suite: str, results: List[Dict]) -> None:
+    '''Writes test results in the xUnit format read by `parse_test_results`.
+    param xml_file: Path of the test results XML file to write.
+    param suite: Name of the suite, used as the assembly name.
+    param results: One dictionary per test with `name`, `passed`, `duration` (seconds) and an optional
+    `message` and `stack_trace`.
+    '''
+    failed = sum(1 for result in results if not result['passed'])
+    attributes = {
+        'name': suite,
+        'total': str(len(results)),
+        'passed': str(len(results) - failed),
+        'failed': str(failed),
+        'skipped': '0',
+        'time': f"{sum(result['duration'] for result in results):.3f}"
+    }
+    root = ET.Element('assemblies')
+    assembly = ET.SubElement(root, 'assembly', attributes)
+    collection = ET.SubElement(assembly, 'collection', attributes)
+    for result in results:
+        test = ET.SubElement(collection, 'test', {
+            'name': result['name'],
+            'type': suite,
+            'method': result['name'],
+            'time': f"{result['duration']:.3f}",
+            'result': 'Pass' if result['passed'] else 'Fail'
+        })
+        if not result['passed']:
+            failure = ET.SubElement(test, 'failure')
+            ET.SubElement(failure, 'message').text = result.get('message', '')
+            if result.get('stack_trace'):
+                ET.SubElement(failure, 'stack-trace').text = result['stack_trace']
+    makedirs(path.dirname(path.abspath(xml_file)), exist_ok=True)
+    ET.ElementTree(root).write(xml_file, encoding='utf-8', xml_declaration=True)
+
+def combine_test_summaries(summaries: List[Dict]) -> Dict:
+    '''Combines the summaries of several results files of the same suite (e.g. shards) into one.'''
+    combined = {
+        "total_cases": 0,
+        "passed_cases": 0,
+        "failed_cases": 0,
+        "failed_test_names": [],
+        "duration": 0.0,
+        "test_durations": {},
+        "failure_messages": {},
+        "failure_stack_traces": {}
+    }
+    for summary in summaries:
+        for key in ("total_cases", "passed_cases", "failed_cases", "duration"):
+            combined[key] += summary.get(key, 0)
+        combined["failed_test_names"].extend(summary["failed_test_names"])
+        combined["test_durations"].update(summary.get("test_durations", {}))
+        combined["failure_messages"].update(summary.get("failure_messages", {}))
+        combined["failure_stack_traces"].update(summary.get("failure_stack_traces", {}))
+    return combined
+
 def parse_test_results(xml_file: str):
     """
     Parses the test results XML file and extracts test summary.
 
+    The file is streamed with `iterparse` and every `<test>` element is dropped
+    from the tree once it has been read, so memory use does not grow with the
+    size of the file (GC stress runs embed the full stdout in `<output>`).
+
     Args:
         xml_file (str): Path to the test results XML file.
 
     Returns:
-        dict: A dictionary containing total cases, passed cases, failed cases, and failed test case names.
+        dict: A dictionary containing total cases, passed cases, failed cases, failed test case names,
+        the total duration of the assemblies (`duration`), the duration of every test (`test_durations`,
+        in seconds), and the failure message and stack trace of every failed test (`failure_messages`,
+        `failure_stack_traces`; tests without a stack trace are left out of the latter).
     """
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
     summary = {
         "total_cases": 0,
         "passed_cases": 0,
         "failed_cases": 0,
-        "failed_test_names": []
+        "failed_test_names": [],
+        "duration": 0.0,
+        "test_durations": {},
+        "failure_messages": {},
+        "failure_stack_traces": {}
     }
 
-    # Iterate through assemblies and collections to gather test data
-    for assembly in root.findall("assembly"):
-        summary["total_cases"] += int(assembly.get("total", 0))
-        summary["passed_cases"] += int(assembly.get("passed", 0))
-        summary["failed_cases"] += int(assembly.get("failed", 0))
+    # Open elements, used to detach finished elements from their parent.
+    stack = []
+    test_depth = 0
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "assembly":
+                # Attributes are complete on the start event.
+                summary["total_cases"] += int(elem.get("total", 0))
+                summary["passed_cases"] += int(elem.get("passed", 0))
+                summary["failed_cases"] += int(elem.get("failed", 0))
+                summary["duration"] += float(elem.get("time", 0) or 0)
+            elif elem.tag == "test":
+                test_depth += 1
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if elem.tag == "test":
+            test_depth -= 1
+            name = elem.get("name")
+            summary["test_durations"][name] = float(elem.get("time", 0) or 0)
+            if elem.get("result") == "Fail":
+                summary["failed_test_names"].append(name)
+                summary["failure_messages"][name] = (elem.findtext("failure/message") or "").strip()
+                stack_trace = (elem.findtext("failure/stack-trace") or "").strip()
+                if stack_trace:
+                    summary["failure_stack_traces"][name] = stack_trace
+        elif test_depth > 0:
+            # Keep the children of a test until the test itself ends, but
+            # drop the (potentially huge) captured output right away.
+            if elem.tag == "output":
+                elem.clear()
+            continue
 
-        # Find failed tests and collect their names
-        for test in assembly.findall(".//test[@result='Fail']"):
-            summary["failed_test_names"].append(test.get("name"))
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
 
     return summary
\ No newline at end of file
@@ -9,9 +9,81 @@ INDIVIDUAL_TESTS =[
     ['GC-scenarios1', rf'{TEST_BINARIES_ROOT}\GC\Scenarios\GC-scenarios1\GC-scenarios1.cmd'],
     ['GC-simulator', rf'{TEST_BINARIES_ROOT}\GC\Scenarios\GC-simulator\GC-simulator.cmd','RunningGCSimulatorTests']
     ]
+INDIVIDUAL_TEST_PROJECTS = {
+    "GC": r'src\tests\GC\GC.csproj',
+    "GC-features": r'src\tests\GC\Features\GC-features.csproj',
+    "GC-scenarios1": r'src\tests\GC\Scenarios\GC-scenarios1.csproj',
+    "GC-simulator": r'src\tests\GC\Scenarios\GC-simulator.csproj'
+}
 TEST_RESULTS = {
     "GC": rf'{TEST_BINARIES_ROOT}\GC\GC\GC{TEST_RESULT_EXTENSION}',
     "GC-features": rf'{TEST_BINARIES_ROOT}\GC\Features\GC-features\GC-features{TEST_RESULT_EXTENSION}',
     "GC-scenarios1": rf'{TEST_BINARIES_ROOT}\GC\Scenarios\GC-scenarios1\GC-scenarios1{TEST_RESULT_EXTENSION}',
     "GC-simulator": rf'{TEST_BINARIES_ROOT}\GC\Scenarios\GC-simulator\GC-simulator{TEST_RESULT_EXTENSION}'
-}
\ No newline at end of file
+}
+# Upper bound of the on-disk cache of parsed test results, in bytes.
+TEST_RESULTS_CACHE_SIZE = 256 * 1024 * 1024
+
+# Source subtrees (relative to the runtime repository root) each build step depends on.
+BUILD_STEP_INPUTS = {
+    'clr_libs': ['src/coreclr', 'src/libraries', 'src/native', 'eng', 'global.json', 'build.cmd'],
+    'gc_tests': ['src/tests/GC', 'src/tests/Common', 'src/tests/Directory.Build.props', 'src/tests/Directory.Build.targets'],
+}
+# Outputs that must still exist for a build step to be skipped.
+BUILD_STEP_OUTPUTS = {
+    'clr_libs': [rf'{CLR_BINARIES_ROOT}\Tests\Core_Root'],
+    'gc_tests': [test[1] for test in INDIVIDUAL_TESTS],
+}
+
+# Maps changed paths (relative to the runtime repository root, '/' separated)
+# to the suites they affect, first matching prefix wins. '*' means every suite
+# must run; an empty list means no GC test is affected.
+IMPACT_RULES = [
+    ('src/coreclr/gc/', ['*']),
+    ('src/coreclr/vm/gc', ['*']),
+    ('src/coreclr/inc/gc', ['*']),
+    ('src/tests/Common/', ['*']),
+    ('src/tests/Directory.Build', ['*']),
+    ('eng/', ['*']),
+    ('global.json', ['*']),
+    ('src/tests/GC/Features/', ['GC-features']),
+    ('src/tests/GC/Scenarios/GCSimulator/', ['GC-simulator']),
+    ('src/tests/GC/Scenarios/', ['GC-scenarios1']),
+    ('src/tests/GC/', ['GC']),
+    ('src/tests/', []),
+    ('src/coreclr/jit/', []),
+    ('src/coreclr/nativeaot/', []),
+    ('src/coreclr/tools/', []),
+    ('src/libraries/', []),
+    ('src/mono/', []),
+    ('src/installer/', []),
+    ('docs/', []),
+]
+# Changed files with these extensions never affect the GC tests.
+IMPACT_IGNORED_EXTENSIONS = ['.md', '.txt', '.yml', '.yaml']
+# Changed runtime sources no rule matches may affect anything the GC tests exercise.
+IMPACT_SOURCE_ROOTS = ['src/coreclr/', 'src/native/']
+
+# Outputs `--prune` applies keep-last-N retention to, as glob patterns relative
+# to the runtime repository ("repo") or to this repository ("tools"). Every
+# pattern is pruned on its own; the layouts selected by the configurations
+# above are never pruned.
+RETENTION_PATTERNS = {
+    'builds': [
+        ('repo', 'artifacts/tests/coreclr/*'),
+        ('repo', 'artifacts/bin/coreclr/*'),
+        ('tools', 'cache/bisect/*/wt*'),
+    ],
+    'test_results': [
+        ('tools', 'test_results/*-test-summary.md'),
+        ('tools', 'test_results/*-test-summary.json'),
+        ('tools', 'test_results/*-test-summary-*.md'),
+        ('tools', 'test_results/*-test-summary-*.json'),
+        ('tools', 'test_results/*-matrix-summary.md'),
+        ('tools', 'test_results/runs/*'),
+        ('tools', 'test_results/shards/*'),
+    ],
+    'logs': [
+        ('tools', 'logs/*'),
+    ],
+}
@@ -0,0 +1,302 @@
+from cargo.common import get_root_path
+from contextlib import closing
+from os import path, makedirs
+from statistics import median
+from time import time
+from typing import Dict, List, Optional
+
+import sqlite3
+
+def get_history_database() -> str:
+    '''Gets the SQLite database holding the history of the test runs.'''
+    test_result_dir = path.join(get_root_path(), 'test_results')
+    makedirs(test_result_dir, exist_ok=True)
+    return path.join(test_result_dir, 'test-history.db')
+
+def connect_history(database: Optional[str] = None) -> sqlite3.Connection:
+    '''Opens the history database, creating the schema if needed.'''
+    connection = sqlite3.connect(database or get_history_database())
+    connection.executescript('''
+        CREATE TABLE IF NOT EXISTS commits (
+            commit_hash TEXT PRIMARY KEY,
+            recorded REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS suite_durations (
+            commit_hash TEXT NOT NULL,
+            suite TEXT NOT NULL,
+            duration REAL NOT NULL,
+            PRIMARY KEY (commit_hash, suite)
+        );
+        CREATE TABLE IF NOT EXISTS test_durations (
+            commit_hash TEXT NOT NULL,
+            suite TEXT NOT NULL,
+            test TEXT NOT NULL,
+            duration REAL NOT NULL,
+            passed INTEGER NOT NULL,
+            PRIMARY KEY (commit_hash, suite, test)
+        );
+        CREATE TABLE IF NOT EXISTS peak_rss (
+            name TEXT NOT NULL,
+            recorded REAL NOT NULL,
+            peak_rss_kb INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS failure_signatures (
+            signature TEXT PRIMARY KEY,
+            first_commit TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            example TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS failure_occurrences (
+            signature TEXT NOT NULL,
+            commit_hash TEXT NOT NULL,
+            suite TEXT NOT NULL,
+            test TEXT NOT NULL,
+            PRIMARY KEY (signature, commit_hash, suite, test)
+        );
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            commit_hash TEXT NOT NULL,
+            recorded REAL NOT NULL,
+            summary_file TEXT,
+            scope TEXT,
+            partial INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS run_suites (
+            run_id INTEGER NOT NULL,
+            suite TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            PRIMARY KEY (run_id, suite)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS run_failures (
+            run_id INTEGER NOT NULL,
+            suite TEXT NOT NULL,
+            test TEXT NOT NULL,
+            PRIMARY KEY (run_id, suite, test)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS runs_by_commit ON runs (commit_hash);
+        CREATE INDEX IF NOT EXISTS test_durations_by_test ON test_durations (suite, test);
+        CREATE INDEX IF NOT EXISTS peak_rss_by_name ON peak_rss (name, recorded);
+        CREATE INDEX IF NOT EXISTS commits_by_time ON commits (recorded);
+    ''')
+    # Databases written before runs were scoped only hold complete runs.
+    if 'partial' not in {row[1] for row in connection.execute('PRAGMA table_info(runs)')}:
+        with connection:
+            connection.execute('ALTER TABLE runs ADD COLUMN scope TEXT')
+            connection.execute('ALTER TABLE runs ADD COLUMN partial INTEGER NOT NULL DEFAULT 0')
+    return connection
+
+def ingest_test_durations(commit_hash: str, suite: str, test_summary: Dict, database: Optional[str] = None) -> None:
+    '''Stores the per-test durations of a suite run; a later run of the same commit replaces them
+    but keeps the commit where it was first recorded in the baseline window.
+    param commit_hash: Commit the suite ran against.
+    param suite: Name of the suite.
+    param test_summary: The summary returned by `parse_test_results`.
+    param database: The database file (default `get_history_database()`).
+    '''
+    failed = set(test_summary['failed_test_names'])
+    with closing(connect_history(database)) as connection, connection:
+        connection.execute(
+            'INSERT INTO commits (commit_hash, recorded) VALUES (?, ?) ON CONFLICT (commit_hash) DO NOTHING',
+            (commit_hash, time()))
+        connection.execute(
+            'INSERT OR REPLACE INTO suite_durations (commit_hash, suite, duration) VALUES (?, ?, ?)',
+            (commit_hash, suite, test_summary.get('duration', 0.0)))
+        connection.executemany(
+            'INSERT OR REPLACE INTO test_durations (commit_hash, suite, test, duration, passed) VALUES (?, ?, ?, ?, ?)',
+            ((commit_hash, suite, test, duration, int(test not in failed))
+             for test, duration in test_summary['test_durations'].items()))
+
+def get_test_durations(suite: Optional[str] = None, window: int = 10, database: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    '''Gets the median duration of every test over the most recent commits.
+    param suite: Restricts the result to one suite.
+    param window: Number of most recent commits to take into account.
+    param database: The database file (default `get_history_database()`).
+    return: Median durations in seconds, keyed by suite and test name.
+    '''
+    query = '''
+        SELECT t.suite, t.test, t.duration FROM test_durations t
+        WHERE t.commit_hash IN (SELECT commit_hash FROM commits ORDER BY recorded DESC LIMIT ?)'''
+    parameters = [window]
+    if suite:
+        query += ' AND t.suite = ?'
+        parameters.append(suite)
+    samples = {}
+    with closing(connect_history(database)) as connection:
+        for (test_suite, test, duration) in connection.execute(query, parameters):
+            samples.setdefault(test_suite, {}).setdefault(test, []).append(duration)
+    return {s: {t: median(d) for t, d in tests.items()} for s, tests in samples.items()}
+
+def find_duration_regressions(
+        commit_hash: str,
+        threshold: float = 2.0,
+        window: int = 10,
+        min_duration: float = 1.0,
+        database: Optional[str] = None) -> List[Dict]:
+    '''Finds the tests of a commit that got slower than their rolling baseline.
+    The baseline of a test is its median duration over the `window` commits recorded before `commit_hash`.
+    param commit_hash: The commit to check.
+    param threshold: Ratio to the baseline above which a test is reported.
+    param window: Number of earlier commits forming the baseline.
+    param min_duration: Tests faster than this many seconds are ignored, to filter out noise.
+    param database: The database file (default `get_history_database()`).
+    return: The regressions sorted by ratio, as dictionaries with suite, test, duration, baseline and ratio.
+    '''
+    with closing(connect_history(database)) as connection:
+        row = connection.execute('SELECT recorded FROM commits WHERE commit_hash = ?', (commit_hash,)).fetchone()
+        if row is None:
+            return []
+        current = connection.execute(
+            'SELECT suite, test, duration FROM test_durations WHERE commit_hash = ? AND duration >= ?',
+            (commit_hash, min_duration)).fetchall()
+        samples = {}
+        for (suite, test, duration) in connection.execute('''
+                SELECT suite, test, duration FROM test_durations
+                WHERE commit_hash IN (SELECT commit_hash FROM commits WHERE recorded < ? ORDER BY recorded DESC LIMIT ?)''',
+                (row[0], window)):
+            samples.setdefault((suite, test), []).append(duration)
+
+    regressions = []
+    for (suite, test, duration) in current:
+        if (suite, test) not in samples:
+            continue
+        baseline = median(samples[(suite, test)])
+        if baseline > 0 and duration / baseline >= threshold:
+            regressions.append({
+                'suite': suite,
+                'test': test,
+                'duration': duration,
+                'baseline': baseline,
+                'ratio': duration / baseline})
+    regressions.sort(key=lambda r: r['ratio'], reverse=True)
+    return regressions
+
+def get_recent_failures(window: int = 10, database: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    '''Gets the tests that failed in the most recent commits.
+    param window: Number of most recent commits to look at.
+    param database: The database file (default `get_history_database()`).
+    return: The number of commits each test failed in, keyed by suite and test name.
+    '''
+    failures = {}
+    with closing(connect_history(database)) as connection:
+        for (suite, test, count) in connection.execute('''
+                SELECT suite, test, COUNT(*) FROM test_durations
+                WHERE passed = 0 AND commit_hash IN (SELECT commit_hash FROM commits ORDER BY recorded DESC LIMIT ?)
+                GROUP BY suite, test''', (window,)):
+            failures.setdefault(suite, {})[test] = count
+    return failures
+
+def record_peak_rss(name: str, peak_rss_kb: int, database: Optional[str] = None) -> None:
+    '''Stores the peak RSS of a run of a suite or test.
+    param name: Name of the suite or test.
+    param peak_rss_kb: Peak RSS of the run, in KiB.
+    param database: The database file (default `get_history_database()`).
+    '''
+    with closing(connect_history(database)) as connection, connection:
+        connection.execute(
+            'INSERT INTO peak_rss (name, recorded, peak_rss_kb) VALUES (?, ?, ?)', (name, time(), peak_rss_kb))
+
+def get_peak_rss(name: str, window: int = 10, database: Optional[str] = None) -> int:
+    '''Gets the largest peak RSS of the most recent runs of a suite or test.
+    param name: Name of the suite or test.
+    param window: Number of most recent runs to take into account.
+    param database: The database file (default `get_history_database()`).
+    return: The peak RSS in KiB, 0 if the suite or test never ran.
+    '''
+    with closing(connect_history(database)) as connection:
+        (peak,) = connection.execute('''
+            SELECT MAX(peak_rss_kb) FROM (
+                SELECT peak_rss_kb FROM peak_rss WHERE name = ? ORDER BY recorded DESC LIMIT ?)''', (name, window)).fetchone()
+    return peak or 0
+
+def record_run(
+        commit_hash: str,
+        summaries: Dict[str, Dict],
+        summary_file: Optional[str] = None,
+        scope: Optional[str] = None,
+        partial: bool = False,
+        database: Optional[str] = None) -> int:
+    '''Appends a run to the run history: the suite counts and the failed tests.
+    Tests of a recorded suite that are not listed as failed passed.
+    param commit_hash: Commit the run tested.
+    param summaries: `parse_test_results` summaries keyed by suite.
+    param summary_file: The Markdown summary of the run.
+    param scope: What the run covered, e.g. "shard-1-of-2" or "merged"; None for a regular run.
+    param partial: Whether the run only ran some tests of its suites (a shard, the affected tests or a
+    fail-fast run), so that the tests it did not run must not count as passed when comparing runs.
+    param database: The database file (default `get_history_database()`).
+    return: The id of the run.
+    '''
+    with closing(connect_history(database)) as connection, connection:
+        run_id = connection.execute(
+            'INSERT INTO runs (commit_hash, recorded, summary_file, scope, partial) VALUES (?, ?, ?, ?, ?)',
+            (commit_hash, time(), summary_file, scope, int(partial))).lastrowid
+        connection.executemany(
+            'INSERT INTO run_suites (run_id, suite, total, passed, failed) VALUES (?, ?, ?, ?, ?)',
+            ((run_id, suite, summary['total_cases'], summary['passed_cases'], summary['failed_cases'])
+             for (suite, summary) in summaries.items()))
+        connection.executemany(
+            'INSERT OR IGNORE INTO run_failures (run_id, suite, test) VALUES (?, ?, ?)',
+            ((run_id, suite, test) for (suite, summary) in summaries.items() for test in summary['failed_test_names']))
+    return run_id
+
+def resolve_run(reference: str, database: Optional[str] = None) -> Dict:
+    '''Finds a recorded run.
+    Partial runs are only found by their id; the other references skip them.
+    param reference: A run id, "~N" for the Nth complete run before the latest ("~0" being the latest),
+    or a commit hash prefix (the latest complete run of that commit).
+    param database: The database file (default `get_history_database()`).
+    return: The `run_id`, `commit_hash`, `recorded` time, `summary_file`, `scope` and `partial` flag of the run.
+    '''
+    names = ('run_id', 'commit_hash', 'recorded', 'summary_file', 'scope', 'partial')
+    columns = ', '.join(names)
+    with closing(connect_history(database)) as connection:
+        if reference.startswith('~') and reference[1:].isdigit():
+            row = connection.execute(
+                f'SELECT {columns} FROM runs WHERE partial = 0 ORDER BY run_id DESC LIMIT 1 OFFSET ?',
+                (int(reference[1:]),)).fetchone()
+        elif reference.isdigit() and len(reference) < 7:
+            row = connection.execute(f'SELECT {columns} FROM runs WHERE run_id = ?', (int(reference),)).fetchone()
+        else:
+            row = connection.execute(
+                f'SELECT {columns} FROM runs WHERE commit_hash LIKE ? AND partial = 0 ORDER BY run_id DESC LIMIT 1',
+                (f'{reference}%',)).fetchone()
+    if row is None:
+        raise ValueError(f'No recorded complete run matches {reference}.')
+    return dict(zip(names, row))
+
+def diff_runs(run_a: int, run_b: int, database: Optional[str] = None) -> Dict:
+    '''Compares the failed tests of two runs.
+    A test only counts as new or fixed when its suite ran in both runs. A partial run may not
+    have run a test it did not report as failed, so a test failing only in the other run is
+    `not_comparable` instead.
+    param run_a: Id of the older run.
+    param run_b: Id of the newer run.
+    param database: The database file (default `get_history_database()`).
+    return: The (suite, test) pairs that are `new_failures`, `fixed`, `still_failing` and
+    `not_comparable`, the `suites` counts of both runs, and the number of complete `runs_between` the two.
+    '''
+    with closing(connect_history(database)) as connection:
+        partial = dict(connection.execute('SELECT run_id, partial FROM runs WHERE run_id IN (?, ?)', (run_a, run_b)))
+        suites = {}
+        for (run_id, suite, total, passed, failed) in connection.execute(
+                'SELECT run_id, suite, total, passed, failed FROM run_suites WHERE run_id IN (?, ?)', (run_a, run_b)):
+            suites.setdefault(suite, {})[run_id] = {'total': total, 'passed': passed, 'failed': failed}
+        failures = {run_a: set(), run_b: set()}
+        for (run_id, suite, test) in connection.execute(
+                'SELECT run_id, suite, test FROM run_failures WHERE run_id IN (?, ?)', (run_a, run_b)):
+            failures[run_id].add((suite, test))
+        (runs_between,) = connection.execute(
+            'SELECT COUNT(*) FROM runs WHERE run_id > ? AND run_id < ? AND partial = 0', (min(run_a, run_b), max(run_a, run_b))).fetchone()
+    both = {suite for (suite, runs) in suites.items() if run_a in runs and run_b in runs}
+    new_failures = [t for t in failures[run_b] - failures[run_a] if t[0] in both]
+    fixed = [t for t in failures[run_a] - failures[run_b] if t[0] in both]
+    return {
+        'new_failures': [] if partial.get(run_a) else sorted(new_failures),
+        'fixed': [] if partial.get(run_b) else sorted(fixed),
+        'still_failing': sorted(failures[run_a] & failures[run_b]),
+        'not_comparable': sorted((new_failures if partial.get(run_a) else []) + (fixed if partial.get(run_b) else [])),
+        'suites': suites,
+        'runs_between': runs_between
+    }
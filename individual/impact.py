@@ -0,0 +1,95 @@
+from cargo.common import RunCommand, get_root_path
+from individual.toolchain import get_toolchain
+from logging import getLogger
+from os import path
+from subprocess import CalledProcessError
+from typing import Dict, List, Optional
+
+import glob
+import re
+
+def get_last_tested_commit() -> Optional[str]:
+    '''Gets the commit of the most recent summary of a complete run in test_results/, if any.
+    The summaries of single shards are skipped; the summary of their merge covers the whole run.
+    '''
+    test_result_dir = path.join(get_root_path(), 'test_results')
+    summaries = sorted(glob.glob(path.join(test_result_dir, '*-test-summary.md'))
+                       + glob.glob(path.join(test_result_dir, '*-test-summary-merged.md')), reverse=True)
+    for summary in summaries:
+        with open(summary, 'r', encoding='utf-8') as f:
+            match = re.search(r'^Commit Hash: ([0-9a-f]{7,40})\s*$', f.read(4096), re.MULTILINE)
+        if match:
+            return match.group(1)
+    return None
+
+def get_changed_paths(repo_root: str, base_commit: str, commit: str = 'HEAD') -> Optional[List[str]]:
+    '''Lists the paths changed between two commits, relative to the repository root.
+    return: The changed paths, or None if git cannot diff the commits, e.g. when the
+    base commit is no longer reachable after a rebase or force-push.
+    '''
+    cmdline = ['git', 'diff', '--name-only', f'{base_commit}..{commit}']
+    try:
+        output = RunCommand(cmdline, verbose=True, echo=False, output_limit=None).run_and_get_output(repo_root)
+    except CalledProcessError as ex:
+        getLogger().warning('Cannot diff %s..%s: %s', base_commit, commit, ex)
+        return None
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+def __match_rule(changed_path: str) -> List[str]:
+    toolchain = get_toolchain()
+    # Full-run rules come first, so e.g. src/coreclr/gc/CMakeLists.txt is not ignored as a .txt file.
+    for (prefix, suites) in toolchain.impact_rules:
+        if '*' in suites and changed_path.startswith(prefix):
+            return suites
+    if path.splitext(changed_path)[1].lower() in toolchain.impact_ignored_extensions:
+        return []
+    for (prefix, suites) in toolchain.impact_rules:
+        if changed_path.startswith(prefix):
+            return suites
+    # Unknown runtime sources may affect anything the GC tests exercise.
+    if any(changed_path.startswith(root) for root in toolchain.impact_source_roots):
+        return ['*']
+    return []
+
+def select_affected_tests(changed_paths: List[str], catalog: Optional[Dict[str, Dict]] = None) -> Dict:
+    '''Maps changed paths to the GC suites and tests they affect.
+    Paths are mapped to suites with the `impact_rules` of the toolchain. A change under a test
+    directory of src/tests/GC only selects the tests of that directory when
+    they can be found in `catalog`; otherwise the whole suite runs.
+    param changed_paths: Changed paths relative to the runtime repository root.
+    param catalog: Known tests keyed by suite and test name (see `get_test_catalog`).
+    return: A dictionary with `full` (every suite must run), `suites` (suites to run
+    entirely), `tests` (individual tests keyed by suite) and `reasons` (why, per suite).
+    '''
+    selection = {'full': False, 'suites': set(), 'tests': {}, 'reasons': {}}
+    for changed_path in changed_paths:
+        changed_path = changed_path.replace('\\', '/')
+        suites = __match_rule(changed_path)
+        if '*' in suites:
+            selection['full'] = True
+            selection['suites'] = set(get_toolchain().test_results)
+            selection['reasons'] = {'*': changed_path}
+            selection['tests'] = {}
+            return selection
+        for suite in suites:
+            if suite in selection['suites']:
+                continue
+            tests = __find_tests_in_directory(changed_path, (catalog or {}).get(suite, {}))
+            if tests:
+                selection['tests'].setdefault(suite, set()).update(tests)
+            else:
+                selection['suites'].add(suite)
+            selection['reasons'].setdefault(suite, changed_path)
+    for suite in selection['suites']:
+        selection['tests'].pop(suite, None)
+    return selection
+
+def __find_tests_in_directory(changed_path: str, tests: Dict) -> List[str]:
+    '''Finds the tests built from the directory of a changed file under src/tests.'''
+    if not changed_path.startswith('src/tests/GC/'):
+        return []
+    directory = path.dirname(changed_path)[len('src/tests/'):].lower()
+    # Files directly in a suite directory (e.g. the .csproj) affect the whole suite.
+    if directory.count('/') < 2:
+        return []
+    return [test for test in tests if test.replace('\\', '/').lower().startswith(directory + '/')]
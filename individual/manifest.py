@@ -0,0 +1,116 @@
+from cargo.common import get_root_path
+from os import path, makedirs
+from shutil import copyfile
+from time import time
+from typing import Dict, List, Optional
+
+import json
+import os
+
+class RunManifest:
+    '''
+    Records the progress of a pipeline run (commit, completed stages and
+    suites, and copies of their results files) so that an interrupted run can
+    be resumed without redoing completed work.
+    '''
+
+    def __init__(self, manifest_file: Optional[str] = None):
+        self.__file = manifest_file or path.join(get_root_path(), 'test_results', 'run-manifest.json')
+        self.__data = self.__new()
+
+    @staticmethod
+    def __new(commit: Optional[str] = None) -> Dict:
+        return {'commit': commit, 'started': time(), 'stages': [], 'suites': {}, 'failed': [], 'timed_out': []}
+
+    @property
+    def file(self) -> str:
+        '''The manifest file.'''
+        return self.__file
+
+    @property
+    def commit(self) -> Optional[str]:
+        '''The commit the run is testing.'''
+        return self.__data['commit']
+
+    @property
+    def started(self) -> float:
+        '''When the run started, as a timestamp.'''
+        return self.__data['started']
+
+    @property
+    def stages(self) -> List[str]:
+        '''The completed stages.'''
+        return list(self.__data['stages'])
+
+    @property
+    def suites(self) -> Dict[str, str]:
+        '''The results files of the completed suites, keyed by suite.'''
+        return dict(self.__data['suites'])
+
+    @property
+    def failed_suites(self) -> List[str]:
+        '''The completed suites whose test wrapper failed.'''
+        return list(self.__data.get('failed', []))
+
+    @property
+    def timed_out(self) -> List[Dict]:
+        '''The suites killed by the watchdog.'''
+        return list(self.__data.get('timed_out', []))
+
+    def load(self) -> bool:
+        '''Loads the manifest of the previous run. Returns False if there is none.'''
+        try:
+            with open(self.__file, 'r', encoding='utf-8') as f:
+                self.__data = json.load(f)
+            return True
+        except (OSError, ValueError):
+            self.__data = self.__new()
+            return False
+
+    def save(self) -> None:
+        '''Writes the manifest atomically.'''
+        makedirs(path.dirname(self.__file), exist_ok=True)
+        with open(f'{self.__file}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.__data, f, indent=2)
+        os.replace(f'{self.__file}.tmp', self.__file)
+
+    def reset(self, commit: Optional[str] = None, keep_stages: Optional[List[str]] = None) -> None:
+        '''Starts a new run, optionally keeping some completed stages (e.g. the repository update).'''
+        kept = [stage for stage in self.__data['stages'] if stage in (keep_stages or [])]
+        self.__data = self.__new(commit)
+        self.__data['stages'] = kept
+        self.save()
+
+    def is_stage_done(self, stage: str) -> bool:
+        '''Checks whether a stage was completed.'''
+        return stage in self.__data['stages']
+
+    def mark_stage(self, stage: str) -> None:
+        '''Records a completed stage.'''
+        if stage not in self.__data['stages']:
+            self.__data['stages'].append(stage)
+            self.save()
+
+    def mark_suite(self, suite: str, result_file: str, failed: bool = False) -> None:
+        '''Records a completed suite, keeping a copy of its results file next to the manifest.
+        param suite: Name of the suite.
+        param result_file: The results file written by this run of the suite.
+        param failed: Whether the test wrapper failed, i.e. some tests failed.
+        '''
+        run_dir = path.join(path.dirname(self.__file), 'runs', self.commit or 'unknown')
+        makedirs(run_dir, exist_ok=True)
+        copy = path.join(run_dir, path.basename(result_file.replace('\\', '/')))
+        copyfile(result_file, copy)
+        self.__data['suites'][suite] = copy
+        # This run supersedes whatever an interrupted run recorded for the suite.
+        self.__data['timed_out'] = [entry for entry in self.__data.get('timed_out', []) if entry['name'] != suite]
+        self.__data['failed'] = [name for name in self.__data.get('failed', []) if name != suite]
+        if failed:
+            self.__data['failed'].append(suite)
+        self.save()
+
+    def mark_timed_out(self, entry: Dict) -> None:
+        '''Records a suite killed by the watchdog (`name` and `reason`), replacing an earlier entry of the suite.'''
+        timed_out = [previous for previous in self.__data.get('timed_out', []) if previous['name'] != entry['name']]
+        self.__data['timed_out'] = timed_out + [entry]
+        self.save()
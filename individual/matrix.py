@@ -0,0 +1,163 @@
+from cargo.common import CommandTimeoutError, RunCommand, get_root_path
+from cargo.logger import get_command_log_file
+from cargo.scheduler import TaskScheduler
+from datetime import datetime
+from individual.cache import load_test_results
+from individual.common import get_test_environment, get_test_suite, run_test_command
+from individual.toolchain import get_toolchain
+from logging import getLogger
+from os import environ, path, makedirs, remove
+from shutil import copyfile
+from subprocess import CalledProcessError
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import json
+import re
+
+def load_matrix_configs(config_file: str) -> Dict[str, Dict[str, str]]:
+    '''Loads the GC configurations of a matrix run.
+    The file is a JSON object mapping a configuration name to the environment
+    variables it sets, e.g. {"server": {"DOTNET_gcServer": "1"}, "workstation": {}}.
+    param config_file: Path of the configuration file.
+    return: The environment variables keyed by configuration name, in file order.
+    '''
+    with open(config_file, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    if not isinstance(configs, dict) or not configs:
+        raise ValueError(f'{config_file} must map configuration names to environment variables.')
+    for (name, variables) in configs.items():
+        if not re.fullmatch(r'[\w.-]+', name):
+            raise ValueError(f'Invalid configuration name {name!r}: use letters, digits, ".", "-" and "_".')
+        if not isinstance(variables, dict):
+            raise ValueError(f'The environment of configuration {name} must be an object.')
+        configs[name] = {key: str(value) for (key, value) in variables.items()}
+    return configs
+
+def get_matrix_environment(test: List[str], config: Dict[str, str], configs: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    '''Builds the environment of one (suite, configuration) cell.
+    Variables set by any configuration are removed from the inherited
+    environment first, so a setting of the calling shell or of another
+    configuration cannot leak into the cell.
+    param test: An entry of the toolchain's `individual_tests`.
+    param config: The environment variables of the configuration.
+    param configs: All configurations of the matrix.
+    return: A new environment dictionary for the child process.
+    '''
+    base = dict(environ)
+    for variables in configs.values():
+        for key in variables:
+            base.pop(key, None)
+    base.update(config)
+    return get_test_environment(test, base)
+
+def run_matrix(
+        repo_root: str,
+        configs: Dict[str, Dict[str, str]],
+        coreroot: str,
+        output_dir: Optional[str] = None,
+        suites: Optional[List[str]] = None,
+        jobs: int = 1,
+        verbose: bool = False,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None) -> Dict[str, Dict[str, Dict]]:
+    '''Runs every suite under every GC configuration.
+    A suite always writes its results to the same file, so the cells of one
+    suite run one after another while different suites run concurrently; each
+    cell's results file is copied to `<output_dir>/<config>/` as soon as it finishes.
+    param repo_root: The root directory of the runtime repository.
+    param configs: The environment variables keyed by configuration name.
+    param coreroot: The Core_Root directory passed to the test wrappers.
+    param output_dir: Directory of the per-configuration results (default test_results/matrix).
+    param suites: Names of the suites to run (default: all of the toolchain's `individual_tests`).
+    param jobs: Maximum number of cells running at once.
+    param verbose: If True, echoes the output of the suites.
+    param timeout: Wall-clock timeout of every cell, in seconds.
+    param inactivity_timeout: Maximum time a cell may run without printing anything, in seconds.
+    return: Per-cell `status` ("completed", "failed" or "timed out"), `duration` and
+    results `file` (None if the suite wrote none), keyed by suite then configuration.
+    '''
+    output_dir = output_dir or path.join(get_root_path(), 'test_results', 'matrix')
+    toolchain = get_toolchain()
+    tests = [get_test_suite(suite) for suite in suites] if suites else list(toolchain.individual_tests)
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    cells = {test[0]: {} for test in tests}
+
+    def run_cell(test: List[str], config: str) -> None:
+        result_file = path.join(repo_root, toolchain.test_results[test[0]])
+        # Do not let the results of the previous cell pass for this one.
+        if path.exists(result_file):
+            remove(result_file)
+        log_file = get_command_log_file(f'matrix-{config}-{test[0]}', timestamp)
+        cell = {'status': 'completed', 'duration': None, 'file': None}
+        start = perf_counter()
+        try:
+            run_test_command(RunCommand(
+                toolchain.get_suite_cmdline(repo_root, test, coreroot),
+                verbose=True,
+                echo=verbose,
+                env=get_matrix_environment(test, configs[config], configs),
+                name=f'{config}:{test[0]}',
+                log_file=log_file,
+                timeout=timeout,
+                inactivity_timeout=inactivity_timeout), repo_root)
+        except CommandTimeoutError as ex:
+            getLogger().error('Test suite %s timed out under %s: %s', test[0], config, ex)
+            cell['status'] = 'timed out'
+        except CalledProcessError as ex:
+            getLogger().error('Test suite %s failed under %s: %s', test[0], config, ex)
+            cell['status'] = 'failed'
+        cell['duration'] = perf_counter() - start
+        if path.exists(result_file):
+            cell['file'] = path.join(output_dir, config, f'{test[0]}{toolchain.test_result_extension}')
+            makedirs(path.dirname(cell['file']), exist_ok=True)
+            copyfile(result_file, cell['file'])
+        cells[test[0]][config] = cell
+
+    scheduler = TaskScheduler(max_workers=max(jobs, 1))
+    # Configuration-major order, so the first cells of every suite start right away.
+    for (index, config) in enumerate(configs):
+        for test in tests:
+            dependencies = [f'{test[0]}@{list(configs)[index - 1]}'] if index else []
+            scheduler.add(f'{test[0]}@{config}', lambda test=test, config=config: run_cell(test, config), dependencies)
+    scheduler.run()
+    getLogger().info('Matrix schedule:\n%s', scheduler.report())
+    return cells
+
+def format_matrix_summary(cells: Dict[str, Dict[str, Dict]], configs: List[str], verify_cache: bool = False) -> str:
+    '''Formats the results of a matrix run as pivot tables with one row per suite and one column per configuration.
+    param cells: The result of `run_matrix`.
+    param configs: The configuration names, in column order.
+    param verify_cache: If True, cached results are only reused when the file content hash matches.
+    '''
+    header = '| Testset name | ' + ' | '.join(configs) + ' |\n|--------------|' + '------|' * len(configs) + '\n'
+    results = '# Passed / total:\n\n' + header
+    durations = '# Duration (s):\n\n' + header
+    failed = {}
+    for (suite, row) in cells.items():
+        results += f'| {suite} |'
+        durations += f'| {suite} |'
+        for config in configs:
+            cell = row.get(config)
+            if cell is None:
+                results += ' NA |'
+                durations += ' NA |'
+                continue
+            durations += f" {cell['duration']:.1f} |"
+            if cell['status'] == 'timed out':
+                results += ' timed out |'
+            elif cell['file'] is None:
+                results += ' NA |'
+            else:
+                summary = load_test_results(cell['file'], verify_content=verify_cache)
+                results += f" {summary['passed_cases']}/{summary['total_cases']} |"
+                for test_name in summary['failed_test_names']:
+                    failed.setdefault((suite, test_name), []).append(config)
+        results += '\n'
+        durations += '\n'
+    output = results + '\n' + durations
+    if failed:
+        output += '\n# Failed tests:\n\n| Testset name | Test name | Failing configurations |\n|--------------|-----------|------------------------|\n'
+        for ((suite, test_name), failing) in failed.items():
+            output += f"| {suite} | {test_name} | {', '.join(failing)} |\n"
+    return output
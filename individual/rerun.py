@@ -0,0 +1,64 @@
+from cargo.common import CommandTimeoutError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from individual.common import run_single_test
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+
+def rerun_failed_tests(
+        repo_root: str,
+        failed_tests: Dict[str, List[str]],
+        coreroot: str,
+        repetitions: int = 3,
+        jobs: int = 1,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None) -> Dict[Tuple[str, str], Dict]:
+    '''Re-runs every failed test several times to measure how reproducible the failure is.
+    All (test, repetition) pairs are spread over a single worker pool.
+    param repo_root: The root directory of the runtime repository.
+    param failed_tests: Failed test names, keyed by the suite they belong to.
+    param coreroot: The Core_Root directory passed to the test wrappers.
+    param repetitions: Number of times every test is re-run.
+    param jobs: Number of tests running concurrently.
+    param timeout: Wall-clock timeout of every run, in seconds.
+    param inactivity_timeout: Maximum time a run may go without printing anything, in seconds.
+    return: A dictionary keyed by (suite, test name), as the same test name may appear in several
+    suites, with the suite, the number of runs, the number of failed runs and how many of those timed out.
+    '''
+    if repetitions < 1:
+        raise ValueError('The number of repetitions must be at least 1.')
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = {}
+        for suite, tests in failed_tests.items():
+            for test_name in tests:
+                results[(suite, test_name)] = {'suite': suite, 'runs': 0, 'failed': 0, 'timed_out': 0}
+                for _ in range(repetitions):
+                    future = executor.submit(
+                        run_single_test, repo_root, suite, test_name, coreroot,
+                        timeout=timeout, inactivity_timeout=inactivity_timeout)
+                    futures[future] = (suite, test_name)
+        for future in as_completed(futures):
+            (suite, test_name) = futures[future]
+            result = results[(suite, test_name)]
+            result['runs'] += 1
+            try:
+                returncode = future.result()
+            except CommandTimeoutError as ex:
+                getLogger().error('Re-run of %s timed out: %s', test_name, ex)
+                result['timed_out'] += 1
+                returncode = -1
+            except OSError as ex:
+                getLogger().error('Unable to re-run %s: %s', test_name, ex)
+                returncode = -1
+            if returncode != 0:
+                result['failed'] += 1
+            if result['runs'] == repetitions:
+                print(f"Re-ran {test_name}: failed {result['failed']} of {result['runs']} runs")
+    return results
+
+def format_reproducibility(result: Dict) -> str:
+    '''Formats a re-run result as "failed/runs (rate%)".'''
+    if not result or not result['runs']:
+        return 'NA'
+    rate = 100.0 * result['failed'] / result['runs']
+    return f"{result['failed']}/{result['runs']} ({rate:.0f}%)"
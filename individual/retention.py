@@ -0,0 +1,107 @@
+from bisect import bisect_right
+from cargo.common import get_root_path, is_process_running, remove_tree, scan_tree
+from glob import glob
+from individual.toolchain import get_toolchain
+from logging import getLogger
+from os import path
+from typing import Dict, List, Optional
+
+import os
+import re
+
+# Log files are named "<timestamp>-<name>"; the main log of a run is
+# "<timestamp>-<script>-pid<pid>.log".
+__LOG_TIMESTAMP = re.compile(r'^(\d{14})-')
+__RUN_LOG = re.compile(r'^\d{14}-.+-pid\d+\.')
+__LOG_PID = re.compile(r'-pid(\d+)[.-]')
+
+def __get_protected() -> List[str]:
+    '''The build layouts the current configurations use.'''
+    toolchain = get_toolchain()
+    return [path.basename(root.replace('\\', '/')) for root in (toolchain.test_binaries_root, toolchain.clr_binaries_root)]
+
+def __group_logs(paths: List[str]) -> List[List[str]]:
+    '''
+    Groups log files by run: a file belongs to the latest run whose main log
+    is not newer than the file. Files without a timestamp are left out.
+    '''
+    stamped = [(__LOG_TIMESTAMP.match(path.basename(file)), file) for file in paths]
+    stamped = [(match.group(1), file) for (match, file) in stamped if match]
+    runs = sorted({stamp for (stamp, file) in stamped if __RUN_LOG.match(path.basename(file))})
+    groups = {}
+    for (stamp, file) in stamped:
+        index = bisect_right(runs, stamp) - 1
+        groups.setdefault(runs[index] if index >= 0 else stamp, []).append(file)
+    return [groups[key] for key in sorted(groups)]
+
+def find_expired(repo_root: str, keep: int, targets: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    '''Finds the outputs beyond the `keep` newest of every retention pattern.
+    param repo_root: The root directory of the runtime repository.
+    param keep: Number of outputs (runs, for the logs) kept per pattern; the logs of the
+    current run, and of any other running process, are always kept.
+    param targets: Keys of the `retention_patterns` of the toolchain to look at (default: all of them).
+    return: The files and directories to delete, keyed by target.
+    '''
+    if keep < 0:
+        raise ValueError('The number of outputs to keep must not be negative.')
+    protected = __get_protected()
+    retention_patterns = get_toolchain().retention_patterns
+    expired = {}
+    for target in targets or retention_patterns:
+        if target not in retention_patterns:
+            raise ValueError(f'Unknown retention target {target}; use one of {list(retention_patterns)}.')
+        expired[target] = []
+        for (root, pattern) in retention_patterns[target]:
+            base = repo_root if root == 'repo' else get_root_path()
+            paths = [file for file in glob(path.join(base, *pattern.split('/')))
+                     if not file.endswith('.tmp') and path.basename(file) not in protected]
+            kept = keep
+            if target == 'logs':
+                # The runs still writing their logs, the one pruning among them, are left alone.
+                pids = {int(match.group(1)) for match in map(__LOG_PID.search, map(path.basename, paths)) if match}
+                live = {str(pid) for pid in pids if is_process_running(pid)}
+                groups = [group for group in __group_logs(paths)
+                          if not any((match := __LOG_PID.search(path.basename(file))) and match.group(1) in live
+                                     for file in group)]
+            else:
+                # Oldest first.
+                groups = [[file] for file in sorted(paths, key=path.getmtime)]
+            for group in groups[:max(len(groups) - kept, 0)]:
+                expired[target].extend(group)
+    return expired
+
+def prune(
+        repo_root: str,
+        keep: int,
+        targets: Optional[List[str]] = None,
+        dry_run: bool = False,
+        jobs: int = 8) -> Dict[str, Dict[str, int]]:
+    '''Deletes the outputs beyond the `keep` newest of every retention pattern.
+    param repo_root: The root directory of the runtime repository.
+    param keep: Number of outputs (runs, for the logs) kept per pattern.
+    param targets: Keys of the `retention_patterns` of the toolchain to prune (default: all of them).
+    param dry_run: If True, only measures what would be deleted.
+    param jobs: Number of threads deleting concurrently.
+    return: The number of deleted (or deletable) outputs and bytes, keyed by target.
+    '''
+    report = {}
+    for (target, paths) in find_expired(repo_root, keep, targets).items():
+        report[target] = {'outputs': 0, 'bytes': 0}
+        for file in paths:
+            try:
+                if path.isdir(file) and not path.islink(file):
+                    if dry_run:
+                        size = sum(size for (_, size) in scan_tree(file, jobs)[0])
+                    else:
+                        size = remove_tree(file, jobs)
+                else:
+                    size = path.getsize(file)
+                    if not dry_run:
+                        os.remove(file)
+            except OSError as ex:
+                getLogger().error('Unable to prune %s: %s', file, ex)
+                continue
+            getLogger().info('%s %s (%s bytes)', 'Would delete' if dry_run else 'Deleted', file, size)
+            report[target]['outputs'] += 1
+            report[target]['bytes'] += size
+    return report
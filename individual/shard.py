@@ -0,0 +1,185 @@
+from cargo.common import CommandTimeoutError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from heapq import heapify, heappop, heappush
+from itertools import islice
+from individual.cache import load_test_results
+from individual.common import run_single_test, write_test_results
+from individual.history import get_test_durations
+from individual.toolchain import get_toolchain
+from logging import getLogger
+from os import path
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import json
+
+# Duration assumed for tests that never ran, if no other duration is known.
+DEFAULT_TEST_DURATION = 1.0
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    '''Parses a shard specification "i/N" (1-based) into (i, N).'''
+    try:
+        (index, count) = (int(part) for part in shard.split('/'))
+    except ValueError:
+        raise ValueError(f'Invalid shard "{shard}", expected "i/N".')
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f'Invalid shard "{shard}", expected 1 <= i <= N.')
+    return (index, count)
+
+def get_test_catalog(repo_root: str, window: int = 10) -> Dict[str, Dict[str, float]]:
+    '''Gets the tests of every suite with their expected duration.
+    The tests are taken from the last results file of each suite and from the
+    duration history; the expected duration is the median over the last
+    `window` commits, or the median of the suite for tests without history.
+    param repo_root: The root directory of the runtime repository.
+    param window: Number of recent commits the durations are taken from.
+    return: Expected durations in seconds, keyed by suite and test name.
+    '''
+    history = get_test_durations(window=window)
+    test_results = get_toolchain().test_results
+    catalog = {}
+    for suite in test_results:
+        tests = dict(history.get(suite, {}))
+        result_file = path.join(repo_root, test_results[suite])
+        if path.exists(result_file):
+            for test, duration in load_test_results(result_file)['test_durations'].items():
+                tests.setdefault(test, duration)
+        catalog[suite] = tests
+    return catalog
+
+def save_test_catalog(catalog: Dict[str, Dict[str, float]], catalog_file: str) -> int:
+    '''Writes a test catalog to the file shared by the machines running the shards.
+    param catalog: Expected durations keyed by suite and test name, as returned by `get_test_catalog`.
+    param catalog_file: The JSON file to write.
+    return: The number of tests in the catalog.
+    Raises ValueError if the catalog holds no tests.
+    '''
+    count = sum(len(tests) for tests in catalog.values())
+    if count == 0:
+        raise ValueError('No tests found in the results files or the duration history; run the suites first.')
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, indent=2, sort_keys=True)
+    return count
+
+def load_test_catalog(catalog_file: str) -> Dict[str, Dict[str, float]]:
+    '''Reads a test catalog written by `save_test_catalog`.
+    param catalog_file: The JSON file to read.
+    return: Expected durations keyed by suite and test name.
+    Raises ValueError if the file is malformed or holds no tests.
+    '''
+    with open(catalog_file, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    if not isinstance(catalog, dict) or not all(isinstance(tests, dict) for tests in catalog.values()):
+        raise ValueError(f'Invalid shard catalog {catalog_file}, expected {{"<suite>": {{"<test>": <seconds>}}}}.')
+    if not any(catalog.values()):
+        raise ValueError(f'The shard catalog {catalog_file} holds no tests.')
+    return {suite: {test: float(duration) for test, duration in tests.items()} for suite, tests in catalog.items()}
+
+def plan_shards(catalog: Dict[str, Dict[str, float]], count: int) -> List[List[Tuple[str, str, float]]]:
+    '''Splits the tests into shards of about the same total duration.
+    Uses longest-processing-time-first: the tests are sorted by decreasing
+    duration and each goes to the shard with the smallest total so far. The
+    plan only depends on the catalog and the number of shards, so the shards
+    cover every test exactly once only if every machine uses the same catalog
+    (see `save_test_catalog`).
+    param catalog: Expected durations keyed by suite and test name.
+    param count: Number of shards.
+    return: For every shard, a list of (suite, test, expected duration).
+    Raises ValueError if the catalog holds no tests.
+    '''
+    if not any(catalog.values()):
+        raise ValueError('The test catalog holds no tests, there is nothing to shard.')
+    known = [d for tests in catalog.values() for d in tests.values() if d > 0]
+    fallback = median(known) if known else DEFAULT_TEST_DURATION
+    tests = [
+        (duration if duration > 0 else fallback, suite, test)
+        for suite, durations in catalog.items()
+        for test, duration in durations.items()
+    ]
+    tests.sort(key=lambda t: (-t[0], t[1], t[2]))
+    shards = [[] for _ in range(count)]
+    loads = [(0.0, index) for index in range(count)]
+    heapify(loads)
+    for (duration, suite, test) in tests:
+        (load, index) = heappop(loads)
+        shards[index].append((suite, test, duration))
+        heappush(loads, (load + duration, index))
+    return shards
+
+def run_shard(
+        repo_root: str,
+        tests: List[Tuple[str, str, float]],
+        coreroot: str,
+        output_dir: str,
+        jobs: int = 1,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None,
+        stop_after: Optional[Callable[[str, Dict], bool]] = None) -> Dict[str, str]:
+    '''Runs the tests of a shard and writes one results file per suite.
+    param repo_root: The root directory of the runtime repository.
+    param tests: The (suite, test, expected duration) entries of the shard.
+    param coreroot: The Core_Root directory passed to the test wrappers.
+    param output_dir: Directory the `<suite>.testResults.xml` files are written to.
+    param jobs: Number of tests running concurrently.
+    param timeout: Wall-clock timeout of every test, in seconds.
+    param inactivity_timeout: Maximum time a test may run without printing anything, in seconds.
+    param stop_after: Called with the suite and result (`name`, `passed`, `duration`, `message`) of every
+    finished test; returning True leaves the tests that did not start yet out of the run.
+    return: The written results files keyed by suite.
+    '''
+    def run(suite: str, test: str) -> Dict:
+        start = perf_counter()
+        message = ''
+        try:
+            returncode = run_single_test(
+                repo_root, suite, test, coreroot, timeout=timeout, inactivity_timeout=inactivity_timeout)
+            if returncode != 0:
+                message = f'Test exited with status {returncode}'
+        except CommandTimeoutError as ex:
+            message = str(ex)
+        return {'name': test, 'passed': not message, 'duration': perf_counter() - start, 'message': message}
+
+    results = {}
+    queue = iter(tests)
+    stopped = False
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        # Only `jobs` tests are submitted at a time, so that stopping leaves no
+        # queued test behind; the tests that already started are left to finish.
+        futures = {}
+        def submit(count: int) -> None:
+            for (suite, test, _) in islice(queue, count):
+                futures[executor.submit(run, suite, test)] = suite
+        submit(max(jobs, 1))
+        while futures:
+            (done, _) = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                suite = futures.pop(future)
+                result = future.result()
+                results.setdefault(suite, []).append(result)
+                if not result['passed']:
+                    getLogger().error('%s failed: %s', result['name'], result['message'])
+                if stop_after is not None and stop_after(suite, result):
+                    stopped = True
+            if not stopped:
+                submit(len(done))
+
+    result_files = {}
+    for suite, suite_results in results.items():
+        result_files[suite] = path.join(output_dir, f'{suite}{get_toolchain().test_result_extension}')
+        write_test_results(result_files[suite], suite, suite_results)
+    return result_files
+
+def find_shard_results(shard_dirs: List[str]) -> Dict[str, List[str]]:
+    '''Finds the per-suite results files written by `run_shard` in several shard output directories.
+    return: Results files keyed by suite.
+    '''
+    toolchain = get_toolchain()
+    result_files = {}
+    for shard_dir in shard_dirs:
+        for suite in toolchain.test_results:
+            # The summary reads the files from the repository root.
+            result_file = path.join(path.abspath(shard_dir), f'{suite}{toolchain.test_result_extension}')
+            if path.exists(result_file):
+                result_files.setdefault(suite, []).append(result_file)
+    return result_files
@@ -0,0 +1,128 @@
+from contextlib import closing
+from hashlib import sha1
+from individual.history import connect_history
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+import re
+
+# Number of stack frames that make up a signature. Deeper frames are mostly
+# test harness plumbing that every failure shares.
+SIGNATURE_FRAMES = 8
+
+# Run-specific parts of a failure, replaced before hashing. Order matters:
+# paths go first so the numbers inside them are not replaced separately.
+__NORMALIZATIONS = [
+    (re.compile(r'(?:[A-Za-z]:)?[\\/](?:[^\s\\/:*?"<>|]+[\\/])*(?:te?mp|Temp|TEMP)[\\/][^\s:"\'<>|]*'), '<tmp>'),
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '<guid>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<addr>'),
+    (re.compile(r'\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,16}\b'), '<addr>'),
+    (re.compile(r'\b(thread|tid|pid|process)( id)?[\s:#=]*\d+', re.IGNORECASE), r'\1 <id>'),
+    (re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?'), '<time>'),
+    (re.compile(r'\b\d+\b'), '<n>'),
+    (re.compile(r'[ \t]+'), ' '),
+]
+__FRAME = re.compile(r'^\s*at\s+', re.MULTILINE)
+
+def normalize_failure(message: str, stack_trace: str = '') -> str:
+    '''Reduces a failure to the parts that identify the bug: the first line of
+    the message and the top `SIGNATURE_FRAMES` stack frames, with addresses,
+    temp paths, GUIDs, thread and process IDs, timestamps and numbers masked.
+    '''
+    lines = (message or '').strip().splitlines()
+    text = lines[0] if lines else ''
+    frames = [line.strip() for line in (stack_trace or '').splitlines() if __FRAME.match(line)]
+    if frames:
+        text += '\n' + '\n'.join(frames[:SIGNATURE_FRAMES])
+    for (pattern, replacement) in __NORMALIZATIONS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+def failure_signature(message: str, stack_trace: str = '') -> str:
+    '''Hashes the normalized failure into a short signature.'''
+    return sha1(normalize_failure(message, stack_trace).encode('utf-8')).hexdigest()[:12]
+
+def cluster_failures(summaries: Dict[str, Dict]) -> Dict[str, Dict]:
+    '''Groups the failed tests of a run by failure signature.
+    param summaries: `parse_test_results` summaries keyed by suite.
+    return: Clusters keyed by signature, largest first, each with the failed `tests`
+    as (suite, test name) pairs and an `example` of the normalized failure.
+    '''
+    clusters = {}
+    for (suite, summary) in summaries.items():
+        messages = summary.get('failure_messages', {})
+        stack_traces = summary.get('failure_stack_traces', {})
+        for test_name in summary['failed_test_names']:
+            (message, stack_trace) = (messages.get(test_name, ''), stack_traces.get(test_name, ''))
+            signature = failure_signature(message, stack_trace)
+            if signature not in clusters:
+                clusters[signature] = {'tests': [], 'example': normalize_failure(message, stack_trace).split('\n')[0]}
+            clusters[signature]['tests'].append((suite, test_name))
+    return dict(sorted(clusters.items(), key=lambda item: len(item[1]['tests']), reverse=True))
+
+def index_failure_clusters(commit_hash: str, clusters: Dict[str, Dict], database: Optional[str] = None) -> Dict[str, Dict]:
+    '''Adds the clusters of a run to the index of past failure signatures.
+    A later run of the same commit does not count again.
+    param commit_hash: Commit the tests ran against.
+    param clusters: The result of `cluster_failures`.
+    param database: The database file (default `get_history_database()`).
+    return: The index entry of every signature: `first_commit`, `first_seen`, `commits`
+    (number of distinct commits it failed on) and `tests` (tests seen with it, over all runs).
+    '''
+    now = time()
+    with closing(connect_history(database)) as connection, connection:
+        connection.executemany(
+            'INSERT OR IGNORE INTO failure_signatures (signature, first_commit, first_seen, example) VALUES (?, ?, ?, ?)',
+            ((signature, commit_hash, now, cluster['example']) for (signature, cluster) in clusters.items()))
+        connection.executemany(
+            'INSERT OR IGNORE INTO failure_occurrences (signature, commit_hash, suite, test) VALUES (?, ?, ?, ?)',
+            ((signature, commit_hash, suite, test)
+             for (signature, cluster) in clusters.items() for (suite, test) in cluster['tests']))
+        return get_failure_signatures(list(clusters), connection=connection)
+
+def get_failure_signatures(signatures: List[str], database: Optional[str] = None, connection=None) -> Dict[str, Dict]:
+    '''Looks signatures up in the index of past failures.
+    param signatures: The signatures to look up.
+    param database: The database file (default `get_history_database()`).
+    return: See `index_failure_clusters`; unknown signatures are left out.
+    '''
+    if connection is None:
+        with closing(connect_history(database)) as connection:
+            return get_failure_signatures(signatures, connection=connection)
+    entries = {}
+    # Stay below SQLite's limit on the number of bound parameters.
+    for start in range(0, len(signatures), 500):
+        batch = signatures[start:start + 500]
+        placeholders = ', '.join('?' * len(batch))
+        for (signature, first_commit, first_seen, commits, tests) in connection.execute(f'''
+                SELECT s.signature, s.first_commit, s.first_seen,
+                       COUNT(DISTINCT o.commit_hash), COUNT(DISTINCT o.suite || '/' || o.test)
+                FROM failure_signatures s LEFT JOIN failure_occurrences o ON o.signature = s.signature
+                WHERE s.signature IN ({placeholders}) GROUP BY s.signature''', batch):
+            entries[signature] = {'first_commit': first_commit, 'first_seen': first_seen, 'commits': commits, 'tests': tests}
+    return entries
+
+def format_failure_clusters(clusters: Dict[str, Dict], index: Dict[str, Dict], limit: int = 3) -> str:
+    '''Formats the clusters of a run as a Markdown table, one row per signature.
+    param clusters: The result of `cluster_failures`.
+    param index: The result of `index_failure_clusters`.
+    param limit: Number of test names listed per cluster.
+    '''
+    output = '# Failure clusters:\n\n| Signature | Count | First seen | Commits | Failure | Tests |\n' \
+             '|-----------|-------|------------|---------|---------|-------|\n'
+    for (signature, cluster) in clusters.items():
+        entry = index.get(signature, {})
+        tests = ', '.join(test for (_, test) in cluster['tests'][:limit])
+        if len(cluster['tests']) > limit:
+            tests += f", ... ({len(cluster['tests']) - limit} more)"
+        example = __escape(cluster['example'][:120]) or 'NA'
+        first_commit = (entry.get('first_commit') or 'NA')[:12]
+        output += f"| {signature} | {len(cluster['tests'])} | {first_commit} | {entry.get('commits', 1)} | {example} | {__escape(tests)} |\n"
+    return output
+
+def get_test_signatures(clusters: Dict[str, Dict]) -> Dict[Tuple[str, str], str]:
+    '''Maps every (suite, test name) of the clusters to its signature.'''
+    return {test: signature for (signature, cluster) in clusters.items() for test in cluster['tests']}
+
+def __escape(text: str) -> str:
+    return text.replace('|', '\\|')
@@ -0,0 +1,381 @@
+from cargo.common import RunCommand, get_python_executable, get_root_path
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from individual.common import write_test_results
+from individual.constants import IMPACT_IGNORED_EXTENSIONS, RETENTION_PATTERNS, TEST_RESULT_EXTENSION
+from individual.toolchain import Toolchain
+from os import makedirs, path
+from random import Random, SystemRandom
+from subprocess import DEVNULL, TimeoutExpired
+from time import monotonic, perf_counter, sleep
+from typing import Dict, List, Optional, Tuple
+
+import json
+import re
+import subprocess
+import sys
+
+# Where the simulated builds put their outputs, relative to the repository root.
+SIMULATION_ROOT = path.join('artifacts', 'simulation')
+# Settings of the simulation; a --simulation-config file overrides any of them.
+# Every entry of `suites` may override the test settings (from `duration` on)
+# for that suite, and `toggle` names the environment variable set for it only.
+# Durations are in seconds and memory in MiB; both are log-normally
+# distributed around `median`, capped at `max`. A failing test fails every
+# run, a flaky one half of them, and a hanging one stops printing and never
+# exits: it is killed after `test_timeout` seconds, or by the watchdog of the
+# harness if there is no timeout.
+DEFAULT_SIMULATION_CONFIG = {
+    'seed': 0,
+    'clr_build_seconds': 5.0,
+    'project_build_seconds': 2.0,
+    'parallelism': 4,
+    'test_timeout': None,
+    'duration': {'median': 0.2, 'sigma': 1.0, 'max': 10.0},
+    'memory_mb': {'median': 16, 'sigma': 0.8, 'max': 512},
+    'output_lines_per_second': 20,
+    'failure_rate': 0.02,
+    'flaky_rate': 0.02,
+    'hang_rate': 0.0,
+    'suites': {
+        'GC': {'tests': 120},
+        'GC-features': {'tests': 60},
+        'GC-scenarios1': {'tests': 40, 'duration': {'median': 0.5}},
+        'GC-simulator': {'tests': 20, 'toggle': 'RunningGCSimulatorTests', 'duration': {'median': 2.0}, 'memory_mb': {'median': 128}},
+    },
+}
+# Settings a suite may override.
+__SUITE_SETTINGS = ['parallelism', 'test_timeout', 'duration', 'memory_mb', 'output_lines_per_second',
+                    'failure_rate', 'flaky_rate', 'hang_rate']
+# Test areas, used to spread the tests of a suite over directories as the real ones are.
+__AREAS = ['API', 'Features', 'Regressions', 'Stress']
+# Failures the simulated tests report; numbers and addresses vary per test.
+__FAILURES = [
+    ('Assert failure(PID {pid} [0x{pid:08x}], Thread: {tid} [0x{tid:04x}]): !"Detected use of a corrupted OBJECTREF"',
+     ['WKS::gc_heap::mark_object_simple(unsigned char**)', 'WKS::gc_heap::mark_phase(int)', 'WKS::gc_heap::gc1()']),
+    ('Expected: 100, Actual: {n}',
+     ['GCSimulator.Program.Main(System.String[])', 'GCSimulator.Program.RunIteration(Int32)']),
+    ("System.OutOfMemoryException: Exception of type 'System.OutOfMemoryException' was thrown at 0x{address:016x}.",
+     ['System.GC.AllocateNewArray(IntPtr, Int32, GC_ALLOC_FLAGS)', 'GCStress.Allocator.Allocate(Int32)']),
+]
+
+def load_simulation_config(config_file: Optional[str] = None) -> Dict:
+    '''Loads the settings of the simulation.
+    param config_file: JSON file overriding any of `DEFAULT_SIMULATION_CONFIG`; `suites`, if
+    given, replaces the default suites.
+    return: The settings.
+    '''
+    config = deepcopy(DEFAULT_SIMULATION_CONFIG)
+    if config_file:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ValueError(f'{config_file} must be a JSON object.')
+        for (key, value) in overrides.items():
+            if key not in config:
+                raise ValueError(f'Unknown simulation setting {key}; use some of {list(config)}.')
+            if isinstance(config[key], dict) and key != 'suites':
+                config[key].update(value)
+            else:
+                config[key] = value
+    if not isinstance(config['suites'], dict) or not config['suites']:
+        raise ValueError('The simulation needs at least one suite.')
+    for (suite, settings) in config['suites'].items():
+        if not re.fullmatch(r'[\w.-]+', suite):
+            raise ValueError(f'Invalid suite name {suite!r}: use letters, digits, ".", "-" and "_".')
+        unknown = set(settings) - set(__SUITE_SETTINGS) - {'tests', 'toggle'}
+        if unknown:
+            raise ValueError(f'Unknown settings {sorted(unknown)} of suite {suite}.')
+        settings = get_suite_config(config, suite)
+        if sum(settings[key] for key in ('failure_rate', 'flaky_rate', 'hang_rate')) > 1:
+            raise ValueError(f'The failure, flaky and hang rates of suite {suite} add up to more than 1.')
+    return config
+
+def get_suite_config(config: Dict, suite: str) -> Dict:
+    '''Gets the settings of a suite: the test settings of the simulation with the overrides of the suite.'''
+    settings = {key: deepcopy(config[key]) for key in __SUITE_SETTINGS}
+    for (key, value) in config['suites'][suite].items():
+        if isinstance(settings.get(key), dict):
+            settings[key].update(value)
+        else:
+            settings[key] = value
+    settings.setdefault('tests', 0)
+    return settings
+
+def get_simulated_tests(config: Dict, suite: str) -> List[str]:
+    '''Gets the test names of a simulated suite, e.g. GC/Stress/Test0003/Test0003.sim.'''
+    count = get_suite_config(config, suite)['tests']
+    return [f'{suite}/{__AREAS[index % len(__AREAS)]}/Test{index:04d}/Test{index:04d}.sim' for index in range(count)]
+
+def get_simulated_test(config: Dict, test_name: str) -> Dict:
+    '''Gets how a simulated test behaves; the same for every run of the same settings.
+    param config: The settings of the simulation.
+    param test_name: The test name; its first component is the suite.
+    return: The `duration` (seconds), `memory_mb`, `outcome` ("pass", "fail", "flaky" or "hang"),
+    `output_lines_per_second`, and the `message` and `stack_trace` of a failure.
+    '''
+    suite = test_name.split('/')[0]
+    settings = get_suite_config(config, suite)
+    random = Random(f"{config['seed']}:{test_name}")
+
+    def draw(distribution: Dict) -> float:
+        return min(random.lognormvariate(0, distribution['sigma']) * distribution['median'], distribution['max'])
+
+    test = {
+        'duration': draw(settings['duration']),
+        'memory_mb': draw(settings['memory_mb']),
+        'output_lines_per_second': settings['output_lines_per_second'],
+        'outcome': 'pass'
+    }
+    roll = random.random()
+    for (outcome, rate) in (('fail', 'failure_rate'), ('flaky', 'flaky_rate'), ('hang', 'hang_rate')):
+        if roll < settings[rate]:
+            test['outcome'] = outcome
+            break
+        roll -= settings[rate]
+    (message, frames) = __FAILURES[random.randrange(len(__FAILURES))]
+    test['message'] = message.format(
+        pid=random.randint(1000, 99999), tid=random.randint(1, 4095), n=random.randint(0, 1 << 16),
+        address=random.getrandbits(48))
+    test['stack_trace'] = '\n'.join(f'   at {frame}' for frame in frames)
+    return test
+
+def get_simulation_cmdline(action: str, *args: str, config_file: Optional[str] = None) -> List[str]:
+    '''Command running an action of simulate.py.'''
+    cmdline = [get_python_executable(), path.join(get_root_path(), 'simulate.py'), action] + list(args)
+    if config_file:
+        cmdline += ['--config', config_file]
+    return cmdline
+
+class SimulationToolchain(Toolchain):
+    '''
+    Stands in for the build scripts and test wrappers of dotnet/runtime, so the
+    harness can be run and measured on any machine. The repository is a git
+    repository the update step creates and commits to, the builds only take
+    time, and every suite runs synthetic tests (see `get_simulated_test`) as
+    separate processes and writes their results as the real wrappers do.
+    All commands run simulate.py with the settings of `config_file`.
+    '''
+
+    name = 'simulation'
+
+    def __init__(self, config_file: Optional[str] = None):
+        self.__config_file = path.abspath(config_file) if config_file else None
+        self.__config = load_simulation_config(self.__config_file)
+
+    @property
+    def config(self) -> Dict:
+        '''The settings of the simulation.'''
+        return self.__config
+
+    @property
+    def test_binaries_root(self) -> str:
+        return path.join(SIMULATION_ROOT, 'tests')
+
+    @property
+    def clr_binaries_root(self) -> str:
+        return path.join(SIMULATION_ROOT, 'clr')
+
+    @property
+    def test_result_extension(self) -> str:
+        return TEST_RESULT_EXTENSION
+
+    @property
+    def individual_tests(self) -> List[List[str]]:
+        tests = []
+        for (suite, settings) in self.__config['suites'].items():
+            test = [suite, path.join(self.test_binaries_root, suite, f'{suite}.sim')]
+            if settings.get('toggle'):
+                test.append(settings['toggle'])
+            tests.append(test)
+        return tests
+
+    @property
+    def test_projects(self) -> Dict[str, str]:
+        return {suite: path.join('src', 'tests', f'{suite}.simproj') for suite in self.__config['suites']}
+
+    @property
+    def test_results(self) -> Dict[str, str]:
+        return {suite: path.join(self.test_binaries_root, suite, f'{suite}{TEST_RESULT_EXTENSION}')
+                for suite in self.__config['suites']}
+
+    @property
+    def build_step_inputs(self) -> Dict[str, List[str]]:
+        return {'clr_libs': ['src/clr'], 'gc_tests': ['src/tests']}
+
+    @property
+    def build_step_outputs(self) -> Dict[str, List[str]]:
+        return {
+            'clr_libs': [path.join(self.clr_binaries_root, 'Core_Root')],
+            'gc_tests': [test[1] for test in self.individual_tests],
+        }
+
+    @property
+    def impact_rules(self) -> List[Tuple[str, List[str]]]:
+        rules = [('src/clr/', ['*'])]
+        rules += [(f'src/tests/{suite}.simproj', [suite]) for suite in self.__config['suites']]
+        return rules + [('src/tests/', [])]
+
+    @property
+    def impact_ignored_extensions(self) -> List[str]:
+        return IMPACT_IGNORED_EXTENSIONS
+
+    @property
+    def impact_source_roots(self) -> List[str]:
+        return ['src/clr/']
+
+    @property
+    def retention_patterns(self) -> Dict[str, List[Tuple[str, str]]]:
+        patterns = dict(RETENTION_PATTERNS)
+        patterns['builds'] = [('repo', f'{SIMULATION_ROOT}/*'.replace(path.sep, '/'))] + [
+            (root, pattern) for (root, pattern) in RETENTION_PATTERNS['builds'] if root == 'tools']
+        return patterns
+
+    def __simulate(self, action: str, *args: str) -> List[str]:
+        return get_simulation_cmdline(action, *args, config_file=self.__config_file)
+
+    def get_update_cmdlines(self, repo_root: str) -> List[List[str]]:
+        return [self.__simulate('update', path.abspath(repo_root))]
+
+    def get_clr_libs_cmdlines(self, repo_root: str) -> List[List[str]]:
+        return [self.__simulate('build', self.get_coreroot(repo_root))]
+
+    def get_project_build_cmdline(self, repo_root: str, suite: str) -> List[str]:
+        return self.__simulate('build-project', suite, path.join(repo_root, self.test_binaries_root, suite, f'{suite}.sim'))
+
+    def get_coreroot(self, repo_root: str) -> str:
+        return path.join(path.abspath(repo_root), self.clr_binaries_root, 'Core_Root')
+
+    def get_suite_cmdline(self, repo_root: str, test: List[str], coreroot: str) -> List[str]:
+        return self.__simulate('suite', path.join(path.abspath(repo_root), test[1]), '--coreroot', coreroot)
+
+    def get_test_cmdline(self, repo_root: str, test_name: str, coreroot: str) -> List[str]:
+        return self.__simulate('test', test_name, '--coreroot', coreroot)
+
+    def get_bisect_build_cmdlines(self, suite: Optional[str] = None) -> List[List[str]]:
+        cmdlines = [self.__simulate('build', path.join('{worktree}', self.clr_binaries_root, 'Core_Root'))]
+        for name in [suite] if suite else list(self.__config['suites']):
+            cmdlines.append(self.__simulate('build-project', name, path.join('{worktree}', self.test_binaries_root, name, f'{name}.sim')))
+        return cmdlines
+
+    def get_bisect_test_cmdline(self) -> List[str]:
+        return self.__simulate('test', '{test}', '--coreroot', path.join('{worktree}', self.clr_binaries_root, 'Core_Root'))
+
+def simulate_update(repo_root: str, config: Dict) -> None:
+    '''Creates the simulated repository on first use, then commits a new revision of the runtime sources.'''
+    makedirs(path.join(repo_root, 'src', 'clr'), exist_ok=True)
+    makedirs(path.join(repo_root, 'src', 'tests'), exist_ok=True)
+    git = lambda *args: RunCommand(
+        ['git', '-c', 'user.name=simulation', '-c', 'user.email=simulation@localhost'] + list(args),
+        verbose=True, echo=False).run(repo_root)
+    if not path.exists(path.join(repo_root, '.git')):
+        git('init', '-q')
+        with open(path.join(repo_root, '.gitignore'), 'w', encoding='utf-8') as f:
+            f.write('/artifacts/\n/rerun_results.md\n')
+    for suite in config['suites']:
+        project = path.join(repo_root, 'src', 'tests', f'{suite}.simproj')
+        if not path.exists(project):
+            with open(project, 'w', encoding='utf-8') as f:
+                json.dump({'suite': suite}, f)
+    revision_file = path.join(repo_root, 'src', 'clr', 'revision')
+    revision = 0
+    if path.exists(revision_file):
+        with open(revision_file, 'r', encoding='utf-8') as f:
+            revision = int(f.read().strip() or 0)
+    with open(revision_file, 'w', encoding='utf-8') as f:
+        f.write(f'{revision + 1}\n')
+    git('add', '-A')
+    git('commit', '-q', '-m', f'Simulated revision {revision + 1}')
+    print(f'Simulated repository {repo_root} at revision {revision + 1}')
+
+def simulate_build(output_dir: str, seconds: float) -> None:
+    '''Takes `seconds` to "build" and writes a marker file into the output directory.'''
+    sleep(seconds)
+    makedirs(output_dir, exist_ok=True)
+    with open(path.join(output_dir, 'build.json'), 'w', encoding='utf-8') as f:
+        json.dump({'seconds': seconds}, f)
+    print(f'Built {output_dir} in {seconds:.1f}s')
+
+def simulate_project_build(suite: str, wrapper: str, config: Dict) -> None:
+    '''Takes the project build time and writes the wrapper of a suite.'''
+    if suite not in config['suites']:
+        raise ValueError(f'Unknown simulated suite {suite}.')
+    sleep(config['project_build_seconds'])
+    makedirs(path.dirname(path.abspath(wrapper)), exist_ok=True)
+    with open(wrapper, 'w', encoding='utf-8') as f:
+        json.dump({'suite': suite}, f)
+    print(f'Built {suite} in {config["project_build_seconds"]:.1f}s')
+
+def run_simulated_test(test_name: str, coreroot: str, config: Dict) -> int:
+    '''Behaves as the simulated test: holds its memory and prints progress for
+    its duration, then passes, fails or hangs.
+    return: The exit code, 0 if the test passed.
+    '''
+    if not path.isdir(coreroot):
+        print(f'Core_Root {coreroot} does not exist, build it first.')
+        return 2
+    test = get_simulated_test(config, test_name)
+    size = int(test['memory_mb'] * 1024 * 1024)
+    memory = bytearray(size)
+    # Touch every page, so it counts towards the resident set.
+    memory[::4096] = b'\x01' * len(range(0, size, 4096))
+    interval = 1 / test['output_lines_per_second'] if test['output_lines_per_second'] > 0 else None
+    progress = Random(test_name)
+    start = monotonic()
+    iteration = 0
+    while monotonic() - start < test['duration']:
+        if interval is not None:
+            print(f'{test_name}: GC #{iteration} gen{progress.randint(0, 2)} heap=0x{progress.getrandbits(48):012x} '
+                  f'promoted={progress.randint(0, 1 << 20)} bytes', flush=True)
+        iteration += 1
+        sleep(min(interval or test['duration'], max(test['duration'] - (monotonic() - start), 0)))
+    if test['outcome'] == 'hang':
+        print(f'{test_name}: waiting for the finalizer thread...', flush=True)
+        while True:
+            sleep(3600)
+    if test['outcome'] == 'fail' or (test['outcome'] == 'flaky' and SystemRandom().random() < 0.5):
+        print(f"{test_name}: {test['message']}\n{test['stack_trace']}", flush=True)
+        return 1
+    print(f'{test_name}: passed', flush=True)
+    return 0
+
+def run_simulated_suite(wrapper: str, coreroot: str, config: Dict, config_file: Optional[str] = None) -> int:
+    '''Runs the tests of a suite, `parallelism` at a time, each in its own
+    process printing to the output of the suite, and writes the results file
+    next to the wrapper.
+    param wrapper: The wrapper written by the project build.
+    param coreroot: The Core_Root directory the tests run against.
+    param config: The settings of the simulation.
+    param config_file: The file the settings were loaded from, handed to the tests.
+    return: The exit code: 0 if every test passed, 1 otherwise.
+    '''
+    with open(wrapper, 'r', encoding='utf-8') as f:
+        suite = json.load(f)['suite']
+    if not path.isdir(coreroot):
+        print(f'Core_Root {coreroot} does not exist, build it first.')
+        return 2
+    settings = get_suite_config(config, suite)
+
+    def run(test_name: str) -> Dict:
+        start = perf_counter()
+        message = ''
+        stack_trace = ''
+        try:
+            returncode = subprocess.run(
+                get_simulation_cmdline('test', test_name, '--coreroot', coreroot, config_file=config_file),
+                stdin=DEVNULL, timeout=settings['test_timeout']).returncode
+            if returncode != 0:
+                test = get_simulated_test(config, test_name)
+                (message, stack_trace) = (test['message'], test['stack_trace'])
+        except TimeoutExpired:
+            message = f"Test timed out after {settings['test_timeout']} seconds"
+        return {'name': test_name, 'passed': not message, 'duration': perf_counter() - start,
+                'message': message, 'stack_trace': stack_trace}
+
+    with ThreadPoolExecutor(max_workers=max(settings['parallelism'], 1)) as executor:
+        results = list(executor.map(run, get_simulated_tests(config, suite)))
+    write_test_results(path.join(path.dirname(path.abspath(wrapper)), f'{suite}{TEST_RESULT_EXTENSION}'), suite, results)
+    failed = sum(1 for result in results if not result['passed'])
+    print(f'{suite}: {len(results) - failed} passed, {failed} failed')
+    sys.stdout.flush()
+    return 1 if failed else 0
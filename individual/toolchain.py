@@ -0,0 +1,151 @@
+from individual.constants import BUILD_STEP_INPUTS, BUILD_STEP_OUTPUTS, CLR_BINARIES_ROOT, INDIVIDUAL_TESTS
+from individual.constants import INDIVIDUAL_TEST_PROJECTS, TEST_BINARIES_ROOT, TEST_RESULT_EXTENSION, TEST_RESULTS
+from individual.constants import IMPACT_IGNORED_EXTENSIONS, IMPACT_RULES, IMPACT_SOURCE_ROOTS, RETENTION_PATTERNS
+from os import path
+from typing import Dict, List, Optional, Tuple
+
+# Toolchains the tests can be built and run with: the build scripts and test
+# wrappers of dotnet/runtime, or stand-ins simulating them on any machine
+# (see individual/simulation.py).
+TOOLCHAINS = ['runtime', 'simulation']
+
+class Toolchain:
+    '''
+    Describes how the runtime repository is updated and built and how its GC
+    tests are run: the commands, the suites and where they write their
+    results. Paths are relative to the repository root unless a repository
+    root is passed in. This one drives dotnet/runtime with the settings of
+    individual/constants.py.
+    '''
+
+    name = 'runtime'
+
+    @property
+    def test_binaries_root(self) -> str:
+        '''Directory of the built tests; test names are relative to it.'''
+        return TEST_BINARIES_ROOT
+
+    @property
+    def clr_binaries_root(self) -> str:
+        '''Directory of the built runtime the tests run against.'''
+        return CLR_BINARIES_ROOT
+
+    @property
+    def test_result_extension(self) -> str:
+        '''Extension of the results file a test wrapper writes next to itself.'''
+        return TEST_RESULT_EXTENSION
+
+    @property
+    def individual_tests(self) -> List[List[str]]:
+        '''The suites as [name, wrapper, optional environment toggle] entries.'''
+        return INDIVIDUAL_TESTS
+
+    @property
+    def test_projects(self) -> Dict[str, str]:
+        '''The project building every suite, keyed by suite.'''
+        return INDIVIDUAL_TEST_PROJECTS
+
+    @property
+    def test_results(self) -> Dict[str, str]:
+        '''The results file every suite writes, keyed by suite.'''
+        return TEST_RESULTS
+
+    @property
+    def build_step_inputs(self) -> Dict[str, List[str]]:
+        '''Source subtrees every build step depends on, keyed by step.'''
+        return BUILD_STEP_INPUTS
+
+    @property
+    def build_step_outputs(self) -> Dict[str, List[str]]:
+        '''Outputs that must still exist for a build step to be skipped, keyed by step.'''
+        return BUILD_STEP_OUTPUTS
+
+    @property
+    def impact_rules(self) -> List[Tuple[str, List[str]]]:
+        '''Maps changed path prefixes to the suites they affect, first match wins ('*': every suite).'''
+        return IMPACT_RULES
+
+    @property
+    def impact_ignored_extensions(self) -> List[str]:
+        '''Extensions of changed files that never affect the tests.'''
+        return IMPACT_IGNORED_EXTENSIONS
+
+    @property
+    def impact_source_roots(self) -> List[str]:
+        '''Source subtrees whose changes no rule matches affect every suite.'''
+        return IMPACT_SOURCE_ROOTS
+
+    @property
+    def retention_patterns(self) -> Dict[str, List[Tuple[str, str]]]:
+        '''Outputs `--prune` applies keep-last-N retention to, as (root, glob pattern) pairs keyed by target.'''
+        return RETENTION_PATTERNS
+
+    def get_update_cmdlines(self, repo_root: str) -> List[List[str]]:
+        '''Commands updating the repository, run from its root.'''
+        return [['git', 'pull']]
+
+    def get_clr_libs_cmdlines(self, repo_root: str) -> List[List[str]]:
+        '''Commands building the runtime and the test layout, run from the repository root.'''
+        return [
+            ['build.cmd', '-s', 'clr+libs', '-c', 'Release', '-rc', 'Checked'],
+            [rf'src\tests\build.cmd', 'generatelayoutonly', 'Checked']
+        ]
+
+    def get_project_build_cmdline(self, repo_root: str, suite: str) -> List[str]:
+        '''Command building the project of a suite, run from the repository root.'''
+        return [path.join(repo_root, rf'.dotnet\dotnet.exe'), 'build', '-c', 'Release', self.test_projects[suite]]
+
+    def get_coreroot(self, repo_root: str) -> str:
+        '''Gets the Core_Root directory the tests run against.'''
+        return rf'{repo_root}\{self.clr_binaries_root}\Tests\Core_Root'
+
+    def get_suite_cmdline(self, repo_root: str, test: List[str], coreroot: str) -> List[str]:
+        '''Command running a whole suite.
+        param test: An entry of `individual_tests`.
+        '''
+        return [path.join(repo_root, test[1]), '-coreroot', coreroot]
+
+    def get_test_cmdline(self, repo_root: str, test_name: str, coreroot: str) -> List[str]:
+        '''Command running one test; exit code 0 means it passed.
+        param test_name: Test name as reported in the results file.
+        '''
+        return [path.join(repo_root, self.test_binaries_root, test_name), '-coreroot', coreroot]
+
+    def get_bisect_build_cmdlines(self, suite: Optional[str] = None) -> List[List[str]]:
+        '''Commands building a bisection worktree, with the {worktree} placeholder.
+        param suite: The suite of the bisected test (default: build every suite).
+        '''
+        cmdlines = [
+            [r'{worktree}\build.cmd', '-s', 'clr+libs', '-c', 'Release', '-rc', 'Checked'],
+            [r'{worktree}\src\tests\build.cmd', 'generatelayoutonly', 'Checked']
+        ]
+        projects = [self.test_projects[suite]] if suite else list(self.test_projects.values())
+        for project in projects:
+            cmdlines.append([r'{worktree}\.dotnet\dotnet.exe', 'build', '-c', 'Release', project])
+        return cmdlines
+
+    def get_bisect_test_cmdline(self) -> List[str]:
+        '''Command running the bisected test in a worktree, with the {worktree} and {test} placeholders.'''
+        return [
+            rf'{{worktree}}\{self.test_binaries_root}\{{test}}',
+            '-coreroot', rf'{{worktree}}\{self.clr_binaries_root}\Tests\Core_Root'
+        ]
+
+class ToolchainStateManager:
+    def __init__(self):
+        self.toolchain = None
+    def set_toolchain(self, value: Optional[Toolchain]): self.toolchain = value
+    def get_toolchain(self) -> Toolchain:
+        if self.toolchain is None:
+            self.toolchain = Toolchain()
+        return self.toolchain
+
+toolchain_state_manager = ToolchainStateManager()
+
+def set_toolchain(toolchain: Optional[Toolchain]) -> None:
+    '''Sets the toolchain the repository is built and tested with; None restores the runtime one.'''
+    toolchain_state_manager.set_toolchain(toolchain)
+
+def get_toolchain() -> Toolchain:
+    '''Gets the toolchain the repository is built and tested with.'''
+    return toolchain_state_manager.get_toolchain()
@@ -1,12 +1,36 @@
-from cargo.common import RunCommand, push_dir
-from cargo.logger import setup_loggers
+from cargo.common import RunCommand, CommandTimeoutError, push_dir, get_root_path, COMMAND_BACKENDS, set_default_command_backend
+from cargo.admission import AdmissionController, set_admission_controller
+from cargo.logger import setup_loggers, get_command_log_file
+from cargo.scheduler import TaskScheduler
+from cargo.timings import timed_stage, record_timing, read_timings, format_profile, get_timings_file
 from sys import argv
-from typing import List, Any
+from typing import List, Any, Callable, Optional
 from argparse import ArgumentParser
-from individual.constants import INDIVIDUAL_TESTS, TEST_BINARIES_ROOT,CLR_BINARIES_ROOT,TEST_RESULTS
-from individual.common import parse_test_results,generate_test_result_file_name
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging import getLogger
+from subprocess import CalledProcessError
+from individual.constants import RETENTION_PATTERNS
+from individual.toolchain import TOOLCHAINS, get_toolchain, set_toolchain
+from individual.simulation import SimulationToolchain
+from individual.build_stamps import get_source_digest, is_build_up_to_date, record_build
+from individual.common import generate_test_result_file_name,get_test_environment,combine_test_summaries,run_test_command,get_test_suite
+from individual.cache import load_test_results, get_cache_entries, clear_cache
+from individual.rerun import rerun_failed_tests, format_reproducibility
+from individual.history import ingest_test_durations, find_duration_regressions, get_recent_failures
+from individual.history import record_run, resolve_run, diff_runs
+from individual.shard import parse_shard, get_test_catalog, plan_shards, run_shard, find_shard_results
+from individual.shard import save_test_catalog, load_test_catalog
+from individual.impact import get_last_tested_commit, get_changed_paths, select_affected_tests
+from individual.bisect import bisect
+from individual.manifest import RunManifest
+from individual.retention import prune
+from individual.signatures import cluster_failures, index_failure_clusters, format_failure_clusters, get_test_signatures
+from individual.matrix import load_matrix_configs, run_matrix, format_matrix_summary
+from datetime import datetime
 # from pathlib import Path
+import json
 import os
+import shlex
 
 def __process_args(args: List[str]) -> Any:
     '''Processes command line arguments and returns parsed arguments.
@@ -87,7 +111,392 @@ def __process_args(args: List[str]) -> Any:
         required=False,
         default=False,
         action='store_true',
-        help='re-runs the failed tests (default "False")',
+        help='re-runs the failed tests --rerun-count times with --jobs workers (default "False")',
+    )
+    
+    # rebuild even if the build inputs did not change
+    parser.add_argument(
+        '-fb', '--force-build',
+        required=False,
+        default=False,
+        action='store_true',
+        help='builds even if the inputs of a build step did not change (default "False")',
+    )
+    
+    # build the GC Individual Tests concurrently
+    parser.add_argument(
+        '-bj', '--build-jobs',
+        required=False,
+        default=1,
+        type=int,
+        help='number of GC test projects to build concurrently (default "1")',
+    )
+    
+    # run the GC Individual Tests concurrently
+    parser.add_argument(
+        '-j', '--jobs',
+        required=False,
+        default=1,
+        type=int,
+        help='number of test suites to run concurrently (default "1")',
+    )
+    
+    # engine driving the child processes
+    parser.add_argument(
+        '--backend',
+        required=False,
+        default='thread',
+        choices=COMMAND_BACKENDS,
+        help='"thread" uses a pump and a watchdog thread per child process, "asyncio" drives all child '
+             'processes from one event loop (default "thread")',
+    )
+    
+    # what builds and runs the tests
+    parser.add_argument(
+        '--toolchain',
+        required=False,
+        default='runtime',
+        choices=TOOLCHAINS,
+        help='"runtime" builds and runs the GC tests of a dotnet/runtime checkout, "simulation" runs '
+             'synthetic tests in place of them, e.g. to measure the scheduling on any machine (default "runtime")',
+    )
+    
+    parser.add_argument(
+        '--simulation-config',
+        required=False,
+        default=None,
+        type=str,
+        metavar='CONFIG_FILE',
+        help='JSON file with the suites, durations, memory, failure and hang rates of the simulated tests '
+             '(default: the settings of individual/simulation.py)',
+    )
+    
+    # only start a test when the machine has room for it
+    parser.add_argument(
+        '--memory-headroom',
+        required=False,
+        default=1024,
+        type=int,
+        help='with --jobs, memory in MiB that must stay available after reserving the historical '
+             'peak RSS of the running tests before another test starts (default "1024")',
+    )
+    
+    parser.add_argument(
+        '--max-load',
+        required=False,
+        default=None,
+        type=float,
+        help='with --jobs, no test starts while the 1-minute load average is above this value (default "None")',
+    )
+    
+    # parsed test results cache
+    parser.add_argument(
+        '--cache-info',
+        required=False,
+        default=False,
+        action='store_true',
+        help='lists the parsed test results cache and exits (default "False")',
+    )
+    
+    parser.add_argument(
+        '--clear-cache',
+        required=False,
+        default=False,
+        action='store_true',
+        help='clears the parsed test results cache and exits (default "False")',
+    )
+    
+    # compare two recorded runs
+    parser.add_argument(
+        '--diff',
+        required=False,
+        default=None,
+        nargs='*',
+        metavar='RUN',
+        help='lists the new failures, fixes and still failing tests between two recorded runs and exits; '
+             'a run is a run id, "~N" for the Nth run before the latest, or a commit hash prefix '
+             '(default: "~1" and "~0", the previous and the latest run; a single run is compared with the latest)',
+    )
+    
+    # disk space retention
+    parser.add_argument(
+        '--prune',
+        required=False,
+        default=False,
+        action='store_true',
+        help='deletes all but the --keep newest build outputs, test results and run logs, and exits (default "False")',
+    )
+    
+    parser.add_argument(
+        '--keep',
+        required=False,
+        default=5,
+        type=int,
+        help='number of build outputs, test results and run logs --prune keeps of each kind (default "5")',
+    )
+    
+    parser.add_argument(
+        '--prune-target',
+        required=False,
+        default=None,
+        action='append',
+        choices=list(RETENTION_PATTERNS),
+        help='restricts --prune to some outputs, can be repeated (default: all of them)',
+    )
+    
+    parser.add_argument(
+        '--dry-run',
+        required=False,
+        default=False,
+        action='store_true',
+        help='with --prune, only reports how many bytes would be reclaimed (default "False")',
+    )
+    
+    parser.add_argument(
+        '--prune-jobs',
+        required=False,
+        default=8,
+        type=int,
+        help='number of threads deleting files concurrently (default "8")',
+    )
+    
+    parser.add_argument(
+        '--cache-verify',
+        required=False,
+        default=False,
+        action='store_true',
+        help='includes a content hash of the results files in the cache key (default "False")',
+    )
+    
+    parser.add_argument(
+        '-rc', '--rerun-count',
+        required=False,
+        default=3,
+        type=int,
+        help='number of times every failed test is re-run (default "3")',
+    )
+    
+    # kill hung tests
+    parser.add_argument(
+        '-to', '--timeout',
+        required=False,
+        default=None,
+        type=float,
+        help='kills a test suite or re-run test after this many seconds (default "None")',
+    )
+    
+    parser.add_argument(
+        '-it', '--inactivity-timeout',
+        required=False,
+        default=None,
+        type=float,
+        help='kills a test suite or re-run test that printed nothing for this many seconds (default "None")',
+    )
+    
+    # overlap the build and test phases
+    parser.add_argument(
+        '-p', '--pipeline',
+        required=False,
+        default=False,
+        action='store_true',
+        help='runs the build, test and parse stages as a dependency graph; '
+             '--jobs limits the number of concurrent stages (default "False")',
+    )
+    
+    # fast feedback
+    parser.add_argument(
+        '-ff', '--failures-first',
+        required=False,
+        default=False,
+        action='store_true',
+        help='runs the tests that failed in recent runs first, then the suites with the most '
+             'recent failures first (default "False")',
+    )
+    
+    parser.add_argument(
+        '--fail-fast',
+        required=False,
+        default=None,
+        type=int,
+        metavar='K',
+        help='stops the run and writes a partial summary after K failed tests; implies '
+             '--failures-first (default "None")',
+    )
+    
+    # split the tests across machines
+    parser.add_argument(
+        '--shard',
+        required=False,
+        default=None,
+        type=str,
+        metavar='I/N',
+        help='runs the I-th of N duration-balanced shards of the individual GC tests instead of '
+             'the whole suites (default "None")',
+    )
+    
+    parser.add_argument(
+        '--shard-output',
+        required=False,
+        default=None,
+        type=str,
+        help='directory the shard results are written to (default "test_results/shards/I-of-N")',
+    )
+    
+    parser.add_argument(
+        '--shard-catalog',
+        required=False,
+        default=None,
+        type=str,
+        metavar='CATALOG_FILE',
+        help='JSON file of the tests to split and their expected durations, shared by every machine running '
+             'a shard; required with --shard (default "None")',
+    )
+    
+    parser.add_argument(
+        '--write-shard-catalog',
+        required=False,
+        default=None,
+        type=str,
+        metavar='CATALOG_FILE',
+        help='writes the tests of the last results files, with their durations from the history, to a shard '
+             'catalog and exits (default "None")',
+    )
+    
+    # run the suites under several GC configurations
+    parser.add_argument(
+        '--matrix',
+        required=False,
+        default=None,
+        type=str,
+        metavar='CONFIG_FILE',
+        help='runs every suite under every GC configuration of a JSON file mapping configuration names '
+             'to environment variables, e.g. {"server": {"DOTNET_gcServer": "1"}} (default "None")',
+    )
+    
+    parser.add_argument(
+        '--matrix-output',
+        required=False,
+        default=None,
+        type=str,
+        help='directory the per-configuration results are written to (default "test_results/matrix")',
+    )
+    
+    parser.add_argument(
+        '--merge-shards',
+        required=False,
+        default=None,
+        nargs='+',
+        metavar='SHARD_DIR',
+        help='summarizes the results of several shard output directories and exits (default "None")',
+    )
+    
+    # test impact analysis
+    parser.add_argument(
+        '--affected-only',
+        required=False,
+        default=False,
+        action='store_true',
+        help='runs only the suites and tests affected by the changes since the last tested commit; '
+             'falls back to a full run when core GC sources changed (default "False")',
+    )
+    
+    # continue an interrupted run
+    parser.add_argument(
+        '--resume',
+        required=False,
+        default=False,
+        action='store_true',
+        help='skips the stages and suites an interrupted run of the same commit already completed '
+             '(default "False")',
+    )
+    
+    # find the commit that broke a test
+    parser.add_argument(
+        '--bisect',
+        required=False,
+        default=None,
+        type=str,
+        metavar='TEST',
+        help='finds the first commit between --good and --bad where TEST fails and exits (default "None")',
+    )
+    
+    parser.add_argument(
+        '--good',
+        required=False,
+        default=None,
+        type=str,
+        help='a commit where the bisected test passes',
+    )
+    
+    parser.add_argument(
+        '--bad',
+        required=False,
+        default='HEAD',
+        type=str,
+        help='a commit where the bisected test fails (default "HEAD")',
+    )
+    
+    parser.add_argument(
+        '--bisect-ways',
+        required=False,
+        default=3,
+        type=int,
+        help='number of commits built and tested concurrently per bisection round (default "3")',
+    )
+    
+    parser.add_argument(
+        '--bisect-build',
+        required=False,
+        default=None,
+        action='append',
+        help='command building a commit, may use {worktree}, {commit} and {test}; repeat for several '
+             'commands (default: clr+libs, the test layout and the project of the test)',
+    )
+    
+    parser.add_argument(
+        '--bisect-test',
+        required=False,
+        default=None,
+        type=str,
+        help='command running the test, exit code 0 means pass; may use {worktree}, {commit} and {test} '
+             '(default: the test wrapper against the Core_Root of the worktree)',
+    )
+    
+    # slow test detection
+    parser.add_argument(
+        '--perf-report',
+        required=False,
+        default=False,
+        action='store_true',
+        help='reports tests that got slower than their rolling baseline (default "False")',
+    )
+    
+    parser.add_argument(
+        '--perf-threshold',
+        required=False,
+        default=2.0,
+        type=float,
+        help='duration ratio to the baseline above which a test is reported (default "2.0")',
+    )
+    
+    parser.add_argument(
+        '--perf-window',
+        required=False,
+        default=10,
+        type=int,
+        help='number of earlier commits forming the duration baseline (default "10")',
+    )
+    
+    # report where the time went
+    parser.add_argument(
+        '--profile',
+        required=False,
+        default=None,
+        nargs='?',
+        const='',
+        metavar='TIMINGS_FILE',
+        help='prints the slowest stages and commands at the end of the run, or of the given '
+             '.timings.jsonl file and exits (default "None")',
     )
     
     return parser.parse_args(args)
@@ -104,100 +513,267 @@ def __get_commit_hash(repo_root: str, verbose: bool = True) -> str:
     
 def __get_repo_update(repo_root: str, verbose: bool = True) -> None:
     '''Updates the runtime repository by pulling the latest changes from the remote repository.
-    This function changes the current working directory to the repository root and runs the git pull command.
+    This function changes the current working directory to the repository root and runs the
+    update commands of the toolchain (git pull).
     param repo_root: The root directory of the runtime repository.
     param verbose: If True, prints the command lines being executed.
     '''
-    cmdlines = [
-        ['git', 'pull'],
-        # ['git', 'log', '-1', '--pretty=format:%H']
-    ]
+    cmdlines = get_toolchain().get_update_cmdlines(repo_root)
     with push_dir(repo_root):
         for cmdline in cmdlines:
             RunCommand(cmdline, verbose=verbose).run()
 
-def __build_clr_libs(repo_root: str, verbose: bool = True) -> None:
+def __check_build_step(repo_root: str, step: str, force: bool, verbose: bool = True) -> Any:
+    '''Computes the fingerprint of a build step and checks whether it can be skipped.
+    param repo_root: The root directory of the runtime repository.
+    param step: Name of the build step in the toolchain's `build_step_inputs`.
+    param force: If True, the step is never skipped.
+    param verbose: If True, prints the command lines being executed.
+    return: A tuple (skip, fingerprint, commit hash).
+    '''
+    commit_hash = __get_commit_hash(repo_root, verbose=verbose)
+    fingerprint = get_source_digest(repo_root, get_toolchain().build_step_inputs[step])
+    if force:
+        return (False, fingerprint, commit_hash)
+    skip = is_build_up_to_date(repo_root, step, fingerprint, get_toolchain().build_step_outputs[step])
+    if skip:
+        print(f'Skipping build step {step}: inputs unchanged since last build at {commit_hash}.')
+    return (skip, fingerprint, commit_hash)
+
+def __build_clr_libs(repo_root: str, verbose: bool = True, force: bool = False) -> None:
     '''Builds the CLR and libraries in Release and Checked mode.
     This function builds the CLR and libraries using the provided command lines.
+    The build is skipped if its inputs did not change since the last successful build.
     param repo_root: The root directory of the runtime repository.
     param verbose: If True, prints the command lines being executed.
+    param force: If True, builds even if the inputs did not change.
     '''
-    cmdlines =[
-        ['build.cmd', '-s', 'clr+libs', '-c', 'Release', '-rc', 'Checked'],
-        [rf'src\tests\build.cmd', 'generatelayoutonly', 'Checked']
-    ]
+    (skip, fingerprint, commit_hash) = __check_build_step(repo_root, 'clr_libs', force, verbose=verbose)
+    if skip:
+        return
+    cmdlines = get_toolchain().get_clr_libs_cmdlines(repo_root)
     with push_dir(repo_root):
         for cmdline in cmdlines:
             RunCommand(cmdline, verbose=verbose).run()
+    record_build(repo_root, 'clr_libs', fingerprint, commit_hash)
 
-def __build_gc_individual_tests(repo_root: str, verbose: bool = True) -> None:
+def __build_gc_individual_test_project(repo_root: str, suite: str, log_file: str, verbose: bool = True) -> None:
+    '''Builds a single GC test project, writing the build output to its own log file.
+    param repo_root: The root directory of the runtime repository.
+    param suite: Name of the suite in the toolchain's `test_projects`.
+    param log_file: The file the build output is written to.
+    param verbose: If True, also echoes the build output prefixed with the suite name.
+    '''
+    cmdline = get_toolchain().get_project_build_cmdline(repo_root, suite)
+    print(f'Running command: {cmdline}')
+    RunCommand(cmdline, verbose=verbose, echo=verbose, name=suite, log_file=log_file).run(repo_root)
+
+def __build_gc_individual_tests(repo_root: str, verbose: bool = True, force: bool = False, jobs: int = 1) -> None:
     '''Builds the GC Individual Tests.
-    This function builds the individual test projects specified in the `individual_test_projects` list.
+    This function builds the individual test projects of the toolchain (`test_projects`).
+    The build is skipped if its inputs did not change since the last successful build.
     param repo_root: The root directory of the runtime repository.
     param verbose: If True, prints the command lines being executed.
+    param force: If True, builds even if the inputs did not change.
+    param jobs: Number of projects to build concurrently.
     '''
-    build_tool = rf'.dotnet\dotnet.exe'
-    individual_test_projects = [
-        r'src\tests\GC\GC.csproj', 
-        r'src\tests\GC\Features\GC-features.csproj',
-        r'src\tests\GC\Scenarios\GC-scenarios1.csproj',
-        r'src\tests\GC\Scenarios\GC-simulator.csproj']
-    with push_dir(repo_root):
-        for project in individual_test_projects:
-            cmdline = [build_tool, 'build', '-c', 'Release', project]
-            print(f'Running command: {cmdline}')
-            RunCommand(cmdline, verbose=verbose).run()
-        print('GC Individual Tests built successfully.')    
+    (skip, fingerprint, commit_hash) = __check_build_step(repo_root, 'gc_tests', force, verbose=verbose)
+    if skip:
+        return
+    projects = get_toolchain().test_projects
+    if jobs <= 1:
+        with push_dir(repo_root):
+            for suite in projects:
+                cmdline = get_toolchain().get_project_build_cmdline(repo_root, suite)
+                print(f'Running command: {cmdline}')
+                RunCommand(cmdline, verbose=verbose).run()
+    else:
+        # Every project is built even if another one fails; the failures are
+        # reported together once all builds have finished.
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        log_files = {
+            suite: get_command_log_file(f'build-{suite}', timestamp)
+            for suite in projects
+        }
+        failures = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(__build_gc_individual_test_project, repo_root, suite, log_files[suite], verbose): suite
+                for suite in projects
+            }
+            for future in as_completed(futures):
+                suite = futures[future]
+                try:
+                    future.result()
+                    print(f'Built {suite}, log: {log_files[suite]}')
+                except CalledProcessError as ex:
+                    getLogger().error('Failed to build %s: %s', suite, ex)
+                    failures[suite] = ex
+        if failures:
+            for suite in failures:
+                print(f'Build failed: {suite} ({projects[suite]}), log: {log_files[suite]}')
+            raise next(iter(failures.values()))
+    print('GC Individual Tests built successfully.')
+    record_build(repo_root, 'gc_tests', fingerprint, commit_hash)
+
+def __get_coreroot(repo_root: str) -> str:
+    '''Gets the Core_Root directory the tests run against.'''
+    return get_toolchain().get_coreroot(repo_root)
 
-def __run_gc_individual_tests(repo_root: str, verbose: bool = True) -> None:
+def __run_gc_individual_test(
+        repo_root: str,
+        test: List[str],
+        coreroot: str,
+        verbose: bool = True,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None) -> int:
+    '''Runs a single GC Individual Tests suite with its own environment.
+    param repo_root: The root directory of the runtime repository.
+    param test: An entry of the toolchain's `individual_tests`.
+    param coreroot: The Core_Root directory passed to the test wrapper.
+    param verbose: If True, echoes the suite output prefixed with the suite name; the complete
+    output is always written to the suite log file.
+    param timeout: Wall-clock timeout of the suite, in seconds.
+    param inactivity_timeout: Maximum time the suite may run without printing anything, in seconds.
+    return: The exit code of the test wrapper.
+    Raises CommandTimeoutError if the suite was killed by the watchdog.
+    '''
+    cmdline = get_toolchain().get_suite_cmdline(repo_root, test, coreroot)
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    log_file = get_command_log_file(f'run-{test[0]}', timestamp)
+    print(f'Running command: {cmdline}, log: {log_file}')
+    return run_test_command(RunCommand(
+        cmdline,
+        verbose=True,
+        echo=verbose,
+        env=get_test_environment(test),
+        name=test[0],
+        log_file=log_file,
+        timeout=timeout,
+        inactivity_timeout=inactivity_timeout), repo_root)
+
+def __run_gc_individual_tests(
+        repo_root: str,
+        verbose: bool = True,
+        jobs: int = 1,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None,
+        suites: Optional[List[str]] = None,
+        stop_after: Optional[Callable[[str, str], bool]] = None) -> List[dict]:
     '''Runs the GC Individual Tests.
     This function assumes that the tests are built and available in the specified directory.
+    Each suite gets its own environment, so the suites can run concurrently.
+    A suite killed by the watchdog is recorded and the remaining suites still run.
     param repo_root: The root directory of the runtime repository.
-    param verbose: If True, prints the command lines being executed.
+    param verbose: If True, echoes the output of the suites.
+    param jobs: Number of test suites to run concurrently.
+    param timeout: Wall-clock timeout of every suite, in seconds.
+    param inactivity_timeout: Maximum time a suite may run without printing anything, in seconds.
+    param suites: Names of the suites to run, in that order (default: all of the toolchain's `individual_tests`).
+    param stop_after: Called with the name and outcome ('completed', 'failed' or 'timed_out') of every
+    finished suite; returning True stops the run before the remaining suites start. When set, failing
+    suites are logged instead of raised.
+    return: The suites that timed out.
     '''
-    coreroot = rf'{repo_root}\{CLR_BINARIES_ROOT}\Tests\Core_Root'
-    with push_dir(repo_root):
-        for test in INDIVIDUAL_TESTS:
-            if test[0] == 'GC-simulator':
-                # For GC-simulator, we need to set the environment variable
-                # RunningGCSimulatorTests to 1 to run the simulator tests.
-                os.environ['RunningGCSimulatorTests'] = '1'
-            else:
-                # os.environ['RunningGCSimulatorTests'] = ''
-                os.environ.pop('RunningGCSimulatorTests', None)
-            
-            cmdline = [test[1], '-coreroot', coreroot]
-            print(f'Running command: {cmdline}')
-            RunCommand(cmdline, verbose=True).run()
-        
-# def __rerun_failed_tests(repo_root: str, run_name: str, coreroot: str, verbose: bool = True) -> None:
+    coreroot = __get_coreroot(repo_root)
+    individual_tests = get_toolchain().individual_tests
+    if suites is None:
+        tests = list(individual_tests)
+    else:
+        tests = [test for suite in suites for test in individual_tests if test[0] == suite]
+    timed_out = []
+    if jobs <= 1:
+        for test in tests:
+            outcome = 'completed'
+            try:
+                __run_gc_individual_test(repo_root, test, coreroot, verbose, timeout, inactivity_timeout)
+            except CommandTimeoutError as ex:
+                getLogger().error('Test suite %s timed out: %s', test[0], ex)
+                timed_out.append({'name': test[0], 'reason': str(ex)})
+                outcome = 'timed_out'
+            except CalledProcessError as ex:
+                if stop_after is None:
+                    raise
+                getLogger().error('Test suite %s failed: %s', test[0], ex)
+                outcome = 'failed'
+            if stop_after is not None and stop_after(test[0], outcome):
+                break
+        return timed_out
 
-def __rerun_failed_tests(repo_root: str, testresult: str, coreroot: str, verbose: bool = True) -> None:
+    # Every suite is a separate child process, so the workers only pump its
+    # output. A failing suite does not cancel the others; the first failure is
+    # raised once every suite has finished.
+    failures = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(__run_gc_individual_test, repo_root, test, coreroot, verbose, timeout, inactivity_timeout): test[0]
+            for test in tests
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            outcome = 'completed'
+            try:
+                future.result()
+                print(f'Test suite {futures[future]} completed.')
+            except CommandTimeoutError as ex:
+                getLogger().error('Test suite %s timed out: %s', futures[future], ex)
+                timed_out.append({'name': futures[future], 'reason': str(ex)})
+                outcome = 'timed_out'
+            except CalledProcessError as ex:
+                getLogger().error('Test suite %s failed: %s', futures[future], ex)
+                failures.append(ex)
+                outcome = 'failed'
+            if stop_after is not None and stop_after(futures[future], outcome):
+                # Suites that already started are left to finish.
+                for pending in futures:
+                    pending.cancel()
+    if failures and stop_after is None:
+        raise failures[0]
+    return timed_out
+        
+def __rerun_failed_tests(
+        repo_root: str,
+        coreroot: str,
+        repetitions: int = 3,
+        jobs: int = 1,
+        verify_cache: bool = False,
+        timeout: Optional[float] = None,
+        inactivity_timeout: Optional[float] = None) -> dict:
     """
-    Re-runs failed tests and records the results in a Markdown file.
+    Re-runs the failed tests of every suite several times and records how
+    often each failure reproduces in a Markdown file.
+    param repo_root: The root directory of the runtime repository.
+    param coreroot: The Core_Root directory passed to the test wrappers.
+    param repetitions: Number of times every failed test is re-run.
+    param jobs: Number of tests re-run concurrently.
+    param verify_cache: If True, cached results are only reused when the file content hash matches.
+    param timeout: Wall-clock timeout of every test run, in seconds.
+    param inactivity_timeout: Maximum time a test run may go without printing anything, in seconds.
+    return: The re-run results keyed by (suite, test name).
     """
-    test_summary = parse_test_results(testresult)
-    if not test_summary['failed_test_names']:
+    failed_tests = {}
+    test_results = get_toolchain().test_results
+    for suite in test_results:
+        result_file = os.path.join(repo_root, test_results[suite])
+        if not os.path.exists(result_file):
+            continue
+        test_summary = load_test_results(result_file, verify_content=verify_cache)
+        if test_summary['failed_test_names']:
+            failed_tests[suite] = test_summary['failed_test_names']
+    if not failed_tests:
         print('No failed tests to re-run.')
-        return
+        return {}
 
-    re_run_test_result = []
-    markdown_output = "# Failed tests:\n\n| Test name | Reproducible |\n|-----------|--------------|\n"
+    count = sum(len(tests) for tests in failed_tests.values())
+    print(f'Re-running {count} failed tests {repetitions} times each with {jobs} jobs...')
+    re_run_test_result = rerun_failed_tests(
+        repo_root, failed_tests, coreroot, repetitions=repetitions, jobs=jobs,
+        timeout=timeout, inactivity_timeout=inactivity_timeout)
 
-    for failed_test in test_summary['failed_test_names']:
-        cmdline = [rf'{TEST_BINARIES_ROOT}\{failed_test}', '-coreroot', coreroot]
-        print(f'Re-running failed test: {failed_test}')
-        print(f'Re-running failed tests with command: {cmdline}')
-        returncode = RunCommand(cmdline, verbose=True).run()
-        
-        reproducible = "TRUE" if returncode != 0 else "FALSE"
-        markdown_output += f"| {failed_test} | {reproducible} |\n"
-        
-        re_run_test_result.append({'test_name': failed_test, 'reproducible': reproducible})
-        if returncode != 0:
-            print(f'Failed to re-run test: {failed_test}')
-        else:
-            print(f'Successfully re-ran test: {failed_test}')
+    markdown_output = "# Failed tests:\n\n| Suite | Test name | Reproducible |\n|-------|-----------|--------------|\n"
+    for (suite, failed_test), result in re_run_test_result.items():
+        markdown_output += f"| {suite} | {failed_test} | {format_reproducibility(result)} |\n"
 
     # Write results to a Markdown file
     output_file = os.path.join(repo_root, "rerun_results.md")
@@ -205,10 +781,11 @@ def __rerun_failed_tests(repo_root: str, testresult: str, coreroot: str, verbose
         md_file.write(markdown_output)
 
     print(f'Re-run results saved to {output_file}')
+    return re_run_test_result
 
-def __analyze_test_results(test_result: str) -> dict:
+def __analyze_test_results(test_result: str, verify_cache: bool = False) -> dict:
     '''Analyzes the test results and returns a summary.'''
-    test_summary = parse_test_results(test_result)
+    test_summary = load_test_results(test_result, verify_content=verify_cache)
     if not test_summary:
         print(f'No test results found in {test_result}')
         return {}
@@ -226,43 +803,443 @@ def __analyze_test_results(test_result: str) -> dict:
     
     return test_summary
 
-def __summary(repo_root: str, verbose: bool = True) -> None:
+def __diff(references: List[str]) -> None:
+    '''Prints the differences between two recorded runs.
+    param references: Up to two run references (see `resolve_run`); a single run is compared
+    with the latest one, no run compares the previous and the latest run.
+    '''
+    if len(references) > 2:
+        raise ValueError('--diff takes at most two runs.')
+    if not references:
+        references = ['~1', '~0']
+    elif len(references) == 1:
+        references = [references[0], '~0']
+    (run_a, run_b) = (resolve_run(reference) for reference in references)
+    diff = diff_runs(run_a['run_id'], run_b['run_id'])
+
+    def describe(run: dict) -> str:
+        recorded = datetime.fromtimestamp(run['recorded']).strftime('%Y-%m-%d %H:%M:%S')
+        scope = f", {run['scope']}" if run['scope'] else ''
+        return f"run {run['run_id']} ({run['commit_hash'][:12]}, {recorded}{scope})"
+
+    output = f"# {describe(run_a)} -> {describe(run_b)}, {diff['runs_between']} runs in between\n\n"
+    output += '| Testset name | Failed before | Failed after |\n|--------------|---------------|--------------|\n'
+    for (suite, runs) in sorted(diff['suites'].items()):
+        (before, after) = (runs.get(run['run_id']) for run in (run_a, run_b))
+        output += f"| {suite} | {before['failed'] if before else 'NA'} | {after['failed'] if after else 'NA'} |\n"
+    for (title, key) in (('New failures', 'new_failures'), ('Fixed', 'fixed'), ('Still failing', 'still_failing'),
+                         ('Not comparable, not run by the partial run', 'not_comparable')):
+        if key == 'not_comparable' and not (run_a['partial'] or run_b['partial']):
+            continue
+        output += f'\n# {title} ({len(diff[key])}):\n\n'
+        if diff[key]:
+            output += '| Testset name | Test name |\n|--------------|-----------|\n'
+            output += ''.join(f'| {suite} | {test} |\n' for (suite, test) in diff[key])
+    print(output)
+
+def __prune(args: Any) -> None:
+    '''Deletes all but the newest build outputs, test results and run logs, and prints the reclaimed space.
+    param args: Parsed command line arguments.
+    '''
+    report = prune(args.repo_root, args.keep, targets=args.prune_target, dry_run=args.dry_run, jobs=args.prune_jobs)
+    print(f"{'Would reclaim' if args.dry_run else 'Reclaimed'} (keeping the {args.keep} newest of each kind):\n")
+    print('| Target | Outputs | Size (MiB) |\n|--------|---------|------------|')
+    for (target, entry) in report.items():
+        print(f"| {target} | {entry['outputs']} | {entry['bytes'] / (1024 * 1024):.1f} |")
+    total = sum(entry['bytes'] for entry in report.values())
+    print(f'\nTotal: {total / (1024 * 1024):.1f} MiB')
+
+def __show_cache() -> None:
+    '''Prints the entries of the parsed test results cache.'''
+    entries = get_cache_entries()
+    total = sum(entry['size'] for entry in entries)
+    print(f'{len(entries)} cached test results, {total} bytes')
+    for entry in entries:
+        last_used = datetime.fromtimestamp(entry['last_used']).strftime('%Y/%m/%d %H:%M:%S')
+        source = entry['key']['path'] if entry['key'] else '<unreadable>'
+        print(f"{last_used} {entry['size']:>10} {source}")
+
+def __summary(
+        repo_root: str,
+        verbose: bool = True,
+        verify_cache: bool = False,
+        rerun_results: Optional[dict] = None,
+        timed_out: Optional[List[dict]] = None,
+        result_files: Optional[dict] = None,
+        note: Optional[str] = None,
+        started: Optional[float] = None,
+        label: Optional[str] = None,
+        partial: bool = False) -> None:
     '''Generates a summary of the test results and writes it to a Markdown file.
     param repo_root: The root directory of the runtime repository.
     param verbose: If True, prints the command lines being executed.
+    param verify_cache: If True, cached results are only reused when the file content hash matches.
+    param rerun_results: Re-run results keyed by (suite, test name), used to fill the Reproducible column.
+    param timed_out: Suites killed by the watchdog, as returned by `__run_gc_individual_tests`.
+    param result_files: Results files keyed by suite (default: the toolchain's `test_results`); several files of
+    the same suite, e.g. shards, are combined.
+    param note: Remark added below the commit hash, e.g. why the run stopped early.
+    param started: Start time of the run (as a timestamp); older results files, left over from an earlier run
+    of a suite that timed out or crashed, are ignored.
+    param label: Names a partial or combined run, e.g. "shard-1-of-2" or "merged", in the summary file name,
+    so that the summaries of the shards and of their merge do not overwrite each other.
+    param partial: Whether only some tests of the suites ran (a shard, the affected tests or a fail-fast run);
+    the run is recorded but not used as a baseline by --diff.
     '''
+    test_results = get_toolchain().test_results
+    if result_files is None:
+        result_files = {suite: [test_results[suite]] for suite in test_results}
+    rerun_results = rerun_results or {}
+    timed_out = list(timed_out or [])
+    for (_, test_name), result in rerun_results.items():
+        if result.get('timed_out'):
+            timed_out.append({'name': test_name, 'reason': f"{result['timed_out']} of {result['runs']} re-runs timed out"})
     print('Generating summary of test results...')
     commit_hash = __get_commit_hash(repo_root, verbose=verbose)
     markdown_output = f'# GC Individual Tests Summary\n\nCommit Hash: {commit_hash}\n\n'
+    if note:
+        markdown_output += f'{note}\n\n'
     markdown_output += "# Test Result:\n\n| Testset name | Number of tests | Passed | Failed |\n|--------------|-------|-------|-------|\n"
-    markdown_output_failed_test = "# Failed tests:\n\n| Test name | Reproducible |\n|-----------|--------------|\n"
+    summaries = {}
     with push_dir(repo_root):
-        for result in TEST_RESULTS:
-            if not os.path.exists(TEST_RESULTS[result]):
-                print(f'Test result file {TEST_RESULTS[result]} does not exist.')
+        for result in test_results:
+            files = [
+                file for file in result_files.get(result, [])
+                if os.path.exists(file) and (started is None or os.path.getmtime(file) >= started)
+            ]
+            if not files:
+                print(f'Test result file {test_results[result]} does not exist or is older than the run.')
                 markdown_output += f"| {result} | NA | NA | NA |\n"
                 continue
-            test_summary = parse_test_results(TEST_RESULTS[result])
+            test_summary = combine_test_summaries(
+                [load_test_results(file, verify_content=verify_cache) for file in files])
             if not test_summary:
                 print(f'No test results found in {test_summary}')
                 markdown_output += f"| {result} | NA | NA | NA |\n"
                 continue
             else:
                 markdown_output += f"| {result} | {test_summary['total_cases']} | {test_summary['passed_cases']} | {test_summary['failed_cases']} |\n"
+                ingest_test_durations(commit_hash, result, test_summary)
+                summaries[result] = test_summary
                 
             if not test_summary['failed_test_names']:
                 print('No failed tests to re-run.')
-                continue
-            for failed_test in test_summary['failed_test_names']:
-                markdown_output_failed_test += f"| {failed_test} | TO DO |\n"
 
+    # One row per failure signature, so a bug breaking many tests is triaged once.
+    clusters = cluster_failures(summaries)
+    if clusters:
+        markdown_output += "\n\n" + format_failure_clusters(clusters, index_failure_clusters(commit_hash, clusters))
+    signatures = get_test_signatures(clusters)
+    markdown_output_failed_test = "# Failed tests:\n\n| Test name | Signature | Reproducible |\n|-----------|-----------|--------------|\n"
+    for (result, test_summary) in summaries.items():
+        for failed_test in test_summary['failed_test_names']:
+            markdown_output_failed_test += f"| {failed_test} | {signatures[(result, failed_test)]} | {format_reproducibility(rerun_results.get((result, failed_test)))} |\n"
     markdown_output += "\n\n" + markdown_output_failed_test
+    if timed_out:
+        markdown_output += "\n\n# Timed out:\n\n| Name | Reason |\n|------|--------|\n"
+        for entry in timed_out:
+            markdown_output += f"| {entry['name']} | {entry['reason']} |\n"
     # Write results to a Markdown file
-    output_file = generate_test_result_file_name()
+    output_file = generate_test_result_file_name(label)
     with open(output_file, "w") as md_file:
         md_file.write(markdown_output)
     print(f'Summary of test results saved to {output_file}')
 
+    # Machine-readable record of the run, also indexed for --diff
+    run_id = record_run(commit_hash, summaries, output_file, scope=label, partial=partial)
+    record = {
+        'run_id': run_id,
+        'commit': commit_hash,
+        'scope': label,
+        'partial': partial,
+        'suites': {suite: {key: summary[key] for key in ('total_cases', 'passed_cases', 'failed_cases')}
+                   for (suite, summary) in summaries.items()},
+        'failed_tests': {suite: summary['failed_test_names'] for (suite, summary) in summaries.items()},
+        'timed_out': timed_out
+    }
+    with open(output_file[:-len('.md')] + '.json', 'w', encoding='utf-8') as json_file:
+        json.dump(record, json_file)
+    print(f'Recorded as run {run_id}')
+
+def __run_shard(args: Any) -> dict:
+    '''Runs one shard of the individual GC tests.
+    Every machine computes the same longest-processing-time plan from the
+    shared shard catalog, so the shards together cover every test exactly once.
+    param args: Parsed command line arguments.
+    return: The results files of the shard keyed by suite.
+    '''
+    (index, count) = parse_shard(args.shard)
+    shards = plan_shards(load_test_catalog(args.shard_catalog), count)
+    tests = shards[index - 1]
+    output_dir = args.shard_output or os.path.join(get_root_path(), 'test_results', 'shards', f'{index}-of-{count}')
+    expected = sum(test[2] for test in tests)
+    print(f'Running shard {index}/{count}: {len(tests)} tests, about {expected:.0f}s, results in {output_dir}')
+    return run_shard(
+        args.repo_root, tests, __get_coreroot(args.repo_root), output_dir, jobs=args.jobs,
+        timeout=args.timeout, inactivity_timeout=args.inactivity_timeout)
+
+def __run_matrix(args: Any) -> None:
+    '''Runs every suite under every GC configuration of the matrix file and writes
+    the pivot tables to test_results/<timestamp>-matrix-summary.md.
+    param args: Parsed command line arguments.
+    '''
+    configs = load_matrix_configs(args.matrix)
+    print(f'Running {len(get_toolchain().individual_tests)} suites under {len(configs)} configurations: {", ".join(configs)}')
+    cells = run_matrix(
+        args.repo_root, configs, __get_coreroot(args.repo_root), output_dir=args.matrix_output,
+        jobs=args.jobs, verbose=args.verbose, timeout=args.timeout, inactivity_timeout=args.inactivity_timeout)
+    commit_hash = __get_commit_hash(args.repo_root)
+    markdown_output = f'# GC Configuration Matrix Summary\n\nCommit Hash: {commit_hash}\n\n'
+    markdown_output += '# Configurations:\n\n| Name | Environment |\n|------|-------------|\n'
+    for (name, variables) in configs.items():
+        environment = ' '.join(f'{key}={value}' for (key, value) in variables.items()) or '(default)'
+        markdown_output += f'| {name} | {environment} |\n'
+    markdown_output += '\n' + format_matrix_summary(cells, list(configs), verify_cache=args.cache_verify)
+    output_file = generate_test_result_file_name().replace('-test-summary.md', '-matrix-summary.md')
+    with open(output_file, "w") as md_file:
+        md_file.write(markdown_output)
+    print(markdown_output)
+    print(f'Summary of the configuration matrix saved to {output_file}')
+
+def __run_affected_tests(args: Any) -> tuple:
+    '''Runs only the suites and tests affected by the changes since the last tested commit.
+    param args: Parsed command line arguments.
+    return: A tuple (timed out suites, failed suites, results files keyed by suite).
+    '''
+    repo_root = args.repo_root
+    base_commit = get_last_tested_commit()
+    commit_hash = __get_commit_hash(repo_root)
+    changed_paths = get_changed_paths(repo_root, base_commit, commit_hash) if base_commit else None
+    if base_commit is None:
+        print('No tested commit recorded in test_results, running every suite.')
+        selection = {'full': True}
+    elif changed_paths is None:
+        print(f'Cannot diff the last tested commit {base_commit} (rebased or force-pushed?), running every suite.')
+        selection = {'full': True}
+    else:
+        print(f'{len(changed_paths)} paths changed since the last tested commit {base_commit}.')
+        selection = select_affected_tests(changed_paths, get_test_catalog(repo_root))
+        for suite, changed_path in selection['reasons'].items():
+            print(f'Selected {suite}: {changed_path}')
+
+    failed_suites = []
+    def record_failure(suite: str, outcome: str) -> bool:
+        if outcome == 'failed':
+            failed_suites.append(suite)
+        return False
+
+    run_suite = lambda suites: __run_gc_individual_tests(
+        repo_root, verbose=args.verbose, jobs=args.jobs, timeout=args.timeout,
+        inactivity_timeout=args.inactivity_timeout, suites=suites, stop_after=record_failure)
+    if selection['full']:
+        return (run_suite(None), failed_suites, None)
+
+    suites = sorted(selection['suites'])
+    timed_out = run_suite(suites) if suites else []
+    result_files = {suite: [get_toolchain().test_results[suite]] for suite in suites}
+    tests = [(suite, test, 0.0) for suite, names in selection['tests'].items() for test in sorted(names)]
+    if tests:
+        print(f'Running {len(tests)} affected tests individually.')
+        output_dir = os.path.join(get_root_path(), 'test_results', 'affected')
+        written = run_shard(
+            repo_root, tests, __get_coreroot(repo_root), output_dir, jobs=args.jobs,
+            timeout=args.timeout, inactivity_timeout=args.inactivity_timeout)
+        for suite, file in written.items():
+            result_files[suite] = [file]
+    if not suites and not tests:
+        print('No GC tests are affected by the changes.')
+    return (timed_out, failed_suites, result_files)
+
+def __run_failures_first(args: Any) -> tuple:
+    '''Runs recently failing tests first so that a broken change shows up within minutes.
+    The tests that failed in the last 10 recorded commits run individually
+    first; the suites then run ordered by their number of recent failures.
+    With --fail-fast K the run stops once K distinct tests failed.
+    param args: Parsed command line arguments.
+    return: A tuple (timed out suites, failed suites, results files keyed by suite, note for the summary).
+    '''
+    repo_root = args.repo_root
+    start = datetime.now().timestamp()
+    recent = get_recent_failures()
+    failed_tests = set()
+    fail_fast = args.fail_fast
+
+    tests = [
+        (suite, test, 0.0)
+        for suite in recent
+        for (test, _) in sorted(recent[suite].items(), key=lambda item: -item[1])
+    ]
+    first_pass = {}
+    if tests:
+        print(f'Running {len(tests)} recently failing tests first.')
+        output_dir = os.path.join(get_root_path(), 'test_results', 'failures-first')
+        ran = []
+        def confirm_failure(suite: str, result: dict) -> bool:
+            # Stop submitting tests as soon as K failures are confirmed.
+            ran.append(result['name'])
+            if not result['passed']:
+                failed_tests.add(result['name'])
+            return bool(fail_fast) and len(failed_tests) >= fail_fast
+        first_pass = run_shard(
+            repo_root, tests, __get_coreroot(repo_root), output_dir, jobs=args.jobs,
+            timeout=args.timeout, inactivity_timeout=args.inactivity_timeout, stop_after=confirm_failure)
+        print(f'{len(failed_tests)} of {len(ran)} recently failing tests still fail ({len(tests) - len(ran)} not run).')
+    result_files = {suite: [file] for suite, file in first_pass.items()}
+    if fail_fast and len(failed_tests) >= fail_fast:
+        return ([], [], result_files, f'Stopped early: {len(failed_tests)} tests failed among the recently failing tests (fail-fast {fail_fast}).')
+
+    completed = []
+    failed_suites = []
+    test_results = get_toolchain().test_results
+    def stop_after(suite: str, outcome: str) -> bool:
+        completed.append(suite)
+        if outcome == 'failed':
+            failed_suites.append(suite)
+        result_file = os.path.join(repo_root, test_results[suite])
+        # Ignore results left over from an earlier run of a suite that crashed.
+        if os.path.exists(result_file) and os.path.getmtime(result_file) >= start:
+            failed_tests.update(load_test_results(result_file)['failed_test_names'])
+            # The full suite results supersede the individual runs of the first pass.
+            result_files[suite] = [test_results[suite]]
+        return bool(fail_fast) and len(failed_tests) >= fail_fast
+
+    suites = sorted(test_results, key=lambda suite: -sum(recent.get(suite, {}).values()))
+    print(f'Running the suites in order: {", ".join(suites)}')
+    timed_out = __run_gc_individual_tests(
+        repo_root, verbose=args.verbose, jobs=args.jobs, timeout=args.timeout,
+        inactivity_timeout=args.inactivity_timeout, suites=suites, stop_after=stop_after)
+    note = None
+    skipped = [suite for suite in suites if suite not in completed]
+    if skipped:
+        note = f'Stopped early: {len(failed_tests)} tests failed (fail-fast {fail_fast}). Suites not run: {", ".join(skipped)}.'
+    return (timed_out, failed_suites, result_files, note)
+
+def __bisect(args: Any) -> None:
+    '''Finds the first commit where a test fails with a k-ary bisection over git worktrees.
+    param args: Parsed command line arguments.
+    '''
+    if not args.good:
+        raise ValueError('--bisect requires --good.')
+    test = args.bisect
+    suite = next((s for s, tests in get_test_catalog(args.repo_root).items() if test in tests), None)
+    env = get_test_environment(get_test_suite(suite)) if suite else None
+    if args.bisect_build is not None:
+        build_cmdlines = [shlex.split(cmdline) for cmdline in args.bisect_build]
+    else:
+        build_cmdlines = get_toolchain().get_bisect_build_cmdlines(suite)
+    if args.bisect_test is not None:
+        test_cmdline = shlex.split(args.bisect_test)
+    else:
+        test_cmdline = get_toolchain().get_bisect_test_cmdline()
+    result = bisect(
+        args.repo_root, args.good, args.bad, test, test_cmdline, build_cmdlines,
+        ways=args.bisect_ways, env=env, timeout=args.timeout)
+    if result['first_bad']:
+        print(f"First bad commit for {test}: {result['first_bad']} ({result['rounds']} rounds, "
+              f"{len(result['results'])} commits tested)")
+    else:
+        print(f'Unable to isolate the first bad commit for {test}; candidates:')
+        for commit in result['candidates']:
+            print(f"  {commit} {result['results'].get(commit, 'untested')}")
+
+def __perf_report(repo_root: str, threshold: float, window: int) -> None:
+    '''Prints the tests of the current commit that got slower than their rolling baseline.
+    param repo_root: The root directory of the runtime repository.
+    param threshold: Ratio to the baseline above which a test is reported.
+    param window: Number of earlier commits forming the baseline.
+    '''
+    commit_hash = __get_commit_hash(repo_root)
+    regressions = find_duration_regressions(commit_hash, threshold=threshold, window=window)
+    print(f'# Duration regressions at {commit_hash} (>= {threshold}x the median of the last {window} commits)\n')
+    if not regressions:
+        print('No duration regressions.')
+        return
+    print('| Testset name | Test name | Duration (s) | Baseline (s) | Ratio |\n|--------------|-----------|--------------|--------------|-------|')
+    for r in regressions:
+        print(f"| {r['suite']} | {r['test']} | {r['duration']:.1f} | {r['baseline']:.1f} | {r['ratio']:.1f}x |")
+
+def __run_pipeline(args: Any) -> None:
+    '''Runs the enabled stages as a dependency graph.
+    Each test project gets its own build node, and each suite its own run and
+    parse nodes, so a suite starts running as soon as its project is built.
+    The time every node spent blocked, waiting and running is printed at the end.
+    param args: Parsed command line arguments.
+    '''
+    repo_root = args.repo_root
+    toolchain = get_toolchain()
+    coreroot = __get_coreroot(repo_root)
+    scheduler = TaskScheduler(max_workers=max(args.jobs, 1))
+    state = {}
+    failed_suites = []
+    timed_out = []
+    started = datetime.now().timestamp()
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    def depends(*names: str) -> List[str]:
+        return [name for name in names if name in scheduler.tasks]
+
+    def check_tests() -> None:
+        state['gc_tests'] = __check_build_step(repo_root, 'gc_tests', args.force_build)
+
+    def build_project(suite: str) -> None:
+        if state['gc_tests'][0]:
+            return
+        log_file = get_command_log_file(f'build-{suite}', timestamp)
+        __build_gc_individual_test_project(repo_root, suite, log_file, verbose=args.verbose)
+
+    def stamp_tests() -> None:
+        (skip, fingerprint, commit_hash) = state['gc_tests']
+        if not skip:
+            record_build(repo_root, 'gc_tests', fingerprint, commit_hash)
+
+    def run_suite(test: List[str]) -> None:
+        # A suite with failing tests still gets parsed and summarized.
+        try:
+            __run_gc_individual_test(repo_root, test, coreroot, args.verbose, args.timeout, args.inactivity_timeout)
+        except CommandTimeoutError as ex:
+            getLogger().error('Test suite %s timed out: %s', test[0], ex)
+            timed_out.append({'name': test[0], 'reason': str(ex)})
+        except CalledProcessError as ex:
+            getLogger().error('Test suite %s failed: %s', test[0], ex)
+            failed_suites.append(test[0])
+
+    def parse_suite(suite: str) -> None:
+        result_file = os.path.join(repo_root, toolchain.test_results[suite])
+        if os.path.exists(result_file) and os.path.getmtime(result_file) >= started:
+            load_test_results(result_file, verify_content=args.cache_verify)
+
+    if args.update_repo:
+        scheduler.add('update', lambda: __get_repo_update(repo_root))
+    if args.build_clr_libs:
+        scheduler.add('build:clr_libs', lambda: __build_clr_libs(repo_root, force=args.force_build), depends('update'))
+    if args.build_tests:
+        # The test projects build against the live-built libraries.
+        scheduler.add('check:gc_tests', check_tests, depends('update', 'build:clr_libs'))
+        for suite in toolchain.test_projects:
+            scheduler.add(f'build:{suite}', lambda suite=suite: build_project(suite), ['check:gc_tests'])
+        scheduler.add('stamp:gc_tests', stamp_tests, [f'build:{suite}' for suite in toolchain.test_projects])
+    for test in toolchain.individual_tests:
+        suite = test[0]
+        if args.run_tests:
+            scheduler.add(f'run:{suite}', lambda test=test: run_suite(test), depends('build:clr_libs', f'build:{suite}'))
+        scheduler.add(f'parse:{suite}', lambda suite=suite: parse_suite(suite), depends(f'run:{suite}'))
+    scheduler.add('summary', lambda: __summary(repo_root, verify_cache=args.cache_verify, timed_out=timed_out,
+                                               started=started if args.run_tests else None),
+                  [f'parse:{test[0]}' for test in toolchain.individual_tests])
+
+    try:
+        scheduler.run()
+    finally:
+        for task in scheduler.tasks.values():
+            record_timing('stage', task.name, wall=task.running, blocked=task.blocked,
+                          waiting=task.waiting, status=task.status)
+        report = scheduler.report()
+        getLogger().info('Pipeline timings:\n%s', report)
+        print(report)
+    failed_suites += [entry['name'] for entry in timed_out]
+    if failed_suites:
+        raise CalledProcessError(1, f'test suites failed: {", ".join(failed_suites)}')
+
 def __main(argv: List[str]) -> None:
     '''Main function to run the GC Individual Tests wrapper.
     param argv: List of command line arguments.
@@ -274,6 +1251,29 @@ def __main(argv: List[str]) -> None:
     args = __process_args(argv)
     setup_loggers(verbose=args.verbose)
     
+    if args.profile:
+        print(format_profile(read_timings(args.profile)))
+        return
+    set_default_command_backend(args.backend)
+    if args.toolchain == 'simulation':
+        set_toolchain(SimulationToolchain(args.simulation_config))
+    elif args.simulation_config:
+        raise ValueError('--simulation-config requires --toolchain simulation.')
+    if args.jobs > 1:
+        set_admission_controller(AdmissionController(args.jobs, args.memory_headroom * 1024, args.max_load))
+    if args.clear_cache:
+        print(f'Removed {clear_cache()} cached test results.')
+        return
+    if args.cache_info:
+        __show_cache()
+        return
+    if args.prune:
+        __prune(args)
+        return
+    if args.diff is not None:
+        __diff(args.diff)
+        return
+    
     if args.all_actions:
         args.update_repo = True
         args.build_clr_libs = True
@@ -285,14 +1285,137 @@ def __main(argv: List[str]) -> None:
         args.build_tests = False
         args.update_repo = False
         args.build_clr_libs = False
+    
+    if args.shard or args.matrix:
+        args.run_tests = False
+    
+    if args.bisect:
+        __bisect(args)
+        return
+    
+    if args.merge_shards:
+        __summary(args.repo_root, verify_cache=args.cache_verify, result_files=find_shard_results(args.merge_shards),
+                  label='merged')
+        return
+    
+    if args.write_shard_catalog:
+        count = save_test_catalog(get_test_catalog(args.repo_root), args.write_shard_catalog)
+        print(f'Wrote {count} tests to the shard catalog {args.write_shard_catalog}')
+        return
+    if args.resume and args.pipeline:
+        raise ValueError('--resume is not supported with --pipeline; the pipeline does not record a run manifest.')
+    if args.shard and not args.shard_catalog:
+        raise ValueError('--shard requires --shard-catalog, so that every machine plans the same shards.')
         
-    if args.update_repo: __get_repo_update(args.repo_root)
-    if args.build_clr_libs: __build_clr_libs(args.repo_root)
-    if args.build_tests: __build_gc_individual_tests(args.repo_root)
-    if args.run_tests: __run_gc_individual_tests(args.repo_root)
-    # if args.rerun_failed_tests: __rerun_failed_tests(args.repo_root)
+    try:
+        if args.pipeline and not (args.rerun_failed_tests or args.shard or args.affected_only
+                                  or args.failures_first or args.fail_fast or args.matrix):
+            __run_pipeline(args)
+        else:
+            __run_stages(args)
+        if args.perf_report:
+            __perf_report(args.repo_root, args.perf_threshold, args.perf_window)
+    finally:
+        if args.profile is not None and get_timings_file() and os.path.exists(get_timings_file()):
+            print(format_profile(read_timings(get_timings_file())))
+
+def __run_stages(args: Any) -> None:
+    '''Runs the enabled stages one after another, recording the timings of each stage.
+    Progress is recorded in a run manifest; with --resume, the stages and suites
+    an interrupted run of the same commit completed are skipped.
+    param args: Parsed command line arguments.
+    '''
+    manifest = RunManifest()
+    resumed = args.resume and manifest.load()
+    if not resumed:
+        manifest.reset()
+
+    def run_stage(stage: str, action: Callable[[], Any]) -> None:
+        if manifest.is_stage_done(stage):
+            print(f'Skipping stage {stage}: completed by the interrupted run.')
+            return
+        with timed_stage(stage):
+            action()
+        manifest.mark_stage(stage)
+
+    if args.update_repo:
+        run_stage('update', lambda: __get_repo_update(args.repo_root))
+    commit_hash = __get_commit_hash(args.repo_root)
+    if manifest.commit != commit_hash:
+        if resumed and manifest.commit:
+            print(f'The interrupted run tested {manifest.commit}, starting over for {commit_hash}.')
+        manifest.reset(commit_hash, keep_stages=['update'])
+    if args.build_clr_libs:
+        run_stage('build:clr_libs', lambda: __build_clr_libs(args.repo_root, force=args.force_build))
+    if args.build_tests:
+        run_stage('build:gc_tests', lambda: __build_gc_individual_tests(args.repo_root, force=args.force_build, jobs=args.build_jobs))
+    if args.matrix:
+        with timed_stage('run:matrix'):
+            __run_matrix(args)
+        return
+    timed_out = []
+    failed_suites = []
+    result_files = None
+    note = None
+    partial = False
+    if args.run_tests and (args.failures_first or args.fail_fast):
+        with timed_stage('run:failures_first'):
+            (timed_out, failed_suites, result_files, note) = __run_failures_first(args)
+        # A note tells why the run stopped early.
+        partial = note is not None
+    elif args.run_tests and args.affected_only:
+        with timed_stage('run:affected'):
+            (timed_out, failed_suites, result_files) = __run_affected_tests(args)
+        # Without results files every suite ran.
+        partial = result_files is not None
+    elif args.run_tests:
+        suites = [test[0] for test in get_toolchain().individual_tests if test[0] not in manifest.suites]
+        for suite in manifest.suites:
+            print(f'Skipping test suite {suite}: completed by the interrupted run.')
+
+        started = datetime.now().timestamp()
+        def mark_suite(suite: str, outcome: str) -> bool:
+            # Only fresh results complete a suite; a suite that timed out or crashed
+            # may have left the results file of an earlier run behind.
+            result_file = os.path.join(args.repo_root, get_toolchain().test_results[suite])
+            if outcome == 'timed_out' or not os.path.exists(result_file) or os.path.getmtime(result_file) < started:
+                if outcome == 'failed':
+                    failed_suites.append(suite)
+                return False
+            manifest.mark_suite(suite, result_file, failed=outcome == 'failed')
+            return False
+
+        if suites:
+            with timed_stage('run:gc_tests'):
+                for entry in __run_gc_individual_tests(
+                        args.repo_root, verbose=args.verbose, jobs=args.jobs, timeout=args.timeout,
+                        inactivity_timeout=args.inactivity_timeout, suites=suites, stop_after=mark_suite):
+                    manifest.mark_timed_out(entry)
+        # Combine the results of the interrupted run with the new ones.
+        timed_out = manifest.timed_out
+        failed_suites += manifest.failed_suites
+        result_files = {suite: [file] for suite, file in manifest.suites.items() if file}
+    if args.shard:
+        with timed_stage('run:shard'):
+            result_files = {suite: [file] for suite, file in __run_shard(args).items()}
+    rerun_results = None
+    if args.rerun_failed_tests:
+        with timed_stage('rerun'):
+            rerun_results = __rerun_failed_tests(
+                args.repo_root, __get_coreroot(args.repo_root),
+                repetitions=args.rerun_count, jobs=args.jobs, verify_cache=args.cache_verify,
+                timeout=args.timeout, inactivity_timeout=args.inactivity_timeout)
     
-    __summary(args.repo_root)
+    with timed_stage('summary'):
+        __summary(args.repo_root, verify_cache=args.cache_verify, rerun_results=rerun_results,
+                  timed_out=timed_out, result_files=result_files, note=note,
+                  started=manifest.started if args.run_tests else None,
+                  label='shard-{}-of-{}'.format(*parse_shard(args.shard)) if args.shard else None,
+                  partial=partial or bool(args.shard))
+    # The summary is written first, so a failing run still reports its results.
+    failed_suites += [entry['name'] for entry in timed_out]
+    if failed_suites:
+        raise CalledProcessError(1, f'test suites failed: {", ".join(failed_suites)}')
     
 if __name__ == '__main__':
     __main(argv[1:])
\ No newline at end of file
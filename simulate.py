@@ -0,0 +1,67 @@
+from individual.simulation import load_simulation_config, simulate_update, simulate_build, simulate_project_build
+from individual.simulation import run_simulated_suite, run_simulated_test
+from argparse import ArgumentParser
+from sys import argv, exit
+from typing import Any, List
+
+def __process_args(args: List[str]) -> Any:
+    '''Processes command line arguments and returns parsed arguments.
+    param args: List of command line arguments.
+    return: Parsed arguments as an object.
+    '''
+    parser = ArgumentParser(
+        description='Stand-in build scripts and test wrappers of the simulation toolchain (run.py --toolchain simulation)',
+        allow_abbrev=False
+    )
+    actions = parser.add_subparsers(dest='action', required=True)
+
+    update = actions.add_parser('update', help='creates the simulated repository or commits a new revision to it')
+    update.add_argument('repo_root', help='root directory of the simulated repository')
+
+    build = actions.add_parser('build', help='builds the simulated runtime')
+    build.add_argument('output', help='the Core_Root directory to create')
+
+    build_project = actions.add_parser('build-project', help='builds the simulated project of a suite')
+    build_project.add_argument('suite', help='name of the suite')
+    build_project.add_argument('wrapper', help='the suite wrapper to create')
+
+    suite = actions.add_parser('suite', help='runs the tests of a suite and writes its results file')
+    suite.add_argument('wrapper', help='the suite wrapper')
+    suite.add_argument('--coreroot', required=True, help='the Core_Root directory')
+
+    test = actions.add_parser('test', help='runs one simulated test; exit code 0 means it passed')
+    test.add_argument('test_name', help='test name as reported in the results file')
+    test.add_argument('--coreroot', required=True, help='the Core_Root directory')
+
+    for action in (update, build, build_project, suite, test):
+        action.add_argument(
+            '--config',
+            required=False,
+            default=None,
+            type=str,
+            help='JSON file with the settings of the simulation (default: the settings of individual/simulation.py)',
+        )
+
+    return parser.parse_args(args)
+
+def __main(argv: List[str]) -> int:
+    '''Runs an action of the simulation toolchain.
+    param argv: List of command line arguments.
+    return: The exit code.
+    '''
+    args = __process_args(argv)
+    config = load_simulation_config(args.config)
+    if args.action == 'update':
+        simulate_update(args.repo_root, config)
+    elif args.action == 'build':
+        simulate_build(args.output, config['clr_build_seconds'])
+    elif args.action == 'build-project':
+        simulate_project_build(args.suite, args.wrapper, config)
+    elif args.action == 'suite':
+        return run_simulated_suite(args.wrapper, args.coreroot, config, args.config)
+    elif args.action == 'test':
+        return run_simulated_test(args.test_name, args.coreroot, config)
+    return 0
+
+if __name__ == '__main__':
+    exit(__main(argv[1:]))